@@ -91,6 +91,12 @@ class Broker(db.Model):
     subscription_expiry = db.Column(db.DateTime, nullable=True)
     subscription_status = db.Column(db.String(20), default='Inactive')
 
+    # Allocation profile for this account (None = use the global defaults)
+    daily_sip_min = db.Column(db.Float, nullable=True)
+    daily_sip_max = db.Column(db.Float, nullable=True)
+    max_cap = db.Column(db.Float, nullable=True)
+    min_cap = db.Column(db.Float, nullable=True)
+
     # Relationship to user
     user = db.relationship('User', backref=db.backref('brokers', lazy=True))
 
@@ -1095,6 +1101,10 @@ def admin_backup_database():
                 'is_master': broker.is_master,
                 'copy_multiplier': broker.copy_multiplier,
                 'copy': broker.copy,
+                'daily_sip_min': broker.daily_sip_min,
+                'daily_sip_max': broker.daily_sip_max,
+                'max_cap': broker.max_cap,
+                'min_cap': broker.min_cap,
                 'created_at': broker.created_at.strftime('%Y-%m-%d %H:%M:%S') if hasattr(broker, 'created_at') else '',
                 'last_updated': broker.last_updated.strftime('%Y-%m-%d %H:%M:%S') if hasattr(broker,
                                                                                              'last_updated') else ''
@@ -1208,6 +1218,18 @@ def admin_edit_broker(broker_id):
         access_token = request.form.get('access_token')
         subscription_status = request.form.get('subscription_status')
 
+        # Allocation profile (blank = global defaults)
+        daily_sip_min = request.form.get('daily_sip_min', type=float)
+        daily_sip_max = request.form.get('daily_sip_max', type=float)
+        max_cap = request.form.get('max_cap', type=float)
+        min_cap = request.form.get('min_cap', type=float)
+        if daily_sip_min is not None and daily_sip_max is not None and daily_sip_min > daily_sip_max:
+            flash('Daily SIP minimum cannot exceed the daily SIP maximum', 'error')
+            return render_template('admin/edit_broker.html', broker=broker, users=users, active_page='brokers')
+        if min_cap is not None and max_cap is not None and min_cap > max_cap:
+            flash('Minimum cap cannot exceed the maximum cap', 'error')
+            return render_template('admin/edit_broker.html', broker=broker, users=users, active_page='brokers')
+
         # Handle subscription_expiry
         subscription_expiry_str = request.form.get('subscription_expiry')
 
@@ -1225,6 +1247,10 @@ def admin_edit_broker(broker_id):
         broker.totp_secret = totp_secret
         broker.access_token = access_token
         broker.subscription_status = subscription_status
+        broker.daily_sip_min = daily_sip_min
+        broker.daily_sip_max = daily_sip_max
+        broker.max_cap = max_cap
+        broker.min_cap = min_cap
 
         # Handle subscription_expiry with proper error checking
         if subscription_expiry_str:
@@ -1681,6 +1707,16 @@ if __name__ == '__main__':
                 db.session.commit()
                 print("customer_id column added and populated for all users.")
 
+            # Check if the allocation profile columns exist in Broker table
+            if 'broker' in existing_tables:
+                broker_columns = [col['name'] for col in inspector.get_columns('broker')]
+                for column in ('daily_sip_min', 'daily_sip_max', 'max_cap', 'min_cap'):
+                    if column not in broker_columns:
+                        print(f"Adding {column} column to Broker table...")
+                        db.session.execute(db.text(f'ALTER TABLE broker ADD COLUMN {column} FLOAT'))
+                        db.session.commit()
+                        print(f"{column} column added to Broker table.")
+
             # Check for admin user
             admin = User.query.filter_by(is_admin=True).first()
             if not admin:
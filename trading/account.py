@@ -1,12 +1,13 @@
 # account.py
 from broker_handlers import BrokerFactory
+from session_cache import get_session_cache
 
 
 class Account:
     def __init__(self, user_id, password=None, totp_secret=None, broker="FINVASIA",
                  api_key=None, api_secret=None, vendor_code=None, imei=None,
                  access_token=None, is_master=False, multiplier=1, copy=False,
-                 subscription_status='Inactive', subscription_expiry=None):
+                 subscription_status='Inactive', subscription_expiry=None, allocation_params=None):
         # Common attributes
         self.user_id = user_id
         self.is_master = is_master
@@ -16,6 +17,9 @@ class Account:
         self.subscription_expiry = subscription_expiry
         self.is_logged_in = False
 
+        # Own allocation profile (DAILY_SIP_MIN/MAX, MAX_CAP, MIN_CAP); empty = copy the master
+        self.allocation_params = allocation_params or {}
+
         # Broker information
         self.broker = broker
 
@@ -41,14 +45,41 @@ class Account:
             return pyotp.TOTP(self.auth_params['totp_secret']).now()
         return None
 
-    def login(self):
-        """Login to the appropriate broker platform."""
+    def login(self, use_cache=True):
+        """
+        Login to the appropriate broker platform.
+
+        A session saved earlier today for the same credentials is resumed
+        after one cheap check call instead of a full login; if the broker
+        rejects it, the saved entry is dropped and a full login follows. A
+        fresh session is kept for later runs once the cache is flushed
+        (OrderManager.login_all does so after every account).
+        """
         try:
             self.broker_handler = BrokerFactory.get_broker_handler(self.broker)
+
+            session_cache = get_session_cache() if use_cache else None
+            state = session_cache.get(self.broker, self.user_id, self.auth_params) if session_cache else None
+            if state:
+                if self.broker_handler.restore_session(self.auth_params, state):
+                    self.is_logged_in = True
+                    print(f"Resumed cached {self.broker} session for account {self.user_id}")
+                    return True
+                print(f"Cached {self.broker} session for account {self.user_id} is no longer valid")
+                session_cache.discard(self.broker, self.user_id)
+                self.broker_handler = BrokerFactory.get_broker_handler(self.broker)
+
             success = self.broker_handler.login(self.auth_params)
 
             if success:
                 self.is_logged_in = True
+                if session_cache:
+                    # The cache is only an optimisation; failing to save must not fail the login
+                    try:
+                        session_cache.put(self.broker, self.user_id, self.auth_params,
+                                          self.broker_handler.export_session())
+                    except Exception as e:
+                        print(f"Could not cache {self.broker} session for account {self.user_id}: {str(e)}")
                 print(f"Successfully logged in to {self.broker} for account {self.user_id}")
                 return True
             else:
@@ -77,3 +108,32 @@ class Account:
         except Exception as e:
             print(f"Error placing order for account {self.user_id}: {str(e)}")
             return False
+
+    def place_orders_batch(self, orders):
+        """
+        Place a basket of orders in one handler call (see BaseBrokerHandler.place_orders_batch).
+
+        Returns:
+            list: One response per order, False where the order could not be placed
+        """
+        if not self.is_logged_in:
+            print(f"Account {self.user_id} is not logged in. Cannot place orders.")
+            return [False] * len(orders)
+
+        try:
+            return self.broker_handler.place_orders_batch(orders)
+        except Exception as e:
+            print(f"Error placing orders for account {self.user_id}: {str(e)}")
+            return [False] * len(orders)
+
+    def get_order_book(self):
+        """The day's orders in the broker-neutral form of BaseBrokerHandler.get_order_book, or None."""
+        if not self.is_logged_in:
+            print(f"Account {self.user_id} is not logged in. Cannot fetch orders.")
+            return None
+
+        try:
+            return self.broker_handler.get_order_book()
+        except Exception as e:
+            print(f"Error fetching order book for account {self.user_id}: {str(e)}")
+            return None
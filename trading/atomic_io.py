@@ -0,0 +1,36 @@
+# atomic_io.py
+import os
+import threading
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_write(path, mode='w', permissions=None, **open_kwargs):
+    """
+    Write a file under a temporary name and move it over path once the block completes.
+
+    Readers see either the previous file or the complete new one. If the block
+    raises, the temporary file is removed and path is left untouched.
+
+    Args:
+        path (str): Final file path
+        mode (str): 'w' or 'wb'
+        permissions (int): Mode bits for the new file (e.g. 0o600), default per umask
+        **open_kwargs: Passed to open(), e.g. newline=''
+
+    Yields:
+        file: The open temporary file
+    """
+    # Unique per thread as well, since several threads of a process may save the same file
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        if permissions is None:
+            file = open(temp_path, mode, **open_kwargs)
+        else:
+            file = open(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, permissions), mode, **open_kwargs)
+        with file:
+            yield file
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
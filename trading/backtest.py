@@ -0,0 +1,204 @@
+# backtest.py
+import argparse
+import importlib
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+
+import pandas as pd
+
+from filter_etfs import STRATEGIES, calculate_quantities, run_strategy
+from snapshot_cache import load_snapshot
+
+SNAPSHOT_PATTERN = re.compile(r'^ETF_Data_(\d{4}-\d{2}-\d{2})\.csv$')
+
+
+def find_snapshots(directory='.', start=None, end=None):
+    """
+    Find stored ETF_Data_YYYY-MM-DD.csv snapshots within a date range.
+
+    Args:
+        directory (str): Directory holding the snapshots
+        start (str): First date to include (YYYY-MM-DD), or None for no lower bound
+        end (str): Last date to include (YYYY-MM-DD), or None for no upper bound
+
+    Returns:
+        list: (date, path) tuples sorted by date
+    """
+    snapshots = []
+    for file_name in os.listdir(directory):
+        match = SNAPSHOT_PATTERN.match(file_name)
+        if not match:
+            continue
+        date = match.group(1)
+        if (start and date < start) or (end and date > end):
+            continue
+        snapshots.append((date, os.path.join(directory, file_name)))
+    return sorted(snapshots)
+
+
+def load_strategy(spec):
+    """Resolve a registered strategy name or a 'module:function' spec to a callable."""
+    if ':' not in spec and spec in STRATEGIES:
+        return partial(run_strategy, strategy=spec)
+    module_name, _, function_name = spec.partition(':')
+    return getattr(importlib.import_module(module_name), function_name or 'calculate_quantities')
+
+
+def snapshot_prices(etf_data):
+    """Return a SYMBOL -> LTP mapping for every ETF in a snapshot."""
+    columns = etf_data.columns.str.strip().str.replace(" ", "_").str.upper()
+    symbols = etf_data.iloc[:, list(columns).index('SYMBOL')].astype(str).str.strip()
+    ltp = pd.to_numeric(etf_data.iloc[:, list(columns).index('LTP')], errors='coerce')
+    prices = pd.Series(ltp.to_numpy(), index=symbols.to_numpy()).dropna()
+    return prices[prices > 0].to_dict()
+
+
+def run_day(date, etf_data, strategy=calculate_quantities):
+    """
+    Run a strategy on one snapshot and simulate fills at LTP.
+
+    Args:
+        date (str): Snapshot date
+        etf_data (DataFrame): Raw or typed snapshot
+        strategy (callable): Takes the snapshot and returns a frame with SYMBOL, QTY and LTP
+
+    Returns:
+        dict: Date, filled orders ({symbol: (qty, price)}), allocated amount and closing prices
+    """
+    prices = snapshot_prices(etf_data)
+
+    selected = strategy(etf_data.copy())
+
+    orders = {}
+    allocated = 0.0
+    if selected is not None and not selected.empty:
+        for symbol, qty, price in zip(selected['SYMBOL'], selected['QTY'], selected['LTP']):
+            if qty > 0:
+                orders[str(symbol).strip()] = (int(qty), float(price))
+        if 'ALLOCATED_AMOUNT' in selected.columns:
+            allocated = float(selected['ALLOCATED_AMOUNT'].sum())
+
+    return {'date': date, 'orders': orders, 'allocated': allocated, 'prices': prices}
+
+
+def _run_snapshot(task):
+    """Process pool entry point: load one snapshot and run the strategy on it."""
+    date, path, strategy = task
+    return run_day(date, load_snapshot(path), strategy)
+
+
+def summarize(day_results):
+    """
+    Combine independent per-day results into per-day and cumulative figures.
+
+    Holdings are carried forward and marked to each day's LTP (falling back to the
+    last seen price for symbols missing from a snapshot).
+
+    Args:
+        day_results (list): Output of run_day, in any order
+
+    Returns:
+        DataFrame: One row per day with allocation, cost basis, market value and P&L
+    """
+    holdings = {}
+    last_prices = {}
+    cumulative_allocated = 0.0
+    cost_basis = 0.0
+    rows = []
+
+    for day in sorted(day_results, key=lambda result: result['date']):
+        last_prices.update(day['prices'])
+
+        day_cost = 0.0
+        for symbol, (qty, price) in day['orders'].items():
+            holdings[symbol] = holdings.get(symbol, 0) + qty
+            day_cost += qty * price
+
+        cumulative_allocated += day['allocated']
+        cost_basis += day_cost
+        market_value = sum(qty * last_prices.get(symbol, 0.0) for symbol, qty in holdings.items())
+        pnl = market_value - cost_basis
+
+        rows.append({
+            'DATE': day['date'],
+            'ETFS': len(day['orders']),
+            'ALLOCATED': day['allocated'],
+            'COST': day_cost,
+            'CUMULATIVE_ALLOCATED': cumulative_allocated,
+            'COST_BASIS': cost_basis,
+            'MARKET_VALUE': market_value,
+            'PNL': pnl,
+            'PNL_PCT': (pnl / cost_basis * 100) if cost_basis else 0.0
+        })
+
+    return pd.DataFrame(rows, columns=[
+        'DATE', 'ETFS', 'ALLOCATED', 'COST', 'CUMULATIVE_ALLOCATED',
+        'COST_BASIS', 'MARKET_VALUE', 'PNL', 'PNL_PCT'
+    ])
+
+
+def run_backtest(directory='.', start=None, end=None, strategy=calculate_quantities, workers=None):
+    """
+    Replay stored snapshots through a strategy, fanning the days out across processes.
+
+    Args:
+        directory (str): Directory holding ETF_Data_*.csv snapshots
+        start (str): First date (YYYY-MM-DD), inclusive
+        end (str): Last date (YYYY-MM-DD), inclusive
+        strategy (callable): Module-level function (picklable) applied to each snapshot
+        workers (int): Process pool size, defaults to the CPU count
+
+    Returns:
+        DataFrame: Per-day and cumulative report from summarize()
+    """
+    snapshots = find_snapshots(directory, start, end)
+    if not snapshots:
+        print("No snapshots found for the requested date range.")
+        return summarize([])
+
+    tasks = [(date, path, strategy) for date, path in snapshots]
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(tasks) == 1:
+        day_results = [_run_snapshot(task) for task in tasks]
+    else:
+        chunksize = max(1, len(tasks) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            day_results = list(executor.map(_run_snapshot, tasks, chunksize=chunksize))
+
+    return summarize(day_results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest ETF selection over stored NSE snapshots.")
+    parser.add_argument('--dir', default='.', help="Directory holding ETF_Data_*.csv files")
+    parser.add_argument('--start', help="First date (YYYY-MM-DD)")
+    parser.add_argument('--end', help="Last date (YYYY-MM-DD)")
+    parser.add_argument('--strategy', default='dynamic',
+                        help="Registered strategy name or module:function")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes")
+    parser.add_argument('--output', help="Optional CSV path for the report")
+    args = parser.parse_args()
+
+    started = datetime.now()
+    report = run_backtest(args.dir, args.start, args.end, load_strategy(args.strategy), args.workers)
+    elapsed = (datetime.now() - started).total_seconds()
+
+    print(report.to_string(index=False))
+    if not report.empty:
+        final = report.iloc[-1]
+        print(f"\nDays: {len(report)} in {elapsed:.2f}s")
+        print(f"Cost basis: ₹{final['COST_BASIS']:.2f}")
+        print(f"Market value: ₹{final['MARKET_VALUE']:.2f}")
+        print(f"P&L: ₹{final['PNL']:.2f} ({final['PNL_PCT']:.2f}%)")
+
+    if args.output:
+        report.to_csv(args.output, index=False)
+        print(f"Report saved as {args.output}")
+
+
+if __name__ == "__main__":
+    main()
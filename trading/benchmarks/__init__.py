@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+"""Synthetic-data benchmarks for the ETF filter/allocation pipeline (python -m benchmarks.run)."""
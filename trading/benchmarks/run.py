@@ -0,0 +1,211 @@
+# benchmarks/run.py
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import generate_allocation_inputs, write_fixture
+from filter_etfs import allocate_by_severity, allocate_dynamic, preprocess_etfs
+from symbol_cache import SymbolClassificationCache
+
+DEFAULT_SIZES = [250, 5000, 50000, 500000]
+# Rows handed straight to allocate_by_severity; the pipeline only allocates the few
+# dozen ETFs left after deduplication, which hides the engine's per-row cost
+ENGINE_SIZES = [250, 1000, 10000, 100000]
+ENGINE_STAGE = 'allocate_by_severity'
+HISTORY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'history.json')
+
+# Stages reported per size, in pipeline order ("match" is the symbol classification)
+STAGES = ['clean', 'match', 'filter', 'dedup', 'allocation']
+
+# Slowdown versus the previous run that is reported as a regression
+REGRESSION_THRESHOLD = 0.25
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def time_pipeline(etf_data, cache_path):
+    """
+    Run preprocessing and dynamic allocation once and return per-stage milliseconds.
+
+    The classification cache starts empty, so "match" measures classifying every
+    symbol rather than a warm-cache lookup.
+    """
+    if os.path.exists(cache_path):
+        os.remove(cache_path)
+    cache = SymbolClassificationCache(cache_path)
+
+    started = time.perf_counter()
+    prepared = preprocess_etfs(etf_data, classification_cache=cache)
+    allocation_started = time.perf_counter()
+    allocate_dynamic(prepared)
+    finished = time.perf_counter()
+
+    timings = prepared.attrs['pipeline']['timings_ms']
+    return {
+        'clean': timings['clean'],
+        'match': timings['classify'],
+        'filter': timings['filter'],
+        'dedup': timings['dedup'],
+        'allocation': (finished - allocation_started) * 1000,
+        'total': (finished - started) * 1000
+    }
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, repeat=3, seed=0):
+    """
+    Benchmark the filter/allocation pipeline on synthetic snapshots.
+
+    Args:
+        sizes (list): Snapshot row counts
+        repeat (int): Runs per size; the median of each stage is reported
+        seed (int): Random seed for the generated snapshots
+
+    Returns:
+        dict: Row count (as a string) -> stage -> median milliseconds
+    """
+    results = {}
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        # preprocess_etfs reads the reference table from the working directory
+        os.chdir(work_dir)
+        try:
+            for rows in sizes:
+                etf_data = pd.read_csv(write_fixture(work_dir, rows, seed))
+                runs = [time_pipeline(etf_data, os.path.join(work_dir, 'classification.json'))
+                        for _ in range(repeat)]
+                results[str(rows)] = {stage: round(statistics.median(run[stage] for run in runs), 3)
+                                      for stage in STAGES + ['total']}
+                print(f"{rows:>8} rows: {results[str(rows)]['total']:.1f} ms")
+        finally:
+            os.chdir(previous_dir)
+    return results
+
+
+def run_engine_benchmarks(sizes=ENGINE_SIZES, repeat=3, seed=0):
+    """
+    Benchmark allocate_by_severity() alone on synthetic rows.
+
+    Returns:
+        dict: Row count (as a string) -> median milliseconds
+    """
+    results = {}
+    for rows in sizes:
+        chng, avg_fall, ltp = generate_allocation_inputs(rows, seed)
+        runs = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            allocate_by_severity(chng, avg_fall, ltp)
+            runs.append((time.perf_counter() - started) * 1000)
+        results[str(rows)] = round(statistics.median(runs), 3)
+        print(f"{rows:>8} rows: {ENGINE_STAGE} {results[str(rows)]:.2f} ms "
+              f"({results[str(rows)] * 1000 / rows:.3f} us/row)")
+    return results
+
+
+def load_history(path=HISTORY_FILE):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return []
+
+
+def record_run(results, repeat, path=HISTORY_FILE, engine=None):
+    """Append a run with its environment to the JSON history and return the previous run."""
+    history = load_history(path)
+    previous = history[-1] if history else None
+    history.append({
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'repeat': repeat,
+        'results': results,
+        'engine': engine or {}
+    })
+    with open(path, 'w') as file:
+        json.dump(history, file, indent=2)
+    return previous
+
+
+def compare(results, previous, threshold=REGRESSION_THRESHOLD, engine=None):
+    """
+    Build a per-size, per-stage table of timings against the previous run.
+
+    Engine timings (see run_engine_benchmarks) are listed under ENGINE_STAGE.
+
+    Returns:
+        tuple: (DataFrame with ROWS, STAGE, MS, PREVIOUS_MS, CHANGE_%, list of regressed (rows, stage))
+    """
+    rows = []
+    regressions = []
+
+    def add(size, stage, ms, before):
+        change = (ms / before - 1) * 100 if before else None
+        if change is not None and change > threshold * 100:
+            regressions.append((size, stage))
+        rows.append({'ROWS': int(size), 'STAGE': stage, 'MS': ms,
+                     'PREVIOUS_MS': before, 'CHANGE_%': None if change is None else round(change, 1)})
+
+    previous_results = previous['results'] if previous else {}
+    for size, stages in results.items():
+        for stage in STAGES + ['total']:
+            add(size, stage, stages[stage], previous_results.get(size, {}).get(stage))
+    previous_engine = previous.get('engine', {}) if previous else {}
+    for size, ms in (engine or {}).items():
+        add(size, ENGINE_STAGE, ms, previous_engine.get(size))
+    return pd.DataFrame(rows), regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ETF filter/allocation stages on synthetic snapshots.")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated snapshot row counts")
+    parser.add_argument('--engine-sizes', default=','.join(map(str, ENGINE_SIZES)),
+                        help="Comma-separated row counts for allocate_by_severity alone (empty to skip)")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per size (median is recorded)")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for the synthetic data")
+    parser.add_argument('--history', default=HISTORY_FILE, help="JSON file the results are appended to")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="Fractional slowdown versus the previous run reported as a regression")
+    parser.add_argument('--no-record', action='store_true', help="Do not append this run to the history")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    results = run_benchmarks(sizes, args.repeat, args.seed)
+    engine_sizes = [int(size) for size in args.engine_sizes.split(',') if size]
+    engine = run_engine_benchmarks(engine_sizes, args.repeat, args.seed)
+
+    if args.no_record:
+        history = load_history(args.history)
+        previous = history[-1] if history else None
+    else:
+        previous = record_run(results, args.repeat, args.history, engine)
+        print(f"Results appended to {args.history}")
+
+    table, regressions = compare(results, previous, args.threshold, engine)
+    print(table.to_string(index=False))
+    if previous:
+        print(f"\nCompared with {previous['commit'] or 'unknown commit'} ({previous['timestamp']})")
+    for size, stage in regressions:
+        print(f"Regression: {stage} at {size} rows is more than {args.threshold:.0%} slower")
+
+
+if __name__ == "__main__":
+    main()
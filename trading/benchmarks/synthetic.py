@@ -0,0 +1,127 @@
+# benchmarks/synthetic.py
+import os
+
+import numpy as np
+import pandas as pd
+
+from reference_data import AVERAGE_FALL_FILE
+
+# Index families tracked by NSE ETFs with a plausible average daily fall (%)
+INDEX_FAMILIES = [
+    ("Nifty 50", -0.95), ("Nifty Next 50", -1.12), ("Nifty 100", -0.98),
+    ("Nifty 500", -1.05), ("Nifty Bank", -1.21), ("Nifty IT", -1.34),
+    ("Nifty Pharma", -1.08), ("Nifty Auto", -1.17), ("Nifty FMCG", -0.82),
+    ("Nifty PSU Bank", -1.86), ("Nifty Private Bank", -1.25), ("Nifty Financial Services", -1.15),
+    ("Nifty Midcap 150", -1.32), ("Nifty Smallcap 250", -1.58), ("Nifty Alpha 50", -1.41),
+    ("Nifty 50 Value 20", -0.97), ("Nifty Midcap 150 Momentum 50", -1.47),
+    ("Nifty 200 Quality 30", -0.91), ("Nifty India Consumption", -1.02),
+    ("Nifty Infrastructure", -1.19), ("Nifty Energy", -1.23), ("Nifty CPSE", -1.38),
+    ("Nifty Metal", -1.72), ("Nifty Realty", -1.94), ("BSE Sensex", -0.93),
+    ("BSE Sensex Next 50", -1.09), ("Gold", -0.74), ("Silver", -1.28),
+    ("NASDAQ 100", -1.36), ("Hang Seng", -1.44),
+]
+
+# Debt-like assets, all caught by filter_etfs.DEBT_KEYWORDS
+DEBT_ASSETS = [
+    "Nifty 8-13 yr G-Sec Index (Govt Sec)", "CRISIL IBX Gilt Index - April 2033",
+    "Bharat Bond Index - April 2030", "Nifty PSU Bond Plus SDL Apr 2027 50:50 Index",
+    "CRISIL IBX Financial Services 3-6 Months Debt Index", "Nifty AAA Corporate Bond Index",
+    "Nifty 5 yr Benchmark G-Sec Index (Govt Securities)", "Nifty 1D Rate Index (Treasury)",
+    "Nifty Media Index",
+]
+
+# Assets that match no reference index and fall back to GENERIC_AVERAGE_FALL
+UNMATCHED_ASSETS = ["Nifty EV & New Age Automotive", "BSE Capital Markets & Insurance", "MSCI India"]
+
+# How fund houses decorate the same index name
+ASSET_TEMPLATES = ["{}", "{} Index", "{} TRI", "{} Total Return Index", "{} Index (TRI)"]
+
+# Share of rows per asset kind
+DEBT_SHARE = 0.12
+UNMATCHED_SHARE = 0.05
+
+
+def generate_reference():
+    """Return the average-fall reference table in the layout of average_percentage_fall_indices.csv."""
+    return pd.DataFrame({
+        'Index Name': [name for name, _ in INDEX_FAMILIES],
+        'Average Fall (%)': [fall for _, fall in INDEX_FAMILIES]
+    })
+
+
+def generate_snapshot(rows, seed=0):
+    """
+    Generate an NSE-like ETF snapshot with the raw headers and formatting of the download.
+
+    Args:
+        rows (int): Number of ETFs
+        seed (int): Random seed, so every run benchmarks identical data
+
+    Returns:
+        DataFrame: SYMBOL, UNDERLYING ASSET, prices, %CHNG and comma-formatted VOLUME text
+    """
+    rng = np.random.default_rng(seed)
+
+    # Equity assets drawn from decorated index names, mixed with debt and unmatched assets
+    family = rng.integers(0, len(INDEX_FAMILIES), rows)
+    template = rng.integers(0, len(ASSET_TEMPLATES), rows)
+    assets = np.array([ASSET_TEMPLATES[t].format(INDEX_FAMILIES[f][0]) for f, t in zip(family, template)],
+                      dtype=object)
+    kind = rng.random(rows)
+    debt = kind < DEBT_SHARE
+    unmatched = (kind >= DEBT_SHARE) & (kind < DEBT_SHARE + UNMATCHED_SHARE)
+    assets[debt] = rng.choice(DEBT_ASSETS, debt.sum())
+    assets[unmatched] = rng.choice(UNMATCHED_ASSETS, unmatched.sum())
+
+    prev_close = np.round(rng.lognormal(4.0, 1.2, rows).clip(1, 9000), 2)
+    pct_change = np.round(rng.normal(-0.3, 1.4, rows), 2)
+    ltp = np.round(prev_close * (1 + pct_change / 100), 2)
+    volume = rng.lognormal(11, 2.2, rows).astype(np.int64)
+    # A few ETFs did not trade at all
+    volume[rng.random(rows) < 0.03] = 0
+
+    return pd.DataFrame({
+        'SYMBOL': [f"ETF{i:06d}" for i in range(rows)],
+        'UNDERLYING ASSET': assets,
+        'OPEN': prev_close,
+        'HIGH': np.maximum(prev_close, ltp),
+        'LOW': np.minimum(prev_close, ltp),
+        'PREV. CLOSE': prev_close,
+        'LTP': ltp,
+        'CHNG': np.round(ltp - prev_close, 2),
+        '%CHNG': pct_change,
+        'VOLUME': [f"{value:,}" for value in volume.tolist()],
+        'VALUE': np.round(volume * ltp / 1e7, 2),
+        'NAV': np.round(prev_close * rng.uniform(0.99, 1.01, rows), 2)
+    })
+
+
+def generate_allocation_inputs(rows, seed=0):
+    """
+    Generate the arrays allocate_by_severity() takes, without the preprocessing stages.
+
+    Args:
+        rows (int): Number of ETFs
+        seed (int): Random seed
+
+    Returns:
+        tuple: (%CHNG, AVG_FALL, LTP) float arrays
+    """
+    rng = np.random.default_rng(seed)
+    avg_fall = np.array([fall for _, fall in INDEX_FAMILIES])[rng.integers(0, len(INDEX_FAMILIES), rows)]
+    chng = np.round(rng.normal(-0.3, 1.4, rows), 2)
+    ltp = np.round(rng.lognormal(4.0, 1.2, rows).clip(1, 9000), 2)
+    return chng, avg_fall, ltp
+
+
+def write_fixture(directory, rows, seed=0):
+    """
+    Write a snapshot CSV and the matching reference table into a directory.
+
+    Returns:
+        str: Path of the snapshot CSV
+    """
+    generate_reference().to_csv(os.path.join(directory, AVERAGE_FALL_FILE), index=False)
+    path = os.path.join(directory, f"ETF_Data_synthetic_{rows}.csv")
+    generate_snapshot(rows, seed).to_csv(path, index=False)
+    return path
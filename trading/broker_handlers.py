@@ -1,10 +1,117 @@
 # broker_handlers.py
+import functools
+import threading
+import time
+import uuid
 from abc import ABC, abstractmethod
 
+# Calls per second allowed per broker and endpoint, shared by every account of
+# that broker; the bucket holds one second's worth so short bursts pass unqueued
+RATE_LIMITS = {
+    'FINVASIA': {'login': 2, 'place_order': 10, 'order_status': 10, 'positions': 10},
+    'ZERODHA': {'login': 2, 'place_order': 10, 'order_status': 10, 'positions': 10},
+    'UPSTOX': {'login': 2, 'place_order': 10, 'order_status': 25, 'positions': 25},
+    'DHAN': {'login': 2, 'place_order': 10, 'order_status': 20, 'positions': 20}
+}
+
+
+# Attached to every order where the broker supports tags; the suffix is new for every
+# run, so tag matching never claims an order left by an earlier run the same day
+ORDER_TAG = f"ETF-AUTO-{uuid.uuid4().hex[:6]}"
+
+# Normalized order book entry returned by get_order_book()
+ORDER_BOOK_FIELDS = ['ORDER_ID', 'SYMBOL', 'TAG', 'STATUS', 'QTY', 'FILLED_QTY', 'AVG_PRICE', 'MESSAGE']
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that queues callers instead of rejecting them.
+
+    Each acquire() reserves the next token, even one that has not been refilled
+    yet, and sleeps until it is due, so waiting callers are served in order.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.calls = 0
+        self.waited = 0.0
+        self.max_wait = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until it is available; returns the seconds waited."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = max(0.0, -self.tokens / self.rate)
+            self.calls += 1
+            self.waited += wait
+            self.max_wait = max(self.max_wait, wait)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class RateLimiter:
+    """Token buckets per (broker, endpoint), created on first use from RATE_LIMITS."""
+
+    def __init__(self, limits=RATE_LIMITS):
+        self.limits = limits
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, broker, endpoint):
+        """Bucket for a broker endpoint, or None if the endpoint is not limited."""
+        rate = self.limits.get(broker, {}).get(endpoint)
+        if not rate:
+            return None
+        with self._lock:
+            bucket = self.buckets.get((broker, endpoint))
+            if bucket is None:
+                bucket = self.buckets[(broker, endpoint)] = TokenBucket(rate)
+            return bucket
+
+    def acquire(self, broker, endpoint):
+        """Wait for a call slot; returns the seconds waited."""
+        bucket = self.bucket(broker, endpoint)
+        return bucket.acquire() if bucket else 0.0
+
+    def report(self):
+        """Calls and queueing delay per (broker, endpoint), for tuning RATE_LIMITS."""
+        with self._lock:
+            buckets = dict(self.buckets)
+        return {
+            key: {'calls': bucket.calls, 'waited': round(bucket.waited, 3), 'max_wait': round(bucket.max_wait, 3),
+                  'avg_wait': round(bucket.waited / bucket.calls, 3) if bucket.calls else 0.0}
+            for key, bucket in sorted(buckets.items())
+        }
+
+
+# Shared by every handler instance in the process
+rate_limiter = RateLimiter()
+
+
+def rate_limited(endpoint):
+    """Make a handler method wait for its broker's token for endpoint before running."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            rate_limiter.acquire(self.broker, endpoint)
+            return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
 
 class BaseBrokerHandler(ABC):
     """Abstract base class for broker handlers."""
 
+    broker = None  # Key into RATE_LIMITS
+
     def __init__(self, session=None):
         self.session = session
 
@@ -28,10 +135,80 @@ class BaseBrokerHandler(ABC):
         """Get status of an order."""
         pass
 
+    def place_orders_batch(self, orders):
+        """
+        Place a basket of orders, returning one response per order in the same order.
+
+        Handlers override this where the broker accepts several orders in one
+        request; the default submits the basket through place_order() one order
+        at a time. Callers already hold a broker_slots slot, so threads here
+        would multiply the per-broker concurrency cap.
+
+        Args:
+            orders (list): Dicts with place_order() keyword arguments (symbol, quantity,
+                           price, order_type, transaction_type)
+
+        Returns:
+            list: Broker response per order (None where the order failed)
+        """
+        return [self.place_order(**order) for order in orders]
+
+    def get_order_book(self):
+        """
+        Every order of the day in one call, as dicts with ORDER_BOOK_FIELDS keys.
+
+        Returns None if the book could not be fetched, so callers can tell a
+        failed fetch from an empty book.
+        """
+        return None
+
+    @staticmethod
+    def order_id(response):
+        """Order id in a place_order() response (Finvasia norenordno, Zerodha id string, Upstox/Dhan fields)."""
+        def as_id(value):
+            # bool is an int subclass, but True/False are never order ids
+            if isinstance(value, bool):
+                return None
+            if isinstance(value, int) or (isinstance(value, str) and value.strip()):
+                return str(value).strip()
+            return None
+
+        if isinstance(response, (str, int)):
+            return as_id(response)
+        if isinstance(response, dict):
+            for key in ('norenordno', 'order_id', 'orderId'):
+                if as_id(response.get(key)):
+                    return as_id(response[key])
+            return None
+        # Upstox SDK models: the entry itself or its data payload
+        for source in (response, getattr(response, 'data', None)):
+            if as_id(getattr(source, 'order_id', None)):
+                return as_id(source.order_id)
+        return None
+
+    def export_session(self):
+        """State needed to resume the current session without logging in, or None if not resumable."""
+        return None
+
+    def restore_session(self, auth_params, state):
+        """
+        Resume a session from export_session() state without a full login.
+
+        Implementations confirm the session with one cheap logged-in call, so a
+        token that expired or was revoked by a login elsewhere is not reused.
+
+        Returns:
+            bool: True only if the broker accepted the restored session
+        """
+        return False
+
 
 class FinvasiaBrokerHandler(BaseBrokerHandler):
     """Handler for Finvasia/Shoonya broker using existing login code."""
 
+    broker = 'FINVASIA'
+
+    @rate_limited('login')
     def login(self, auth_params):
         """Login to Finvasia/Shoonya using the existing approach."""
         try:
@@ -68,6 +245,7 @@ class FinvasiaBrokerHandler(BaseBrokerHandler):
 
             # Check if login was successful
             if response and 'stat' in response and response['stat'] == 'Ok':
+                self.susertoken = response.get('susertoken')
                 return True
             else:
                 error_msg = response.get('emsg', 'Unknown error') if response else 'No response'
@@ -78,6 +256,7 @@ class FinvasiaBrokerHandler(BaseBrokerHandler):
             print(f"Error in Finvasia login: {str(e)}")
             return False
 
+    @rate_limited('place_order')
     def place_order(self, symbol, quantity, price=None, order_type="MARKET", transaction_type="BUY"):
         """Place an order with Finvasia/Shoonya."""
         try:
@@ -100,7 +279,8 @@ class FinvasiaBrokerHandler(BaseBrokerHandler):
                 price_type=price_type,
                 price=price if price else 0,
                 retention="DAY",  # This seems to be required as well
-                amo=None  # Including this for completeness
+                amo=None,  # Including this for completeness
+                remarks=ORDER_TAG
             )
 
             return response
@@ -108,6 +288,7 @@ class FinvasiaBrokerHandler(BaseBrokerHandler):
             print(f"Error placing Finvasia order: {str(e)}")
             return None
 
+    @rate_limited('positions')
     def get_positions(self):
         """Get current positions from Finvasia."""
         try:
@@ -120,6 +301,7 @@ class FinvasiaBrokerHandler(BaseBrokerHandler):
             print(f"Error getting Finvasia positions: {str(e)}")
             return []
 
+    @rate_limited('order_status')
     def get_order_status(self, order_id):
         """Get order status from Finvasia."""
         try:
@@ -132,10 +314,62 @@ class FinvasiaBrokerHandler(BaseBrokerHandler):
             print(f"Error getting Finvasia order status: {str(e)}")
             return None
 
+    @rate_limited('order_status')
+    def get_order_book(self):
+        """Get the day's orders from Finvasia."""
+        try:
+            if not self.session:
+                print("Not logged in to Finvasia")
+                return None
+
+            # An empty book comes back as a Not_Ok stat instead of a list
+            book = self.session.get_order_book()
+            if not isinstance(book, list):
+                return []
+            return [{
+                'ORDER_ID': entry.get('norenordno'),
+                'SYMBOL': entry.get('tsym'),
+                'TAG': entry.get('remarks'),
+                'STATUS': entry.get('status'),
+                'QTY': entry.get('qty'),
+                'FILLED_QTY': entry.get('fillshares', 0),
+                'AVG_PRICE': entry.get('avgprc'),
+                'MESSAGE': entry.get('rejreason')
+            } for entry in book]
+        except Exception as e:
+            print(f"Error getting Finvasia order book: {str(e)}")
+            return None
+
+    def export_session(self):
+        """The session token issued at login."""
+        token = getattr(self, 'susertoken', None)
+        return {'susertoken': token} if token else None
+
+    def restore_session(self, auth_params, state):
+        """Attach a saved susertoken to a fresh NorenApi client and check it with get_limits."""
+        try:
+            from NorenRestApiPy.NorenApi import NorenApi
+            self.session = NorenApi("https://api.shoonya.com/NorenWClientTP/",
+                                    "wss://api.shoonya.com/NorenWSTP/")
+            self.session.set_session(userid=auth_params.get('user_id'), password=auth_params.get('password'),
+                                     usertoken=state['susertoken'])
+            self.susertoken = state['susertoken']
+
+            # Cheapest logged-in call; a stale token comes back as Not_Ok
+            rate_limiter.acquire(self.broker, 'positions')
+            response = self.session.get_limits()
+            return bool(response) and response.get('stat') == 'Ok'
+        except Exception as e:
+            print(f"Error restoring Finvasia session: {str(e)}")
+            return False
+
 
 class ZerodhaBrokerHandler(BaseBrokerHandler):
     """Handler for Zerodha broker."""
 
+    broker = 'ZERODHA'
+
+    @rate_limited('login')
     def login(self, auth_params):
         """Login to Zerodha."""
         try:
@@ -160,6 +394,7 @@ class ZerodhaBrokerHandler(BaseBrokerHandler):
             print(f"Error in Zerodha login: {str(e)}")
             return False
 
+    @rate_limited('place_order')
     def place_order(self, symbol, quantity, price=None, order_type="MARKET", transaction_type="BUY"):
         """Place an order with Zerodha."""
         try:
@@ -175,7 +410,8 @@ class ZerodhaBrokerHandler(BaseBrokerHandler):
                 quantity=quantity,
                 product="CNC",
                 order_type=zerodha_order_type,
-                price=price if price and order_type != "MARKET" else None
+                price=price if price and order_type != "MARKET" else None,
+                tag=ORDER_TAG
             )
 
             return response
@@ -183,6 +419,7 @@ class ZerodhaBrokerHandler(BaseBrokerHandler):
             print(f"Error placing Zerodha order: {str(e)}")
             return None
 
+    @rate_limited('positions')
     def get_positions(self):
         """Get current positions from Zerodha."""
         try:
@@ -191,6 +428,7 @@ class ZerodhaBrokerHandler(BaseBrokerHandler):
             print(f"Error getting positions: {str(e)}")
             return []
 
+    @rate_limited('order_status')
     def get_order_status(self, order_id):
         """Get order status from Zerodha."""
         try:
@@ -199,10 +437,31 @@ class ZerodhaBrokerHandler(BaseBrokerHandler):
             print(f"Error getting order status: {str(e)}")
             return None
 
+    @rate_limited('order_status')
+    def get_order_book(self):
+        """Get the day's orders from Zerodha."""
+        try:
+            return [{
+                'ORDER_ID': entry.get('order_id'),
+                'SYMBOL': entry.get('tradingsymbol'),
+                'TAG': entry.get('tag'),
+                'STATUS': entry.get('status'),
+                'QTY': entry.get('quantity'),
+                'FILLED_QTY': entry.get('filled_quantity', 0),
+                'AVG_PRICE': entry.get('average_price'),
+                'MESSAGE': entry.get('status_message')
+            } for entry in self.session.orders()]
+        except Exception as e:
+            print(f"Error getting order book: {str(e)}")
+            return None
+
 
 class UpstoxBrokerHandler(BaseBrokerHandler):
     """Handler for Upstox broker."""
 
+    broker = 'UPSTOX'
+
+    @rate_limited('login')
     def login(self, auth_params):
         """Login to Upstox."""
         try:
@@ -229,6 +488,7 @@ class UpstoxBrokerHandler(BaseBrokerHandler):
             print(f"Error in Upstox login: {str(e)}")
             return False
 
+    @rate_limited('place_order')
     def place_order(self, symbol, quantity, price=None, order_type="MARKET", transaction_type="BUY"):
         """Place order using Upstox API."""
         try:
@@ -239,7 +499,7 @@ class UpstoxBrokerHandler(BaseBrokerHandler):
                 product="D",  # Delivery
                 validity="DAY",
                 price=price if price else 0,
-                tag="ETF-AUTO",
+                tag=ORDER_TAG,
                 instrument_token=symbol,  # Would need mapping for actual instrument token
                 order_type="MARKET" if order_type == "MARKET" else "LIMIT",
                 transaction_type=transaction_type,
@@ -252,6 +512,56 @@ class UpstoxBrokerHandler(BaseBrokerHandler):
             print(f"Error placing Upstox order: {str(e)}")
             return None
 
+    def place_orders_batch(self, orders):
+        """Place the basket with one multi-order request, falling back to single orders if unsupported."""
+        try:
+            from upstox_client.models import MultiOrderRequest
+            place_multi_order = self.session.place_multi_order
+        except (ImportError, AttributeError):
+            return super().place_orders_batch(orders)
+
+        try:
+            order_requests = [
+                MultiOrderRequest(
+                    quantity=order['quantity'],
+                    product="D",  # Delivery
+                    validity="DAY",
+                    price=order.get('price') or 0,
+                    tag=ORDER_TAG,
+                    instrument_token=order['symbol'],  # Would need mapping for actual instrument token
+                    order_type="MARKET" if order.get('order_type', "MARKET") == "MARKET" else "LIMIT",
+                    transaction_type=order.get('transaction_type', "BUY"),
+                    disclosed_quantity=0,
+                    trigger_price=0,
+                    is_amo=False,
+                    slice=False,
+                    correlation_id=str(position)
+                )
+                for position, order in enumerate(orders)
+            ]
+            # One request for the whole basket, so one token
+            rate_limiter.acquire(self.broker, 'place_order')
+            response = place_multi_order(order_requests)
+        except Exception as e:
+            print(f"Error placing Upstox multi order: {str(e)}")
+            return [None] * len(orders)
+
+        # Order ids come back tagged with the correlation id of their request; entries
+        # that cannot be mapped stay None and are matched by ORDER_TAG on reconciliation
+        responses = [None] * len(orders)
+        for entry in getattr(response, 'data', None) or []:
+            try:
+                position = int(getattr(entry, 'correlation_id', None))
+            except (TypeError, ValueError):
+                print(f"Upstox multi order entry without a usable correlation id: {entry}")
+                continue
+            if 0 <= position < len(orders):
+                responses[position] = entry
+        for error in getattr(response, 'errors', None) or []:
+            print(f"Upstox multi order rejected: {getattr(error, 'message', error)}")
+        return responses
+
+    @rate_limited('positions')
     def get_positions(self):
         """Get positions from Upstox."""
         try:
@@ -260,6 +570,7 @@ class UpstoxBrokerHandler(BaseBrokerHandler):
             print(f"Error getting positions: {str(e)}")
             return []
 
+    @rate_limited('order_status')
     def get_order_status(self, order_id):
         """Get order status from Upstox."""
         try:
@@ -268,10 +579,32 @@ class UpstoxBrokerHandler(BaseBrokerHandler):
             print(f"Error getting order status: {str(e)}")
             return None
 
+    @rate_limited('order_status')
+    def get_order_book(self):
+        """Get the day's orders from Upstox."""
+        try:
+            response = self.session.get_order_book(api_version="2.0")
+            return [{
+                'ORDER_ID': entry.order_id,
+                'SYMBOL': entry.trading_symbol,
+                'TAG': entry.tag,
+                'STATUS': entry.status,
+                'QTY': entry.quantity,
+                'FILLED_QTY': entry.filled_quantity or 0,
+                'AVG_PRICE': entry.average_price,
+                'MESSAGE': entry.status_message
+            } for entry in response.data or []]
+        except Exception as e:
+            print(f"Error getting order book: {str(e)}")
+            return None
+
 
 class DhanBrokerHandler(BaseBrokerHandler):
     """Handler for Dhan broker based on v2 API documentation."""
 
+    broker = 'DHAN'
+
+    @rate_limited('login')
     def login(self, auth_params):
         """Login to Dhan."""
         try:
@@ -310,6 +643,7 @@ class DhanBrokerHandler(BaseBrokerHandler):
             print(f"Error in Dhan login: {str(e)}")
             return False
 
+    @rate_limited('place_order')
     def place_order(self, symbol, quantity, price=None, order_type="MARKET", transaction_type="BUY"):
         """Place order using Dhan API."""
         try:
@@ -321,7 +655,8 @@ class DhanBrokerHandler(BaseBrokerHandler):
                 "quantity": quantity,  # Integer
                 "validity": "DAY",  # DAY, IOC, FOK
                 "productType": "DELIVERY",  # DELIVERY, INTRADAY, MARGIN
-                "orderType": "MARKET" if order_type == "MARKET" else "LIMIT"
+                "orderType": "MARKET" if order_type == "MARKET" else "LIMIT",
+                "correlationId": ORDER_TAG
             }
 
             # Add price for limit orders
@@ -344,6 +679,7 @@ class DhanBrokerHandler(BaseBrokerHandler):
             print(f"Error placing Dhan order: {str(e)}")
             return None
 
+    @rate_limited('positions')
     def get_positions(self):
         """Get positions from Dhan."""
         try:
@@ -359,6 +695,7 @@ class DhanBrokerHandler(BaseBrokerHandler):
             print(f"Error getting positions: {str(e)}")
             return []
 
+    @rate_limited('order_status')
     def get_order_status(self, order_id):
         """Get order status from Dhan."""
         try:
@@ -374,10 +711,37 @@ class DhanBrokerHandler(BaseBrokerHandler):
             print(f"Error getting order status: {str(e)}")
             return None
 
+    @rate_limited('order_status')
+    def get_order_book(self):
+        """Get the day's orders from Dhan."""
+        try:
+            response = self.session.get('https://api.dhan.co/orders')
+
+            if response.status_code != 200:
+                print(f"Failed to fetch order book: {response.status_code} - {response.text}")
+                return None
+
+            return [{
+                'ORDER_ID': entry.get('orderId'),
+                'SYMBOL': entry.get('tradingSymbol'),
+                'TAG': entry.get('correlationId'),
+                'STATUS': entry.get('orderStatus'),
+                'QTY': entry.get('quantity'),
+                'FILLED_QTY': entry.get('filledQty', 0),
+                'AVG_PRICE': entry.get('averageTradedPrice'),
+                'MESSAGE': entry.get('omsErrorDescription')
+            } for entry in response.json()]
+        except Exception as e:
+            print(f"Error getting order book: {str(e)}")
+            return None
+
 
 class MstockBrokerHandler(BaseBrokerHandler):
     """Handler for Mstock broker."""
 
+    broker = 'MSTOCK'
+
+    @rate_limited('login')
     def login(self, auth_params):
         """Login to Mstock."""
         try:
@@ -389,6 +753,7 @@ class MstockBrokerHandler(BaseBrokerHandler):
             print(f"Error in Mstock login: {str(e)}")
             return False
 
+    @rate_limited('place_order')
     def place_order(self, symbol, quantity, price=None, order_type="MARKET", transaction_type="BUY"):
         """Place order using Mstock API."""
         try:
@@ -399,6 +764,7 @@ class MstockBrokerHandler(BaseBrokerHandler):
             print(f"Error placing Mstock order: {str(e)}")
             return None
 
+    @rate_limited('positions')
     def get_positions(self):
         """Get positions from Mstock."""
         try:
@@ -408,6 +774,7 @@ class MstockBrokerHandler(BaseBrokerHandler):
             print(f"Error getting positions: {str(e)}")
             return []
 
+    @rate_limited('order_status')
     def get_order_status(self, order_id):
         """Get order status from Mstock."""
         try:
@@ -417,6 +784,11 @@ class MstockBrokerHandler(BaseBrokerHandler):
             print(f"Error getting order status: {str(e)}")
             return None
 
+    def get_order_book(self):
+        """Get the day's orders from Mstock."""
+        # Placeholder implementation
+        return []
+
 
 class BrokerFactory:
     """Factory class for getting appropriate broker handler."""
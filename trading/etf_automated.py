@@ -1,45 +1,113 @@
 # etf_automated.py
-from fetch_etf_data import fetch_etf_data
-from filter_etfs import calculate_quantities
+from fetch_etf_data import (
+    COOKIE_BOOTSTRAPS, COOKIE_MODE, COOKIE_MODES, CookiesRejectedError, clear_cookie_cache,
+    download_snapshot, load_cached_cookies, snapshot_file_name
+)
+from filter_etfs import allocate_dynamic, preprocess_etfs
 from order_manager import OrderManager
-import pandas as pd
+from snapshot_cache import load_snapshot
+import logging
+import os
+import random
 import time
 
-MAX_RETRIES = 3  # Maximum number of retry attempts
-RETRY_DELAY = 5  # Delay between retries (in seconds)
+MAX_RETRIES = 5  # Maximum number of attempts per run
+RETRY_BASE_DELAY = 2  # First backoff window (in seconds), doubled after every failure
+RETRY_MAX_DELAY = 60  # Upper bound of the backoff window (in seconds)
+REUSE_TODAYS_FILE = True  # Skip the download if today's CSV is already on disk
+LOG_LEVEL = os.getenv('ETF_LOG_LEVEL', 'INFO')  # DEBUG also prints the selection tables
 
-if __name__ == "__main__":
-    print("Starting ETF trading program...")
+def retry_delay(failures, base=RETRY_BASE_DELAY, cap=RETRY_MAX_DELAY):
+    """Exponential backoff with full jitter: a random delay up to base * 2^(failures - 1)."""
+    return random.uniform(0, min(cap, base * 2 ** (failures - 1)))
 
-    # Step 1: Fetch ETF Data with Retry
-    retry_count = 0
-    etf_csv_file = None
-    # etf_csv_file = 'ETF_Data_2025-04-21.csv'
 
-    while retry_count < MAX_RETRIES:
-        print(f"Attempt {retry_count + 1} to fetch ETF data...")
-        etf_csv_file = fetch_etf_data()
+def fetch_todays_snapshot(max_retries=MAX_RETRIES, mode=COOKIE_MODE):
+    """
+    Fetch today's ETF data, retrying only the stage that failed.
+
+    Today's CSV is reused if it is already on disk. Cookies survive a failed
+    download and are only bootstrapped again when NSE rejects them; in 'auto'
+    mode a failed or rejected HTTP bootstrap moves on to Selenium. Transient
+    failures back off exponentially with jitter.
+
+    Returns:
+        tuple: (file name, typed DataFrame), or (None, None) if every attempt failed
+    """
+    file_name = snapshot_file_name()
+    if REUSE_TODAYS_FILE and os.path.exists(file_name):
+        print(f"Reusing today's ETF data: {file_name}")
+        return file_name, load_snapshot(file_name)
+
+    bootstraps = COOKIE_MODES[mode]
+    bootstrap = 0
+    cookies = load_cached_cookies()
+    cookie_source = 'cache' if cookies else None
+    failures = 0
+
+    for attempt in range(1, max_retries + 1):
+        print(f"Attempt {attempt} to fetch ETF data...")
+
+        # Stage 1: cookies, skipped while the current ones have not been rejected
+        if not cookies:
+            cookie_source = bootstraps[bootstrap]
+            cookies = COOKIE_BOOTSTRAPS[cookie_source]()
+            if not cookies:
+                print(f"Cookie bootstrap ({cookie_source}) failed.")
+                bootstrap = min(bootstrap + 1, len(bootstraps) - 1)
+                failures += 1
+                if attempt < max_retries:
+                    delay = retry_delay(failures)
+                    print(f"Retrying in {delay:.1f} seconds...")
+                    time.sleep(delay)
+                continue
+
+        # Stage 2: the CSV download, retried with the same cookies on transient errors
+        try:
+            file_name, etf_data = download_snapshot(cookies)
+        except CookiesRejectedError as e:
+            # Not transient: bootstrap new cookies on the next attempt right away
+            print(f"Cookies rejected ({e}), fetching new ones.")
+            clear_cookie_cache()
+            if cookie_source != 'cache':
+                bootstrap = min(bootstrap + 1, len(bootstraps) - 1)
+            cookies = None
+            continue
 
-        if etf_csv_file:
+        if file_name:
             print("ETF data successfully fetched.")
-            break  # Exit the loop if fetch is successful
+            return file_name, etf_data
 
-        retry_count += 1
-        if retry_count < MAX_RETRIES:
-            print(f"Retrying in {RETRY_DELAY} seconds...")
-            time.sleep(RETRY_DELAY)
+        failures += 1
+        if attempt < max_retries:
+            delay = retry_delay(failures)
+            print(f"Download failed, retrying with the same cookies in {delay:.1f} seconds...")
+            time.sleep(delay)
+
+    return None, None
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=LOG_LEVEL.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    print("Starting ETF trading program...")
+
+    # Step 1: Fetch ETF Data with Retry
+    etf_csv_file, etf_data = fetch_todays_snapshot()
+    # etf_csv_file = 'ETF_Data_2025-04-21.csv'
 
     if not etf_csv_file:
         print(f"Failed to fetch ETF data after {MAX_RETRIES} attempts. Exiting.")
         exit()
 
-    # Step 2: Load ETF Data
-    print("Loading ETF data...")
-    etf_data = pd.read_csv(etf_csv_file)
+    # Step 2: Load ETF Data (already parsed while downloading)
+    if etf_data is None:
+        print("Loading ETF data...")
+        etf_data = load_snapshot(etf_csv_file)
 
     # Step 3: Filter and Calculate Quantities
     print("Filtering ETFs and calculating quantities...")
-    filtered_etfs = calculate_quantities(etf_data)
+    prepared = preprocess_etfs(etf_data)
+    filtered_etfs = allocate_dynamic(prepared)
     print(filtered_etfs)
     filtered_etfs.to_csv('todays_etf.csv')
 
@@ -58,6 +126,10 @@ if __name__ == "__main__":
 
     # Step 6: Place Orders
     print("Placing orders for filtered ETFs...")
-    order_manager.place_orders(filtered_etfs)
+    order_manager.place_orders(filtered_etfs, prepared)
+
+    # Step 7: Reconcile fills from each account's order book
+    print("Reconciling orders...")
+    order_manager.reconcile_orders()
 
     print("Program completed successfully.")
@@ -0,0 +1,186 @@
+# etf_poller.py
+import argparse
+import logging
+import os
+import time
+from datetime import datetime, timedelta, time as dt_time
+from zoneinfo import ZoneInfo
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from fetch_etf_data import (
+    COOKIE_BOOTSTRAPS, COOKIE_CACHE_FILE, COOKIE_MODE, COOKIE_MODES, NSE_BASE_URL, CookiesRejectedError,
+    clear_cookie_cache, download_snapshot, fetch_cookies_with_http, load_cached_cookies
+)
+from market_store import STORE_ROOT, MarketStore
+
+logger = logging.getLogger(__name__)
+
+MARKET_TIMEZONE = ZoneInfo('Asia/Kolkata')
+MARKET_OPEN = dt_time(9, 15)
+MARKET_CLOSE = dt_time(15, 30)
+POLL_INTERVAL = 60  # Seconds between polls
+MAX_IDLE_SLEEP = 300  # Longest sleep while waiting for the market to open (seconds)
+
+
+def market_is_open(now=None):
+    """True on weekdays between MARKET_OPEN and MARKET_CLOSE, Indian time (holidays are not known)."""
+    now = now or datetime.now(MARKET_TIMEZONE)
+    return now.weekday() < 5 and MARKET_OPEN <= now.time() <= MARKET_CLOSE
+
+
+def seconds_until_open(now=None):
+    """Seconds until the next market open."""
+    now = now or datetime.now(MARKET_TIMEZONE)
+    opening = now.replace(hour=MARKET_OPEN.hour, minute=MARKET_OPEN.minute, second=0, microsecond=0)
+    if now.time() > MARKET_OPEN:
+        opening += timedelta(days=1)
+    while opening.weekday() >= 5:
+        opening += timedelta(days=1)
+    return max(0.0, (opening - now).total_seconds())
+
+
+class ETFPoller:
+    """
+    Sample the NSE ETF table at a fixed interval over one keep-alive session.
+
+    Cookies live in the session and are only bootstrapped again when NSE
+    rejects them, so a normal poll is a single HTTP round-trip. Each snapshot
+    is appended to its date partition of the MarketStore, as the raw CSV plus
+    its columnar snapshot cache, and its symbols are indexed.
+    """
+
+    def __init__(self, store=STORE_ROOT, interval=POLL_INTERVAL, mode=COOKIE_MODE,
+                 base_url=NSE_BASE_URL, cache_path=COOKIE_CACHE_FILE):
+        if mode not in COOKIE_MODES:
+            raise ValueError(f"Unsupported cookie mode: {mode}")
+        self.store = MarketStore(store)
+        self.interval = interval
+        self.mode = mode
+        self.base_url = base_url
+        self.cache_path = cache_path
+
+        # One pooled connection, reused for every poll
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        cookies = load_cached_cookies(cache_path) if cache_path else None
+        if cookies:
+            self.session.cookies.update(cookies)
+        self.stats = {'polls': 0, 'snapshots': 0, 'cookie_refreshes': 0, 'failures': 0}
+
+    def refresh_cookies(self):
+        """Bootstrap new cookies into the session; returns False if every bootstrap failed."""
+        self.session.cookies.clear()
+        self.stats['cookie_refreshes'] += 1
+        for bootstrap in COOKIE_MODES[self.mode]:
+            if bootstrap == 'http':
+                # Lands the cookies directly in the pooled session
+                cookies = fetch_cookies_with_http(self.cache_path, self.base_url, self.session)
+            else:
+                cookies = COOKIE_BOOTSTRAPS[bootstrap](self.cache_path, self.base_url)
+            if cookies:
+                self.session.cookies.update(cookies)
+                return True
+        return False
+
+    def poll_once(self, timestamp=None):
+        """
+        Take one snapshot.
+
+        Returns:
+            tuple: (file name, typed DataFrame), or (None, None) if the poll failed
+        """
+        timestamp = timestamp or datetime.now(MARKET_TIMEZONE)
+        file_name = self.store.snapshot_path(timestamp)
+        os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        self.stats['polls'] += 1
+
+        # Snapshots are write-once; never replace one taken in the same millisecond
+        if os.path.exists(file_name):
+            logger.warning("Snapshot %s already exists, skipping this poll.", file_name)
+            self.stats['failures'] += 1
+            return None, None
+
+        if not self.session.cookies and not self.refresh_cookies():
+            self.stats['failures'] += 1
+            return None, None
+
+        started = time.perf_counter()
+        try:
+            file_name, etf_data = download_snapshot(None, self.base_url, file_name, self.session)
+        except CookiesRejectedError as e:
+            logger.info("Cookies rejected (%s), refreshing.", e)
+            if self.cache_path:
+                clear_cookie_cache(self.cache_path)
+            if not self.refresh_cookies():
+                self.stats['failures'] += 1
+                return None, None
+            try:
+                file_name, etf_data = download_snapshot(None, self.base_url, file_name, self.session)
+            except CookiesRejectedError as e:
+                logger.error("Fresh cookies rejected (%s).", e)
+                file_name, etf_data = None, None
+
+        if not file_name:
+            self.stats['failures'] += 1
+            return None, None
+        self.store.register(timestamp.strftime('%Y-%m-%d'), etf_data['SYMBOL'])
+        self.stats['snapshots'] += 1
+        logger.info("Snapshot %s: %d rows in %.2fs", file_name, len(etf_data), time.perf_counter() - started)
+        return file_name, etf_data
+
+    def run(self, max_polls=None, ignore_hours=False):
+        """
+        Poll every interval while the market is open, until it closes.
+
+        Args:
+            max_polls (int): Stop after this many polls (None for no limit)
+            ignore_hours (bool): Poll regardless of market hours and never stop at the close
+        """
+        polled_today = False
+        try:
+            while max_polls is None or self.stats['polls'] < max_polls:
+                now = datetime.now(MARKET_TIMEZONE)
+                if not ignore_hours and not market_is_open(now):
+                    if polled_today:
+                        logger.info("Market closed, stopping.")
+                        break
+                    wait = min(seconds_until_open(now), MAX_IDLE_SLEEP)
+                    logger.info("Market closed, next check in %.0fs.", wait)
+                    time.sleep(wait)
+                    continue
+
+                started = time.monotonic()
+                self.poll_once(now)
+                polled_today = True
+                time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            logger.info("Interrupted.")
+        finally:
+            self.session.close()
+        logger.info("Poller stats: %s", self.stats)
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Poll the NSE ETF table during market hours.")
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL, help="Seconds between polls")
+    parser.add_argument('--store', default=STORE_ROOT, help="Root directory of the snapshot partitions")
+    parser.add_argument('--mode', default=COOKIE_MODE, choices=sorted(COOKIE_MODES), help="Cookie bootstrap")
+    parser.add_argument('--base-url', default=NSE_BASE_URL, help="NSE (or stand-in server) address")
+    parser.add_argument('--max-polls', type=int, default=None, help="Stop after this many polls")
+    parser.add_argument('--ignore-hours', action='store_true', help="Poll outside market hours too")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.getenv('ETF_LOG_LEVEL', 'INFO').upper(),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    poller = ETFPoller(args.store, args.interval, args.mode, args.base_url)
+    poller.run(args.max_polls, args.ignore_hours)
+
+
+if __name__ == "__main__":
+    main()
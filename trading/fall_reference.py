@@ -0,0 +1,224 @@
+# fall_reference.py
+import argparse
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+from atomic_io import atomic_write
+from index_matcher import get_matcher
+from market_store import STORE_ROOT, MarketStore
+from reference_data import AVERAGE_FALL_FILE, parse_average_fall_csv
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = 'average_fall_state.json'
+MARKET_TIMEZONE = ZoneInfo('Asia/Kolkata')
+METHODS = ('mean', 'ewma')
+EWMA_HALFLIFE = 20  # Down days after which a day's weight has halved
+MIN_DOWN_DAYS = 5  # Down days of history needed before an index's reference value is replaced
+
+# Closing columns needed to compute index moves
+MOVE_COLUMNS = ['SYMBOL', 'UNDERLYING_ASSET', 'LTP', '%CHNG', 'VOLUME']
+
+
+def last_complete_date(now=None):
+    """The day before today, Indian time; today's partition is still filling up."""
+    now = now or datetime.now(MARKET_TIMEZONE)
+    return (now - timedelta(days=1)).strftime('%Y-%m-%d')
+
+
+def daily_index_moves(store, dates, index_names):
+    """
+    Each index's daily move: the mean closing %CHNG of the traded ETFs tracking it.
+
+    The last snapshot of each date stands in for the close. Dates are read
+    from the store, concatenated and reduced with one group-by.
+
+    Args:
+        store (MarketStore): Snapshot history
+        dates (list): Partition dates to read (YYYY-MM-DD)
+        index_names (list): Reference index names ETFs are matched against
+
+    Returns:
+        DataFrame: DATE x INDEX_NAME matrix of percentage moves, NaN where no ETF traded
+    """
+    frames = []
+    for date in dates:
+        close = store.load_date(date, latest_only=True, columns=MOVE_COLUMNS)
+        if close.empty:
+            continue
+        close = close[MOVE_COLUMNS].copy()
+        close['UNDERLYING_ASSET'] = close['UNDERLYING_ASSET'].astype(object)
+        close.insert(0, 'DATE', date)
+        frames.append(close)
+    if not frames:
+        return pd.DataFrame(columns=index_names, dtype=float)
+
+    history = pd.concat(frames, ignore_index=True)
+    # Untraded ETFs carry a stale %CHNG
+    history = history[(history['LTP'] > 0) & (history['VOLUME'] > 0)]
+    history['INDEX_NAME'] = get_matcher(index_names).match_series(history['UNDERLYING_ASSET'])
+    moves = history.dropna(subset=['INDEX_NAME']).groupby(['DATE', 'INDEX_NAME'])['%CHNG'].mean().unstack()
+    return moves.reindex(columns=index_names).astype(float)
+
+
+class AverageFallModel:
+    """
+    Per-index statistics of down-day moves, updated one batch of days at a time.
+
+    Keeps the number of down days, their running mean and an EWMA for every
+    index, so a daily update only reads the new partitions instead of the
+    whole history. The state is saved as JSON next to the reference file.
+    """
+
+    def __init__(self, index_names, halflife=EWMA_HALFLIFE):
+        self.index_names = list(dict.fromkeys(str(name) for name in index_names))
+        self.halflife = halflife
+        self.alpha = 1 - 0.5 ** (1 / halflife)
+        self.last_date = None
+        self.stats = pd.DataFrame({'DOWN_DAYS': 0, 'MEAN': np.nan, 'EWMA': np.nan},
+                                  index=pd.Index(self.index_names, name='INDEX_NAME'))
+
+    def update(self, moves):
+        """
+        Fold new days into the statistics.
+
+        Args:
+            moves (DataFrame): DATE x INDEX_NAME moves of days after last_date, see daily_index_moves()
+        """
+        moves = moves.reindex(columns=self.index_names).sort_index()
+        if moves.empty:
+            return
+        down = moves.where(moves < 0)
+
+        count = self.stats['DOWN_DAYS']
+        added = down.count()
+        total = count + added
+        summed = self.stats['MEAN'].fillna(0) * count + down.sum()
+        self.stats['MEAN'] = (summed / total).where(total > 0)
+        self.stats['DOWN_DAYS'] = total
+
+        # The previous EWMA as the first row continues the recursion; with
+        # ignore_na, days an index did not fall do not decay its weights
+        previous = self.stats['EWMA'].to_frame().T
+        stacked = pd.concat([previous, down], ignore_index=True)
+        self.stats['EWMA'] = stacked.ewm(alpha=self.alpha, adjust=False, ignore_na=True).mean().iloc[-1]
+        self.last_date = str(moves.index.max())
+
+    def average_falls(self, method='mean', min_down_days=MIN_DOWN_DAYS):
+        """Computed average fall per index, NaN where the history is too short."""
+        if method not in METHODS:
+            raise ValueError(f"Unsupported method: {method}")
+        values = self.stats['MEAN' if method == 'mean' else 'EWMA']
+        return values.where(self.stats['DOWN_DAYS'] >= min_down_days)
+
+    def save(self, path=STATE_FILE):
+        state = {
+            'index_names': self.index_names,
+            'halflife': self.halflife,
+            'last_date': self.last_date,
+            'stats': {
+                name: [int(row.DOWN_DAYS), None if pd.isna(row.MEAN) else float(row.MEAN),
+                       None if pd.isna(row.EWMA) else float(row.EWMA)]
+                for name, row in zip(self.index_names, self.stats.itertuples(index=False))
+            }
+        }
+        with atomic_write(path) as file:
+            json.dump(state, file)
+
+    @classmethod
+    def load(cls, path, index_names, halflife=EWMA_HALFLIFE):
+        """
+        Restore saved statistics, or start empty if they are missing or were
+        built for other index names or another half-life.
+        """
+        model = cls(index_names, halflife)
+        try:
+            with open(path) as file:
+                state = json.load(file)
+        except (OSError, ValueError):
+            return model
+        if state.get('index_names') != model.index_names or state.get('halflife') != halflife:
+            logger.info("Average-fall state %s is stale, rebuilding from history.", path)
+            return model
+
+        rows = [state['stats'][name] for name in model.index_names]
+        model.stats = pd.DataFrame(rows, columns=['DOWN_DAYS', 'MEAN', 'EWMA'],
+                                   index=model.stats.index).astype({'MEAN': float, 'EWMA': float})
+        model.last_date = state.get('last_date')
+        return model
+
+
+def update_reference(store, reference_path=AVERAGE_FALL_FILE, state_path=STATE_FILE, method='mean',
+                     halflife=EWMA_HALFLIFE, min_down_days=MIN_DOWN_DAYS, end=None, rebuild=False):
+    """
+    Bring the average-fall reference file up to date with the snapshot history.
+
+    Only dates after the last processed one are read. Index names and their
+    order are kept from the existing file, so matching is unchanged; indices
+    with fewer than min_down_days down days keep their current value.
+
+    Args:
+        store (MarketStore): Snapshot history
+        reference_path (str): AVERAGE_FALL_(%) file read by calculate_quantities
+        state_path (str): Saved statistics
+        method (str): 'mean' of every down day or 'ewma' weighted towards recent ones
+        halflife (float): EWMA half-life in down days
+        min_down_days (int): History needed before an index's value is replaced
+        end (str): Last date to include (YYYY-MM-DD), by default yesterday. Dates once
+            folded in are never revisited, so only pass today after the close
+        rebuild (bool): Ignore the saved statistics and rescan every date
+
+    Returns:
+        DataFrame: The written table (INDEX_NAME, AVERAGE_FALL_(%))
+    """
+    reference = parse_average_fall_csv(reference_path)
+    model = AverageFallModel(reference.index_names, halflife) if rebuild else \
+        AverageFallModel.load(state_path, reference.index_names, halflife)
+
+    end = end or last_complete_date()
+    dates = [date for date in store.dates(end=end) if model.last_date is None or date > model.last_date]
+    model.update(daily_index_moves(store, dates, model.index_names))
+    model.save(state_path)
+    logger.info("Average falls updated with %d dates through %s.", len(dates), model.last_date)
+
+    computed = model.average_falls(method, min_down_days)
+    current = pd.Series(reference.average_falls, index=reference.index_names)
+    current = current[~current.index.duplicated()]
+    table = pd.DataFrame({
+        'INDEX_NAME': model.index_names,
+        'AVERAGE_FALL_(%)': computed.fillna(current).round(4).to_numpy()
+    })
+
+    with atomic_write(reference_path, newline='') as file:
+        table.to_csv(file, index=False)
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute the average-fall reference file from stored snapshots.")
+    parser.add_argument('--root', default=STORE_ROOT, help="Snapshot store root directory")
+    parser.add_argument('--reference', default=AVERAGE_FALL_FILE, help="Average-fall CSV to update")
+    parser.add_argument('--state', default=STATE_FILE, help="Saved per-index statistics")
+    parser.add_argument('--method', default='mean', choices=METHODS, help="Average of down days")
+    parser.add_argument('--halflife', type=float, default=EWMA_HALFLIFE, help="EWMA half-life in down days")
+    parser.add_argument('--min-down-days', type=int, default=MIN_DOWN_DAYS,
+                        help="Down days needed before a value is replaced")
+    parser.add_argument('--end', help="Last date to include (YYYY-MM-DD, default yesterday)")
+    parser.add_argument('--rebuild', action='store_true', help="Rescan the whole history")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.getenv('ETF_LOG_LEVEL', 'INFO').upper(),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    table = update_reference(MarketStore(args.root), args.reference, args.state, args.method,
+                             args.halflife, args.min_down_days, args.end, args.rebuild)
+    print(table.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,104 @@
+import io
+import json
 import logging
+import os
+import pandas as pd
 import requests
 import time
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from datetime import datetime
 
+from atomic_io import atomic_write
+from snapshot_cache import cache_path as snapshot_cache_path, publish_snapshot_cache, type_snapshot
+
+NSE_BASE_URL = os.getenv('NSE_BASE_URL', 'https://www.nseindia.com')  # Override to use a stand-in server
+ETF_PAGE_PATH = '/market-data/exchange-traded-funds-etf'
+ETF_CSV_PATH = '/api/etf?csv=true&selectValFormat=crores'
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                  '(KHTML, like Gecko) Chrome/124.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9'
+}
+
+# Cookie bootstrap: 'http' (plain requests), 'selenium' (headful Chrome) or 'auto' (http, then selenium)
+COOKIE_MODE = os.getenv('NSE_COOKIE_MODE', 'auto')
+DOWNLOAD_CHUNK_SIZE = 64 * 1024  # Bytes handed to the CSV parser per read
+DOWNLOAD_TIMEOUT = 30  # Seconds to wait for the connection and for each chunk
+COOKIE_CACHE_FILE = 'nse_cookies.json'  # Cookies persisted between runs and retries
+SESSION_COOKIE_TTL = 30 * 60  # Assumed lifetime of cookies without an expiry (seconds)
+EXPIRY_MARGIN = 60  # Treat cookies as expired this many seconds early
+
+
+class CookiesRejectedError(Exception):
+    """NSE refused the download with the supplied cookies."""
+
+
+def _expires_at(expiries, now=None):
+    """Earliest expiry (epoch seconds), counting session cookies as SESSION_COOKIE_TTL."""
+    now = now or time.time()
+    return min((expiry if expiry else now + SESSION_COOKIE_TTL for expiry in expiries),
+               default=now + SESSION_COOKIE_TTL)
+
+
+def load_cached_cookies(path=COOKIE_CACHE_FILE):
+    """Return cached cookies if they have not expired yet, otherwise None."""
+    try:
+        with open(path) as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if not data.get('cookies') or data.get('expires_at', 0) - EXPIRY_MARGIN <= time.time():
+        return None
+    return data['cookies']
+
+
+def save_cookie_cache(cookies, expires_at, path=COOKIE_CACHE_FILE):
+    """Persist cookies with their expiry, atomically replacing the previous file."""
+    with atomic_write(path) as file:
+        json.dump({'expires_at': expires_at, 'cookies': cookies}, file)
+
+
+def clear_cookie_cache(path=COOKIE_CACHE_FILE):
+    """Forget cached cookies, e.g. after NSE rejected them."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# Fetch cookies from NSE with plain HTTP requests
+def fetch_cookies_with_http(cache_path=COOKIE_CACHE_FILE, base_url=NSE_BASE_URL, session=None):
+    logging.info("Fetching cookies over HTTP...")
+    try:
+        # A caller's pooled session keeps the cookies for its own later requests
+        session = session or requests.Session()
+        # The home page and the ETF page each hand out part of the cookie set
+        for path in ('/', ETF_PAGE_PATH):
+            response = session.get(base_url + path, headers=BROWSER_HEADERS, timeout=10)
+            response.raise_for_status()
+        cookies = session.cookies.get_dict()
+        if not cookies:
+            logging.error("No cookies received over HTTP.")
+            return None
+        logging.info("Cookies fetched successfully.")
+        if cache_path:
+            save_cookie_cache(cookies, _expires_at(cookie.expires for cookie in session.cookies), cache_path)
+        return cookies
+    except Exception as e:
+        logging.error(f"Error fetching cookies over HTTP: {e}")
+        return None
+
 
 # Fetch cookies from NSE using Selenium
-def fetch_cookies_with_selenium():
+def fetch_cookies_with_selenium(cache_path=COOKIE_CACHE_FILE, base_url=NSE_BASE_URL):
     logging.info("Fetching cookies with Selenium...")
+    try:
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+    except ImportError:
+        logging.error("Selenium is not installed; use the http cookie mode.")
+        return None
+
     chrome_options = Options()
     chrome_options.add_argument("--no-sandbox")
     chrome_options.add_argument("--disable-dev-shm-usage")
@@ -16,11 +106,14 @@ def fetch_cookies_with_selenium():
 
     driver = webdriver.Chrome(options=chrome_options)
     try:
-        driver.get("https://www.nseindia.com/market-data/exchange-traded-funds-etf")
+        driver.get(base_url + ETF_PAGE_PATH)
         driver.maximize_window()
         time.sleep(5)  # Wait for the page to load
-        cookies = {cookie['name']: cookie['value'] for cookie in driver.get_cookies()}
+        browser_cookies = driver.get_cookies()
+        cookies = {cookie['name']: cookie['value'] for cookie in browser_cookies}
         logging.info("Cookies fetched successfully.")
+        if cache_path and cookies:
+            save_cookie_cache(cookies, _expires_at(cookie.get('expiry') for cookie in browser_cookies), cache_path)
         return cookies
     except Exception as e:
         logging.error(f"Error fetching cookies: {e}")
@@ -29,43 +122,170 @@ def fetch_cookies_with_selenium():
         driver.quit()
 
 
-# Download ETF data
-def download_csv_with_cookies(cookies):
+def snapshot_file_name(date=None):
+    """Name of the ETF CSV downloaded on a date (default today)."""
+    return f"ETF_Data_{(date or datetime.now()).strftime('%Y-%m-%d')}.csv"
+
+
+class _TeeReader(io.RawIOBase):
+    """Readable stream over response chunks that also writes every chunk to a file."""
+
+    def __init__(self, chunks, sink):
+        self._chunks = chunks
+        self._sink = sink
+        self._pending = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._sink.write(chunk)
+            self._pending = chunk
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+# Download ETF data, parsing rows as they arrive
+def download_snapshot(cookies, base_url=NSE_BASE_URL, file_name=None, session=None):
+    """
+    Stream the ETF CSV (gzip/deflate) into the raw file and the typed table at once.
+
+    The body is never held in memory as a whole: decompressed chunks are written
+    to ETF_Data_<date>.csv and fed to the CSV parser as they arrive. The typed
+    table is also saved as the file's snapshot cache, so load_snapshot() on the
+    file does not parse it again.
+
+    Args:
+        cookies (dict): NSE cookies, or None if the session already carries them
+        base_url (str): NSE or stand-in server address
+        file_name (str): Target CSV, defaults to today's ETF_Data_<date>.csv
+        session (requests.Session): Pooled session to reuse instead of a new one
+
+    Returns:
+        tuple: (file name, typed DataFrame), or (None, None) on failure
+    """
     logging.info("Downloading ETF data CSV...")
-    csv_url = "https://www.nseindia.com/api/etf?csv=true&selectValFormat=crores"
-    headers = {'User-Agent': 'Mozilla/5.0', 'Referer': 'https://www.nseindia.com/market-data/exchange-traded-funds-etf'}
+    csv_url = base_url + ETF_CSV_PATH
+    headers = {'User-Agent': BROWSER_HEADERS['User-Agent'], 'Referer': base_url + ETF_PAGE_PATH,
+               'Accept-Encoding': 'gzip, deflate'}
+    file_name = file_name or snapshot_file_name()
+    temp_name = f"{file_name}.{os.getpid()}.part"
 
     try:
-        session = requests.Session()
-        session.headers.update(headers)
-        session.cookies.update(cookies)
-        response = session.get(csv_url)
-        response.raise_for_status()
-        file_name = f"ETF_Data_{datetime.now().strftime('%Y-%m-%d')}.csv"
-        with open(file_name, 'wb') as file:
-            file.write(response.content)
+        session = session or requests.Session()
+        if cookies:
+            session.cookies.update(cookies)
+        with session.get(csv_url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+            # NSE answers stale or missing cookies with 401/403 or an empty body
+            if response.status_code in (401, 403):
+                raise CookiesRejectedError(f"HTTP {response.status_code}")
+            response.raise_for_status()
+            with open(temp_name, 'wb') as file:
+                stream = io.BufferedReader(_TeeReader(response.iter_content(DOWNLOAD_CHUNK_SIZE), file))
+                try:
+                    etf_data = pd.read_csv(stream)
+                except pd.errors.EmptyDataError:
+                    raise CookiesRejectedError(f"HTTP {response.status_code} with an empty body")
+                # Keep the raw copy complete even if the parser stopped early
+                for chunk in iter(lambda: stream.read(DOWNLOAD_CHUNK_SIZE), b''):
+                    pass
+
+        # Publish the file only once it is complete
+        os.replace(temp_name, file_name)
+        typed = type_snapshot(etf_data)
+        try:
+            publish_snapshot_cache(typed, snapshot_cache_path(file_name), os.stat(file_name))
+        except Exception as e:
+            # The CSV is already published; load_snapshot() rebuilds the cache from it
+            logging.error(f"Error writing the snapshot cache of {file_name}: {e}")
         logging.info(f"ETF data saved as {file_name}")
-        return file_name
+        return file_name, typed
+    except CookiesRejectedError:
+        raise
     except Exception as e:
+        logging.error(f"Error downloading ETF data: {e}")
+        return None, None
+    finally:
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+
+
+def download_csv_with_cookies(cookies, base_url=NSE_BASE_URL):
+    """Download the ETF CSV and return its file name (None on failure, including rejected cookies)."""
+    try:
+        return download_snapshot(cookies, base_url)[0]
+    except CookiesRejectedError as e:
         logging.error(f"Error downloading ETF data: {e}")
         return None
 
 
+COOKIE_BOOTSTRAPS = {'http': fetch_cookies_with_http, 'selenium': fetch_cookies_with_selenium}
+COOKIE_MODES = {'http': ['http'], 'selenium': ['selenium'], 'auto': ['http', 'selenium']}
+
+
 # Main function to fetch ETF data
-def fetch_etf_data():
+def fetch_etf_snapshot(cache_path=COOKIE_CACHE_FILE, mode=COOKIE_MODE, base_url=NSE_BASE_URL):
     """
-    Fetch ETF data by using cookies fetched via Selenium and saving the CSV.
+    Fetch ETF data, returning the saved CSV and the typed table parsed on arrival.
+
+    Fresh cookies are only bootstrapped when there are no valid cached cookies
+    or NSE rejects them. mode picks the bootstrap: 'http', 'selenium', or
+    'auto' (HTTP first, Selenium if HTTP fails or its cookies are rejected).
+    Pass cache_path=None to always fetch fresh cookies.
+
+    Returns:
+        tuple: (file name, typed DataFrame), or (None, None) on failure
     """
+    if mode not in COOKIE_MODES:
+        raise ValueError(f"Unsupported cookie mode: {mode}")
+
     print("Fetching ETF data...")
-    cookies = fetch_cookies_with_selenium()
-    if not cookies:
-        print("Failed to fetch cookies. Exiting.")
-        return None
+    cookies = load_cached_cookies(cache_path) if cache_path else None
+    if cookies:
+        logging.info("Using cached NSE cookies.")
+        try:
+            file_name, etf_data = download_snapshot(cookies, base_url)
+        except CookiesRejectedError as e:
+            logging.info(f"Cached cookies rejected ({e}), fetching new ones.")
+            clear_cookie_cache(cache_path)
+        else:
+            if not file_name:
+                print("Failed to download ETF CSV. Exiting.")
+                return None, None
+            print(f"ETF data successfully downloaded: {file_name}")
+            return file_name, etf_data
+
+    for bootstrap in COOKIE_MODES[mode]:
+        cookies = COOKIE_BOOTSTRAPS[bootstrap](cache_path, base_url)
+        if not cookies:
+            continue
+        try:
+            file_name, etf_data = download_snapshot(cookies, base_url)
+        except CookiesRejectedError as e:
+            logging.warning(f"Cookies from {bootstrap} rejected ({e}).")
+            if cache_path:
+                clear_cookie_cache(cache_path)
+            continue
+        if not file_name:
+            print("Failed to download ETF CSV. Exiting.")
+            return None, None
+        print(f"ETF data successfully downloaded: {file_name}")
+        return file_name, etf_data
+
+    print("Failed to fetch cookies. Exiting.")
+    return None, None
 
-    file_name = download_csv_with_cookies(cookies)
-    if not file_name:
-        print("Failed to download ETF CSV. Exiting.")
-        return None
 
-    print(f"ETF data successfully downloaded: {file_name}")
-    return file_name
+def fetch_etf_data(cache_path=COOKIE_CACHE_FILE, mode=COOKIE_MODE, base_url=NSE_BASE_URL):
+    """
+    Fetch ETF data and save the CSV, reusing cached cookies when possible.
+
+    See fetch_etf_snapshot(); returns only the file name (None on failure).
+    """
+    return fetch_etf_snapshot(cache_path, mode, base_url)[0]
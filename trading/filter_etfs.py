@@ -1,5 +1,16 @@
+import json
+import logging
+import time
+
+import numpy as np
 import pandas as pd
 
+from index_matcher import get_matcher
+from reference_data import load_average_fall_table
+from symbol_cache import classify_symbols
+
+logger = logging.getLogger(__name__)
+
 # Constants
 DAILY_SIP_MIN = 400
 DAILY_SIP_MAX = 7500
@@ -16,492 +27,596 @@ DEBT_KEYWORDS = [
     "Corporate", "Govt Sec", "Securities", 'Media'
 ]
 
+# Columns added by the allocation engine, in output order
+ALLOCATION_COLUMNS = [
+    'SEVERITY', 'FALL_RATIO', 'INITIAL_ALLOCATION', 'ALLOCATED_AMOUNT', 'QTY', 'FINAL_AMOUNT'
+]
 
-def match_index_name(underlying_asset, avg_fall_df):
+# Tuning parameters that callers may override per run
+PARAMETER_NAMES = [
+    'DAILY_SIP_MIN', 'DAILY_SIP_MAX', 'MAX_CAP', 'MIN_CAP', 'MIN_VOLUME', 'GENERIC_AVERAGE_FALL'
+]
+
+
+def get_params(overrides=None):
     """
-    Match UNDERLYING_ASSET to INDEX_NAME using substring checks.
+    Get the allocation parameters, starting from the module-level constants.
 
     Args:
-    - underlying_asset (str): The name of the underlying asset (e.g., "Gold ETF").
-    - avg_fall_df (DataFrame): DataFrame containing INDEX_NAME and AVERAGE_FALL_(%) columns.
+    - overrides (dict): Optional values keyed by names in PARAMETER_NAMES.
 
     Returns:
-    - str: The matched INDEX_NAME if found, or None otherwise.
+    - dict: The full parameter set.
     """
-    for index_name in avg_fall_df['INDEX_NAME']:
-        # Check if INDEX_NAME is a substring of UNDERLYING_ASSET
-        if index_name.lower() in underlying_asset.lower():
-            return index_name  # Return the matched INDEX_NAME
-    return None  # Return None if no match is found
+    params = {name: globals()[name] for name in PARAMETER_NAMES}
+    if overrides:
+        unknown = set(overrides) - set(PARAMETER_NAMES)
+        if unknown:
+            raise ValueError(f"Unknown allocation parameters: {', '.join(sorted(unknown))}")
+        params.update(overrides)
+    return params
 
 
-def calculate_quantities_old(filtered_etfs):
+class LazyTable:
     """
-    Filter ETFs based on criteria:
-    - Match UNDERLYING_ASSET with INDEX_NAME using substring checks.
-    - Retain ETFs with sufficient trading volume.
-    - Deduplicate ETFs for the same underlying asset, keeping the one with the highest volume.
-    - Allocate SIP dynamically with caps for single and multiple ETFs.
+    DataFrame log payload that is only rendered if the record is emitted.
+
+    Pass it as a logging argument (logger.debug("...%s", LazyTable(df, [...])))
+    so column selection and to_string() are skipped unless DEBUG is enabled.
     """
-    if filtered_etfs.empty:
-        print("No ETFs to allocate.")
-        return None
 
-    # Clean column names: remove whitespace and standardize
-    filtered_etfs.columns = (
-        filtered_etfs.columns.str.strip()
-                              .str.replace(" ", "_")
-                              .str.upper()
-    )
+    def __init__(self, frame, columns=None, head=None, **to_string_kwargs):
+        self.frame = frame
+        self.columns = columns
+        self.head = head
+        self.to_string_kwargs = to_string_kwargs
 
-    # Ensure numeric and clean data
-    filtered_etfs['%CHNG'] = pd.to_numeric(filtered_etfs['%CHNG'], errors='coerce').fillna(0)
-    filtered_etfs['LTP'] = pd.to_numeric(filtered_etfs['LTP'], errors='coerce').fillna(0)
-    filtered_etfs['VOLUME'] = pd.to_numeric(filtered_etfs['VOLUME'].str.replace(',', ''), errors='coerce').fillna(0)
+    def __str__(self):
+        frame = self.frame if self.columns is None else self.frame[self.columns]
+        if self.head is not None:
+            frame = frame.head(self.head)
+        return frame.to_string(**self.to_string_kwargs)
 
-    # Filter out ETFs with LTP <= 0 or low volume
-    filtered_etfs = filtered_etfs[(filtered_etfs['LTP'] > 0) & (filtered_etfs['VOLUME'] >= MIN_VOLUME)]
 
-    # Remove assets containing any DEBT_KEYWORDS
-    pattern = "|".join(DEBT_KEYWORDS)
-    filtered_etfs = filtered_etfs[~filtered_etfs['UNDERLYING_ASSET'].str.contains(pattern, case=False, na=False)]
+def log_summary(strategy, prepared, selected, allocation_seconds, p):
+    """
+    Emit one machine-readable INFO record for an allocation run.
 
-    # Load and clean average fall data
-    avg_fall_df = pd.read_csv('average_percentage_fall_indices.csv')
-    avg_fall_df.columns = avg_fall_df.columns.str.strip().str.replace(" ", "_").str.upper()
+    The record carries row counts per stage, allocation totals and per-stage
+    timings in milliseconds, both as JSON in the message and as the 'summary'
+    attribute of the log record for structured handlers.
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    pipeline = prepared.attrs.get('pipeline', {})
+    summary = {
+        'strategy': strategy,
+        'counts': {**pipeline.get('counts', {}), 'selected': int(len(selected))},
+        'totals': {
+            'allocated': round(float(selected['ALLOCATED_AMOUNT'].sum()), 2) if len(selected) else 0.0,
+            'invested': round(float(selected['FINAL_AMOUNT'].sum()), 2)
+            if 'FINAL_AMOUNT' in selected.columns and len(selected) else 0.0,
+            'quantity': int(selected['QTY'].sum()) if len(selected) else 0,
+            'sip_min': p['DAILY_SIP_MIN'],
+            'sip_max': p['DAILY_SIP_MAX']
+        },
+        'timings_ms': {
+            **pipeline.get('timings_ms', {}),
+            'allocation': round(allocation_seconds * 1000, 3)
+        }
+    }
+    logger.info("allocation summary %s", json.dumps(summary), extra={'summary': summary})
 
-    # Match UNDERLYING_ASSET to INDEX_NAME
-    filtered_etfs['MATCHED_INDEX'] = filtered_etfs['UNDERLYING_ASSET'].apply(
-        lambda x: match_index_name(x, avg_fall_df)
-    )
 
-    # Map average fall values to the ETFs
-    avg_fall_dict = dict(zip(avg_fall_df['INDEX_NAME'], avg_fall_df['AVERAGE_FALL_(%)']))
-    filtered_etfs['AVG_FALL'] = filtered_etfs['MATCHED_INDEX'].map(avg_fall_dict).fillna(GENERIC_AVERAGE_FALL)
+def match_index_name(underlying_asset, avg_fall_df):
+    """
+    Match UNDERLYING_ASSET to INDEX_NAME using substring checks.
 
-    # Filter based on avg fall
-    filtered_etfs = filtered_etfs[filtered_etfs['%CHNG'] < filtered_etfs['AVG_FALL']]
+    Uses the shared IndexMatcher for these index names, so the longest contained
+    INDEX_NAME wins and repeated assets are answered from its cache.
 
-    # Deduplicate by 'MATCHED_INDEX', keeping the row with the highest volume
-    filtered_etfs['MATCHED_INDEX_SAFE'] = filtered_etfs['MATCHED_INDEX'].fillna('NO_MATCH')
+    Args:
+    - underlying_asset (str): The name of the underlying asset (e.g., "Gold ETF").
+    - avg_fall_df (DataFrame): DataFrame containing INDEX_NAME and AVERAGE_FALL_(%) columns.
 
-    # Use the safe version for groupby
-    filtered_etfs = filtered_etfs.loc[filtered_etfs.groupby('MATCHED_INDEX_SAFE')['VOLUME'].idxmax()]
-
-    # Calculate severity
-    def calculate_severity(row):
-        return (row['AVG_FALL'] - row['%CHNG']) / abs(row['AVG_FALL'])
-
-    filtered_etfs['SEVERITY'] = filtered_etfs.apply(calculate_severity, axis=1)
-
-    # Allocate SIP with caps for single or multiple ETFs
-    num_etfs = len(filtered_etfs)
-    def allocate_sip(row, total_severity, num_etfs):
-        if num_etfs == 1:  # Single ETF scenario
-            if row['SEVERITY'] > 1:  # High severity
-                return min(MAX_CAP, row['SEVERITY'] * MAX_CAP)
-            else:  # Low severity
-                return max(MIN_CAP, row['SEVERITY'] * MIN_CAP)
-        else:  # Multiple ETFs
-            return MAX_CAP * row['SEVERITY'] / total_severity
-
-    total_severity = filtered_etfs['SEVERITY'].sum()
-    filtered_etfs['ALLOCATED_AMOUNT'] = filtered_etfs.apply(
-        allocate_sip, axis=1, total_severity=total_severity, num_etfs=num_etfs
-    )
+    Returns:
+    - str: The matched INDEX_NAME if found, or None otherwise.
+    """
+    return get_matcher(avg_fall_df['INDEX_NAME']).match(underlying_asset)
 
-    # Calculate quantities safely
-    filtered_etfs['QTY'] = filtered_etfs.apply(
-        lambda row: int(row['ALLOCATED_AMOUNT'] / row['LTP']) if row['LTP'] > 0 else 0,
-        axis=1
-    )
 
-    return filtered_etfs
+def clean_etf_data(etf_data):
+    """
+    Standardize a raw NSE snapshot: normalized headers and numeric %CHNG, LTP and VOLUME.
 
+    Safe to call on data that is already clean. The caller's frame is left untouched.
 
-def calculate_quantities_(filtered_etfs):
-    """
-    Filter ETFs based on criteria and allocate investment amounts with constraints.
-    More conservative allocation for moderate severity situations.
-    """
-    if filtered_etfs.empty:
-        print("No ETFs to allocate.")
-        return None
+    Args:
+    - etf_data (DataFrame): Snapshot as read from the NSE CSV.
 
+    Returns:
+    - DataFrame: Cleaned copy of the snapshot.
+    """
     # Clean column names: remove whitespace and standardize
-    filtered_etfs.columns = (
-        filtered_etfs.columns.str.strip()
+    cleaned = etf_data.copy()
+    cleaned.columns = (
+        cleaned.columns.str.strip()
         .str.replace(" ", "_")
         .str.upper()
     )
 
     # Ensure numeric and clean data
-    filtered_etfs['%CHNG'] = pd.to_numeric(filtered_etfs['%CHNG'], errors='coerce').fillna(0)
-    filtered_etfs['LTP'] = pd.to_numeric(filtered_etfs['LTP'], errors='coerce').fillna(0)
-    filtered_etfs['VOLUME'] = pd.to_numeric(filtered_etfs['VOLUME'].str.replace(',', ''), errors='coerce').fillna(0)
+    cleaned['%CHNG'] = pd.to_numeric(cleaned['%CHNG'], errors='coerce').fillna(0)
+    cleaned['LTP'] = pd.to_numeric(cleaned['LTP'], errors='coerce').fillna(0)
+    volume = cleaned['VOLUME']
+    if not pd.api.types.is_numeric_dtype(volume):
+        volume = volume.astype(str).str.replace(',', '')
+    cleaned['VOLUME'] = pd.to_numeric(volume, errors='coerce').fillna(0)
 
-    # Filter out ETFs with LTP <= 0 or low volume
-    filtered_etfs = filtered_etfs[(filtered_etfs['LTP'] > 0) & (filtered_etfs['VOLUME'] >= MIN_VOLUME)]
+    return cleaned
 
-    # Remove assets containing any DEBT_KEYWORDS
-    pattern = "|".join(DEBT_KEYWORDS)
-    filtered_etfs = filtered_etfs[~filtered_etfs['UNDERLYING_ASSET'].str.contains(pattern, case=False, na=False)]
 
-    # Load and clean average fall data
-    avg_fall_df = pd.read_csv('average_percentage_fall_indices.csv')
+def preprocess_etfs(etf_data, params=None, classification_cache=None):
+    """
+    Shared preprocessing stage for every allocation strategy.
 
-    # Make sure we process the average fall columns correctly
-    avg_fall_df.columns = avg_fall_df.columns.str.strip().str.replace(" ", "_").str.upper()
+    Cleans the snapshot, drops ETFs with no price, low volume or debt-like
+    underlying assets, matches each ETF to its index, keeps ETFs falling more
+    than their index average and deduplicates to the highest-volume ETF per index.
+    Compute it once per snapshot and hand it to as many strategies as needed.
 
-    # DEBUG: Print column names to verify
-    print("Average fall data columns:", avg_fall_df.columns.tolist())
+    Args:
+    - etf_data (DataFrame): Raw or already cleaned snapshot.
+    - params (dict): Parameter overrides, see get_params(). Uses MIN_VOLUME and
+      GENERIC_AVERAGE_FALL.
+    - classification_cache (SymbolClassificationCache): Store for per-symbol debt
+      flags and index matches, defaults to the shared symbol_classification.json.
 
-    # Rename columns if needed to ensure consistent naming
-    if 'INDEX_NAME' in avg_fall_df.columns:
-        index_name_col = 'INDEX_NAME'
-    else:
-        # Try to find the appropriate column
-        index_name_col = [col for col in avg_fall_df.columns if 'INDEX' in col or 'NAME' in col][0]
-        print(f"Using '{index_name_col}' as index name column")
+    Returns:
+    - DataFrame: Candidate ETFs with MATCHED_INDEX, AVG_FALL and MATCHED_INDEX_SAFE
+      columns (possibly empty).
+    """
+    p = get_params(params)
+    counts = {'rows': int(len(etf_data))}
+    timings = {}
 
-    if 'AVERAGE_FALL_(%)' in avg_fall_df.columns:
-        avg_fall_col = 'AVERAGE_FALL_(%)'
-    else:
-        # Try to find the appropriate column
-        avg_fall_col = [col for col in avg_fall_df.columns if 'FALL' in col or 'AVERAGE' in col][0]
-        print(f"Using '{avg_fall_col}' as average fall column")
+    started = time.perf_counter()
+    filtered_etfs = clean_etf_data(etf_data)
+    timings['clean'] = time.perf_counter() - started
 
-    # Create a clean map for index names to average falls
-    avg_fall_dict = dict(zip(avg_fall_df[index_name_col], avg_fall_df[avg_fall_col]))
+    # Filter out ETFs with LTP <= 0 or low volume
+    started = time.perf_counter()
+    filtered_etfs = filtered_etfs[(filtered_etfs['LTP'] > 0) & (filtered_etfs['VOLUME'] >= p['MIN_VOLUME'])]
+    counts['price_volume'] = int(len(filtered_etfs))
+    timings['filter'] = time.perf_counter() - started
+
+    # Load average fall data (parsed once and cached until the file changes)
+    avg_fall_table = load_average_fall_table()
+
+    # Debt flag, matched INDEX_NAME and average fall per symbol; only new or
+    # changed symbols are classified, the rest come from the persistent cache
+    started = time.perf_counter()
+    classification = classify_symbols(filtered_etfs, avg_fall_table, DEBT_KEYWORDS, classification_cache)
+
+    # Remove assets containing any DEBT_KEYWORDS
+    not_debt = ~classification['IS_DEBT']
+    filtered_etfs = filtered_etfs[not_debt]
+    classification = classification[not_debt]
 
     # Match UNDERLYING_ASSET to INDEX_NAME
-    filtered_etfs['MATCHED_INDEX'] = filtered_etfs['UNDERLYING_ASSET'].apply(
-        lambda x: match_index_name(x, avg_fall_df)
-    )
+    filtered_etfs['MATCHED_INDEX'] = classification['MATCHED_INDEX']
 
     # Add AVG_FALL column with GENERIC_AVERAGE_FALL as default
-    filtered_etfs['AVG_FALL'] = filtered_etfs['MATCHED_INDEX'].map(avg_fall_dict).fillna(GENERIC_AVERAGE_FALL)
+    filtered_etfs['AVG_FALL'] = classification['AVG_FALL'].fillna(p['GENERIC_AVERAGE_FALL'])
+    counts['not_debt'] = int(len(filtered_etfs))
+    timings['classify'] = time.perf_counter() - started
 
-    # DEBUG: Check if AVG_FALL column exists and has valid values
-    print("Sample of filtered ETFs with AVG_FALL:")
-    print(filtered_etfs[['SYMBOL', 'UNDERLYING_ASSET', 'MATCHED_INDEX', 'AVG_FALL']].head())
+    logger.debug("Sample of filtered ETFs with AVG_FALL:\n%s",
+                 LazyTable(filtered_etfs, ['SYMBOL', 'UNDERLYING_ASSET', 'MATCHED_INDEX', 'AVG_FALL'], head=5))
 
     # Filter based on avg fall
+    started = time.perf_counter()
     filtered_etfs = filtered_etfs[filtered_etfs['%CHNG'] < filtered_etfs['AVG_FALL']]
-
-    # If no ETFs meet criteria, return empty DataFrame
-    if filtered_etfs.empty:
-        print("No ETFs meet the criteria (falling more than their average).")
-        return filtered_etfs
+    counts['below_avg_fall'] = int(len(filtered_etfs))
+    timings['filter'] += time.perf_counter() - started
 
     # Handle deduplication with NULL/None MATCHED_INDEX values
+    started = time.perf_counter()
     filtered_etfs['MATCHED_INDEX_SAFE'] = filtered_etfs['MATCHED_INDEX'].fillna('NO_MATCH')
 
-    # Use the safe version for deduplication
-    filtered_etfs = filtered_etfs.loc[filtered_etfs.groupby('MATCHED_INDEX_SAFE')['VOLUME'].idxmax()]
-
-    # Calculate severity
-    def calculate_severity(row):
-        return (row['AVG_FALL'] - row['%CHNG']) / abs(row['AVG_FALL'])
-
-    filtered_etfs['SEVERITY'] = filtered_etfs.apply(calculate_severity, axis=1)
-
-    # Print severity values for selected ETFs
-    print("\nSelected ETFs with severity scores:")
-    print(filtered_etfs[['SYMBOL', '%CHNG', 'AVG_FALL', 'SEVERITY']].to_string())
-
-    # Calculate fall ratio
-    filtered_etfs['FALL_RATIO'] = filtered_etfs['%CHNG'] / filtered_etfs['AVG_FALL']
-
-    # Calculate initial allocations based on severity
-    def allocate_sip_conservative(row):
-        """
-        More conservative allocation function that scales allocation based on severity.
-        - For severity < 0.5: Scale from MIN_CAP up to mid-range
-        - For severity 0.5-1.0: Scale from mid-range up to MAX_CAP
-        - For severity > 1.0: Use MAX_CAP
-        """
-        # Define the severity thresholds
-        low_severity = 0.5
-        high_severity = 1.0
-
-        if row['SEVERITY'] >= high_severity:
-            # High severity (dip more than double the average) - use maximum allocation
-            return MAX_CAP
-        elif row['SEVERITY'] <= low_severity:
-            # Low severity (dip only slightly worse than average)
-            # Scale from MIN_CAP to mid-point based on severity percentage of threshold
-            mid_point = MIN_CAP + (MAX_CAP - MIN_CAP) / 2
-            return MIN_CAP + (row['SEVERITY'] / low_severity) * (mid_point - MIN_CAP)
-        else:
-            # Medium severity - scale from mid-point to MAX_CAP
-            mid_point = MIN_CAP + (MAX_CAP - MIN_CAP) / 2
-            severity_position = (row['SEVERITY'] - low_severity) / (high_severity - low_severity)
-            return mid_point + severity_position * (MAX_CAP - mid_point)
-
-    # Apply the conservative allocation to each ETF
-    filtered_etfs['INITIAL_ALLOCATION'] = filtered_etfs.apply(allocate_sip_conservative, axis=1)
-
-    # Print initial allocations
-    print("\nInitial allocations based on conservative approach:")
-    print(filtered_etfs[['SYMBOL', 'SEVERITY', 'INITIAL_ALLOCATION']].to_string())
-
-    # Check total allocation
-    total_allocated = filtered_etfs['INITIAL_ALLOCATION'].sum()
-    print(f"\nInitial total allocation: ₹{total_allocated:.2f}")
-
-    # Adjust if total allocation is outside the SIP range
-    if total_allocated < DAILY_SIP_MIN:
-        # Scale up all allocations proportionally, but respect MAX_CAP
-        scale_factor = min(DAILY_SIP_MIN / total_allocated,
-                           MAX_CAP / filtered_etfs['INITIAL_ALLOCATION'].max())
-
-        filtered_etfs['ALLOCATED_AMOUNT'] = filtered_etfs.apply(
-            lambda row: min(MAX_CAP, row['INITIAL_ALLOCATION'] * scale_factor), axis=1
-        )
-        print(f"Scaled up by factor of {scale_factor:.2f} to meet minimum SIP")
-    elif total_allocated > DAILY_SIP_MAX:
-        # Scale down all allocations proportionally
-        scale_factor = DAILY_SIP_MAX / total_allocated
-        filtered_etfs['ALLOCATED_AMOUNT'] = filtered_etfs['INITIAL_ALLOCATION'] * scale_factor
-        print(f"Scaled down by factor of {scale_factor:.2f} to meet maximum SIP")
-    else:
-        # No scaling needed, use initial allocations
-        filtered_etfs['ALLOCATED_AMOUNT'] = filtered_etfs['INITIAL_ALLOCATION']
+    # Keep the highest-volume ETF per index
+    if not filtered_etfs.empty:
+        filtered_etfs = filtered_etfs.loc[filtered_etfs.groupby('MATCHED_INDEX_SAFE')['VOLUME'].idxmax()]
+    counts['candidates'] = int(len(filtered_etfs))
+    timings['dedup'] = time.perf_counter() - started
+
+    # Stage statistics travel with the frame into the allocation summary
+    filtered_etfs.attrs['pipeline'] = {
+        'counts': counts,
+        'timings_ms': {stage: round(seconds * 1000, 3) for stage, seconds in timings.items()}
+    }
+    return filtered_etfs
+
+
+def dynamic_allocation_curve(severity, p):
+    """
+    Scale linearly from MIN_CAP to MAX_CAP based on severity, without hardcoded thresholds.
+    MAX_CAP is reached at severity 2.0 (a dip three times the average).
+    """
+    max_severity_reference = 2.0
+    return np.where(
+        severity >= max_severity_reference,
+        np.asarray(p['MAX_CAP'], dtype=float),
+        p['MIN_CAP'] + (severity / max_severity_reference) * (p['MAX_CAP'] - p['MIN_CAP'])
+    )
 
-    # Process ETFs that are below MIN_CAP
-    below_min = filtered_etfs[filtered_etfs['ALLOCATED_AMOUNT'] < MIN_CAP]
 
-    if not below_min.empty:
-        print(f"{len(below_min)} ETFs below minimum cap of ₹{MIN_CAP}")
+def conservative_allocation_curve(severity, p):
+    """
+    More conservative allocation for moderate severity situations.
+    - For severity <= 0.5: Scale from MIN_CAP up to mid-range
+    - For severity 0.5-1.0: Scale from mid-range up to MAX_CAP
+    - For severity >= 1.0: Use MAX_CAP
+    """
+    low_severity = 0.5
+    high_severity = 1.0
+    mid_point = p['MIN_CAP'] + (p['MAX_CAP'] - p['MIN_CAP']) / 2
+
+    low = p['MIN_CAP'] + (severity / low_severity) * (mid_point - p['MIN_CAP'])
+    medium = mid_point + (severity - low_severity) / (high_severity - low_severity) * (p['MAX_CAP'] - mid_point)
+    return np.where(
+        severity >= high_severity,
+        np.asarray(p['MAX_CAP'], dtype=float),
+        np.where(severity <= low_severity, low, medium)
+    )
 
-        # Calculate required funds to bring all to MIN_CAP
-        shortfall = (MIN_CAP - below_min['ALLOCATED_AMOUNT']).sum()
 
-        # Check if we have enough budget within DAILY_SIP_MAX
-        current_total = filtered_etfs['ALLOCATED_AMOUNT'].sum()
-        available_budget = DAILY_SIP_MAX - current_total
+def allocate_by_severity(chng, avg_fall, ltp, params=None, curve=dynamic_allocation_curve):
+    """
+    Columnar allocation engine used by the severity-based strategies.
+
+    Computes severity, the initial allocation from the given curve, SIP range
+    scaling, the MIN_CAP top-up/removal and whole-unit quantities with NumPy
+    array expressions only, so the cost per ETF stays flat as the frame grows.
 
+    Args:
+    - chng (ndarray): %CHNG of the deduplicated ETFs.
+    - avg_fall (ndarray): AVG_FALL of the same ETFs.
+    - ltp (ndarray): LTP of the same ETFs.
+    - params (dict): Parameter overrides, see get_params().
+    - curve (callable): Maps (severity, params) to the initial allocation.
+
+    Returns:
+    - dict: One array per name in ALLOCATION_COLUMNS plus 'KEEP' (ETFs that survive
+      the MIN_CAP check), and scalars 'TOTAL_ALLOCATED', 'SCALING' ('up', 'down'
+      or None), 'SCALE_FACTOR' and 'BELOW_MIN'.
+    """
+    chng = np.asarray(chng, dtype=float)
+    avg_fall = np.asarray(avg_fall, dtype=float)
+    ltp = np.asarray(ltp, dtype=float)
+    p = get_params(params)
+    max_cap, min_cap = p['MAX_CAP'], p['MIN_CAP']
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        severity = (avg_fall - chng) / np.abs(avg_fall)
+        fall_ratio = chng / avg_fall
+
+    initial_allocation = curve(severity, p)
+
+    total_allocated = initial_allocation.sum()
+    scaling = None
+    scale_factor = 1.0
+    if len(initial_allocation) and total_allocated < p['DAILY_SIP_MIN']:
+        # Scale up proportionally, but respect MAX_CAP
+        scaling = 'up'
+        scale_factor = min(p['DAILY_SIP_MIN'] / total_allocated, max_cap / initial_allocation.max())
+        allocated_amount = np.minimum(max_cap, initial_allocation * scale_factor)
+    elif total_allocated > p['DAILY_SIP_MAX']:
+        scaling = 'down'
+        scale_factor = p['DAILY_SIP_MAX'] / total_allocated
+        allocated_amount = initial_allocation * scale_factor
+    else:
+        allocated_amount = initial_allocation.copy()
+
+    # Lift ETFs below MIN_CAP if the budget allows it, otherwise drop them
+    below_min = allocated_amount < min_cap
+    keep = np.ones(len(allocated_amount), dtype=bool)
+    if below_min.any():
+        shortfall = (min_cap - allocated_amount[below_min]).sum()
+        available_budget = p['DAILY_SIP_MAX'] - allocated_amount.sum()
         if shortfall <= available_budget:
-            # We can bring all to MIN_CAP
-            filtered_etfs.loc[filtered_etfs['ALLOCATED_AMOUNT'] < MIN_CAP, 'ALLOCATED_AMOUNT'] = MIN_CAP
-            print(f"Increased allocations to minimum cap using available budget")
+            allocated_amount[below_min] = min_cap
         else:
-            # Remove ETFs below MIN_CAP
-            filtered_etfs = filtered_etfs[filtered_etfs['ALLOCATED_AMOUNT'] >= MIN_CAP]
-            print(f"Removed ETFs below minimum cap due to budget constraints")
-
-    # Calculate quantities safely
-    filtered_etfs['QTY'] = filtered_etfs.apply(
-        lambda row: int(row['ALLOCATED_AMOUNT'] / row['LTP']) if row['LTP'] > 0 else 0,
-        axis=1
-    )
+            keep = ~below_min
 
-    # Recalculate final amounts based on actual quantities
-    filtered_etfs['FINAL_AMOUNT'] = filtered_etfs['QTY'] * filtered_etfs['LTP']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        qty = np.where(ltp > 0, np.trunc(allocated_amount / ltp), 0).astype(np.int64)
 
-    # Final check on total amount
-    final_total = filtered_etfs['FINAL_AMOUNT'].sum()
+    return {
+        'SEVERITY': severity,
+        'FALL_RATIO': fall_ratio,
+        'INITIAL_ALLOCATION': initial_allocation,
+        'ALLOCATED_AMOUNT': allocated_amount,
+        'QTY': qty,
+        'FINAL_AMOUNT': qty * ltp,
+        'KEEP': keep,
+        'TOTAL_ALLOCATED': total_allocated,
+        'SCALING': scaling,
+        'SCALE_FACTOR': scale_factor,
+        'BELOW_MIN': int(below_min.sum()),
+    }
 
-    # Detailed results table
-    print("\nETF Selection Results:")
-    result_table = filtered_etfs[['SYMBOL', '%CHNG', 'AVG_FALL', 'SEVERITY', 'ALLOCATED_AMOUNT', 'QTY', 'FINAL_AMOUNT']]
-    print(result_table.to_string(index=False))
 
-    print(f"\nETFs selected: {len(filtered_etfs)}")
-    print(f"Total investment: ₹{final_total:.2f}")
-    print(f"Target range: ₹{DAILY_SIP_MIN} to ₹{DAILY_SIP_MAX}")
+# Parameters that may differ between allocation profiles
+PROFILE_PARAMETERS = ['DAILY_SIP_MIN', 'DAILY_SIP_MAX', 'MAX_CAP', 'MIN_CAP']
 
-    return filtered_etfs
 
-def calculate_quantities(filtered_etfs):
+def allocate_profiles(prepared, profiles, params=None, curve=dynamic_allocation_curve):
     """
-    Filter ETFs based on criteria and allocate investment amounts with constraints.
-    Dynamic allocation based on severity without hardcoded thresholds.
+    Allocate one prepared ETF set for many parameter profiles at once.
+
+    Every profile (e.g. a plan tier or an account's own SIP budget) overrides
+    DAILY_SIP_MIN, DAILY_SIP_MAX, MAX_CAP and/or MIN_CAP. All profiles are
+    evaluated together as (profiles x ETFs) broadcast array operations, with the
+    same rules as allocate_by_severity applied row by row.
+
+    Args:
+    - prepared (DataFrame): Output of preprocess_etfs().
+    - profiles (dict): Profile name -> parameter overrides.
+    - params (dict): Base overrides applied before each profile's own values.
+    - curve (callable): Maps (severity, params) to the initial allocation.
+
+    Returns:
+    - dict: 'ALLOCATED_AMOUNT', 'QTY' and 'FINAL_AMOUNT' DataFrames indexed by SYMBOL
+      with one column per profile. ETFs a profile drops get QTY 0.
     """
-    if filtered_etfs.empty:
-        print("No ETFs to allocate.")
-        return None
+    names = list(profiles)
+    symbols = prepared['SYMBOL'].to_numpy()
+    base = get_params(params)
+
+    # Profile parameters as (profiles x 1) columns so they broadcast over ETFs
+    p = {
+        name: np.array([get_params({**base, **profiles[profile]})[name] for profile in names],
+                       dtype=float).reshape(-1, 1)
+        for name in PROFILE_PARAMETERS
+    }
+
+    chng = prepared['%CHNG'].to_numpy(dtype=float)
+    avg_fall = prepared['AVG_FALL'].to_numpy(dtype=float)
+    ltp = prepared['LTP'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        severity = (avg_fall - chng) / np.abs(avg_fall)
+
+    initial_allocation = np.broadcast_to(curve(severity, p), (len(names), len(symbols)))
+    total_allocated = initial_allocation.sum(axis=1, keepdims=True)
+    has_etfs = len(symbols) > 0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Scale up proportionally (respecting MAX_CAP) or down into the SIP range
+        peak = initial_allocation.max(axis=1, keepdims=True) if has_etfs else total_allocated
+        scale_up = np.minimum(p['DAILY_SIP_MIN'] / total_allocated, p['MAX_CAP'] / peak)
+        scale_down = p['DAILY_SIP_MAX'] / total_allocated
+        allocated_amount = np.where(
+            has_etfs & (total_allocated < p['DAILY_SIP_MIN']),
+            np.minimum(p['MAX_CAP'], initial_allocation * scale_up),
+            np.where(total_allocated > p['DAILY_SIP_MAX'], initial_allocation * scale_down, initial_allocation)
+        )
 
-    # Clean column names: remove whitespace and standardize
-    filtered_etfs.columns = (
-        filtered_etfs.columns.str.strip()
-        .str.replace(" ", "_")
-        .str.upper()
-    )
+    # Lift ETFs below MIN_CAP where each profile's budget allows it, otherwise drop them
+    below_min = allocated_amount < p['MIN_CAP']
+    shortfall = np.where(below_min, p['MIN_CAP'] - allocated_amount, 0).sum(axis=1, keepdims=True)
+    available_budget = p['DAILY_SIP_MAX'] - allocated_amount.sum(axis=1, keepdims=True)
+    lift = shortfall <= available_budget
+    allocated_amount = np.where(below_min & lift, p['MIN_CAP'], allocated_amount)
+    keep = ~below_min | lift
 
-    # Ensure numeric and clean data
-    filtered_etfs['%CHNG'] = pd.to_numeric(filtered_etfs['%CHNG'], errors='coerce').fillna(0)
-    filtered_etfs['LTP'] = pd.to_numeric(filtered_etfs['LTP'], errors='coerce').fillna(0)
-    filtered_etfs['VOLUME'] = pd.to_numeric(filtered_etfs['VOLUME'].str.replace(',', ''), errors='coerce').fillna(0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        qty = np.where(keep & (ltp > 0), np.trunc(allocated_amount / ltp), 0).astype(np.int64)
 
-    # Filter out ETFs with LTP <= 0 or low volume
-    filtered_etfs = filtered_etfs[(filtered_etfs['LTP'] > 0) & (filtered_etfs['VOLUME'] >= MIN_VOLUME)]
+    def frame(values):
+        return pd.DataFrame(values.T, index=pd.Index(symbols, name='SYMBOL'), columns=names)
 
-    # Remove assets containing any DEBT_KEYWORDS
-    pattern = "|".join(DEBT_KEYWORDS)
-    filtered_etfs = filtered_etfs[~filtered_etfs['UNDERLYING_ASSET'].str.contains(pattern, case=False, na=False)]
+    return {
+        'ALLOCATED_AMOUNT': frame(np.where(keep, allocated_amount, 0.0)),
+        'QTY': frame(qty),
+        'FINAL_AMOUNT': frame(qty * ltp),
+    }
 
-    # Load and clean average fall data
-    avg_fall_df = pd.read_csv('average_percentage_fall_indices.csv')
 
-    # Make sure we process the average fall columns correctly
-    avg_fall_df.columns = avg_fall_df.columns.str.strip().str.replace(" ", "_").str.upper()
+# Registered allocation strategies: name -> function(prepared, params=None)
+STRATEGIES = {}
 
-    # DEBUG: Print column names to verify
-    print("Average fall data columns:", avg_fall_df.columns.tolist())
 
-    # Rename columns if needed to ensure consistent naming
-    if 'INDEX_NAME' in avg_fall_df.columns:
-        index_name_col = 'INDEX_NAME'
-    else:
-        # Try to find the appropriate column
-        index_name_col = [col for col in avg_fall_df.columns if 'INDEX' in col or 'NAME' in col][0]
-        print(f"Using '{index_name_col}' as index name column")
+def register_strategy(name):
+    """
+    Register an allocation strategy under a name.
 
-    if 'AVERAGE_FALL_(%)' in avg_fall_df.columns:
-        avg_fall_col = 'AVERAGE_FALL_(%)'
-    else:
-        # Try to find the appropriate column
-        avg_fall_col = [col for col in avg_fall_df.columns if 'FALL' in col or 'AVERAGE' in col][0]
-        print(f"Using '{avg_fall_col}' as average fall column")
+    A strategy receives the output of preprocess_etfs() plus optional parameter
+    overrides and returns a new DataFrame with at least SYMBOL, LTP and QTY. It
+    must not modify the prepared frame, which is shared between strategies.
+    """
+    def decorator(func):
+        STRATEGIES[name] = func
+        return func
+    return decorator
 
-    # Create a clean map for index names to average falls
-    avg_fall_dict = dict(zip(avg_fall_df[index_name_col], avg_fall_df[avg_fall_col]))
 
-    # Match UNDERLYING_ASSET to INDEX_NAME
-    filtered_etfs['MATCHED_INDEX'] = filtered_etfs['UNDERLYING_ASSET'].apply(
-        lambda x: match_index_name(x, avg_fall_df)
+def get_strategy(name):
+    """Get a registered allocation strategy by name."""
+    strategy = STRATEGIES.get(name)
+    if not strategy:
+        raise ValueError(f"Unsupported strategy: {name}")
+    return strategy
+
+
+def _allocate_with_curve(prepared, params, curve, name, label):
+    """Run the columnar engine over a prepared frame and report the selection."""
+    p = get_params(params)
+    started = time.perf_counter()
+
+    # If no ETFs meet criteria, return empty DataFrame
+    if prepared.empty:
+        logger.info("No ETFs meet the criteria (falling more than their average).")
+        filtered_etfs = prepared.copy()
+        for column in ALLOCATION_COLUMNS:
+            filtered_etfs[column] = pd.Series(dtype=float)
+        log_summary(name, prepared, filtered_etfs, time.perf_counter() - started, p)
+        return filtered_etfs
+
+    filtered_etfs = prepared.copy()
+
+    # Severity, allocation, SIP scaling and quantities as column-wise array operations
+    allocation = allocate_by_severity(
+        filtered_etfs['%CHNG'].to_numpy(dtype=float),
+        filtered_etfs['AVG_FALL'].to_numpy(dtype=float),
+        filtered_etfs['LTP'].to_numpy(dtype=float),
+        p,
+        curve
     )
+    for column in ALLOCATION_COLUMNS:
+        filtered_etfs[column] = allocation[column]
+
+    # Severity values and initial allocations, rendered only at DEBUG
+    logger.debug("Selected ETFs with severity scores:\n%s",
+                 LazyTable(filtered_etfs, ['SYMBOL', '%CHNG', 'AVG_FALL', 'SEVERITY']))
+    logger.debug("Initial allocations based on %s:\n%s",
+                 label, LazyTable(filtered_etfs, ['SYMBOL', 'SEVERITY', 'INITIAL_ALLOCATION']))
+    logger.debug("Initial total allocation: ₹%.2f", allocation['TOTAL_ALLOCATED'])
+
+    if allocation['SCALING'] == 'up':
+        logger.debug("Scaled up by factor of %.2f to meet minimum SIP", allocation['SCALE_FACTOR'])
+    elif allocation['SCALING'] == 'down':
+        logger.debug("Scaled down by factor of %.2f to meet maximum SIP", allocation['SCALE_FACTOR'])
+
+    if allocation['BELOW_MIN'] > 0:
+        logger.debug("%d ETFs below minimum cap of ₹%s", allocation['BELOW_MIN'], p['MIN_CAP'])
+        if allocation['KEEP'].all():
+            logger.debug("Increased allocations to minimum cap using available budget")
+        else:
+            logger.debug("Removed ETFs below minimum cap due to budget constraints")
 
-    # Add AVG_FALL column with GENERIC_AVERAGE_FALL as default
-    filtered_etfs['AVG_FALL'] = filtered_etfs['MATCHED_INDEX'].map(avg_fall_dict).fillna(GENERIC_AVERAGE_FALL)
+    # Drop ETFs that could not be lifted to MIN_CAP within the budget
+    filtered_etfs = filtered_etfs[allocation['KEEP']]
 
-    # DEBUG: Check if AVG_FALL column exists and has valid values
-    print("Sample of filtered ETFs with AVG_FALL:")
-    print(filtered_etfs[['SYMBOL', 'UNDERLYING_ASSET', 'MATCHED_INDEX', 'AVG_FALL']].head())
+    # Detailed results table
+    logger.debug("ETF Selection Results:\n%s", LazyTable(
+        filtered_etfs,
+        ['SYMBOL', '%CHNG', 'AVG_FALL', 'SEVERITY', 'ALLOCATED_AMOUNT', 'QTY', 'FINAL_AMOUNT'],
+        index=False
+    ))
 
-    # Filter based on avg fall
-    filtered_etfs = filtered_etfs[filtered_etfs['%CHNG'] < filtered_etfs['AVG_FALL']]
+    log_summary(name, prepared, filtered_etfs, time.perf_counter() - started, p)
+    return filtered_etfs
 
-    # If no ETFs meet criteria, return empty DataFrame
+
+@register_strategy('dynamic')
+def allocate_dynamic(prepared, params=None):
+    """Linear MIN_CAP..MAX_CAP allocation by severity, scaled into the daily SIP range."""
+    return _allocate_with_curve(prepared, params, dynamic_allocation_curve, 'dynamic', "dynamic scaling")
+
+
+@register_strategy('conservative')
+def allocate_conservative(prepared, params=None):
+    """Piecewise allocation that stays near MIN_CAP for moderate dips, scaled into the daily SIP range."""
+    return _allocate_with_curve(prepared, params, conservative_allocation_curve, 'conservative',
+                                "conservative approach")
+
+
+@register_strategy('proportional')
+def allocate_proportional(prepared, params=None):
+    """
+    Original allocation: a single ETF gets MIN_CAP..MAX_CAP by severity,
+    several ETFs share MAX_CAP in proportion to their severity.
+    """
+    p = get_params(params)
+    started = time.perf_counter()
+    filtered_etfs = prepared.copy()
     if filtered_etfs.empty:
-        print("No ETFs meet the criteria (falling more than their average).")
         return filtered_etfs
 
-    # Handle deduplication with NULL/None MATCHED_INDEX values
-    filtered_etfs['MATCHED_INDEX_SAFE'] = filtered_etfs['MATCHED_INDEX'].fillna('NO_MATCH')
+    chng = filtered_etfs['%CHNG'].to_numpy(dtype=float)
+    avg_fall = filtered_etfs['AVG_FALL'].to_numpy(dtype=float)
+    ltp = filtered_etfs['LTP'].to_numpy(dtype=float)
 
-    # Use the safe version for deduplication
-    filtered_etfs = filtered_etfs.loc[filtered_etfs.groupby('MATCHED_INDEX_SAFE')['VOLUME'].idxmax()]
-
-    # Calculate severity
-    def calculate_severity(row):
-        return (row['AVG_FALL'] - row['%CHNG']) / abs(row['AVG_FALL'])
-
-    filtered_etfs['SEVERITY'] = filtered_etfs.apply(calculate_severity, axis=1)
-
-    # Print severity values for selected ETFs
-    print("\nSelected ETFs with severity scores:")
-    print(filtered_etfs[['SYMBOL', '%CHNG', 'AVG_FALL', 'SEVERITY']].to_string())
-
-    # Calculate fall ratio for reference
-    filtered_etfs['FALL_RATIO'] = filtered_etfs['%CHNG'] / filtered_etfs['AVG_FALL']
-
-    # Direct linear scaling from MIN_CAP to MAX_CAP based on severity
-    # This avoids hardcoded thresholds while maintaining a simple, proportional approach
-    def allocate_based_on_severity(row):
-        """
-        Dynamically allocate based on severity without hardcoded thresholds.
-        - The allocation scales linearly from MIN_CAP to MAX_CAP based on severity
-        - The scaling is unrestricted - any severity > 0 will get at least MIN_CAP
-        - As severity approaches 2.0, the allocation approaches MAX_CAP
-        - At severity = 2.0 or above, MAX_CAP is used
-        """
-        # Use 2.0 as a reference point for MAX_CAP (when dip is 3x the average)
-        max_severity_reference = 2.0
-
-        # Calculate allocation with direct scaling
-        if row['SEVERITY'] >= max_severity_reference:
-            # Cap at MAX_CAP for very high severity
-            return MAX_CAP
-        else:
-            # Scale linearly from MIN_CAP to MAX_CAP
-            allocation_range = MAX_CAP - MIN_CAP
-            severity_percentage = row['SEVERITY'] / max_severity_reference
-            return MIN_CAP + (severity_percentage * allocation_range)
-
-    # Apply the dynamic allocation to each ETF
-    filtered_etfs['INITIAL_ALLOCATION'] = filtered_etfs.apply(allocate_based_on_severity, axis=1)
-
-    # Print initial allocations
-    print("\nInitial allocations based on dynamic scaling:")
-    print(filtered_etfs[['SYMBOL', 'SEVERITY', 'INITIAL_ALLOCATION']].to_string())
-
-    # Check total allocation
-    total_allocated = filtered_etfs['INITIAL_ALLOCATION'].sum()
-    print(f"\nInitial total allocation: ₹{total_allocated:.2f}")
-
-    # Adjust if total allocation is outside the SIP range
-    if total_allocated < DAILY_SIP_MIN:
-        # Scale up all allocations proportionally, but respect MAX_CAP
-        scale_factor = min(DAILY_SIP_MIN / total_allocated,
-                           MAX_CAP / filtered_etfs['INITIAL_ALLOCATION'].max())
-
-        filtered_etfs['ALLOCATED_AMOUNT'] = filtered_etfs.apply(
-            lambda row: min(MAX_CAP, row['INITIAL_ALLOCATION'] * scale_factor), axis=1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        severity = (avg_fall - chng) / np.abs(avg_fall)
+
+    if len(severity) == 1:  # Single ETF scenario
+        allocated_amount = np.where(
+            severity > 1,
+            np.minimum(p['MAX_CAP'], severity * p['MAX_CAP']),
+            np.maximum(p['MIN_CAP'], severity * p['MIN_CAP'])
         )
-        print(f"Scaled up by factor of {scale_factor:.2f} to meet minimum SIP")
-    elif total_allocated > DAILY_SIP_MAX:
-        # Scale down all allocations proportionally
-        scale_factor = DAILY_SIP_MAX / total_allocated
-        filtered_etfs['ALLOCATED_AMOUNT'] = filtered_etfs['INITIAL_ALLOCATION'] * scale_factor
-        print(f"Scaled down by factor of {scale_factor:.2f} to meet maximum SIP")
-    else:
-        # No scaling needed, use initial allocations
-        filtered_etfs['ALLOCATED_AMOUNT'] = filtered_etfs['INITIAL_ALLOCATION']
+    else:  # Multiple ETFs
+        allocated_amount = p['MAX_CAP'] * severity / severity.sum()
 
-    # Process ETFs that are below MIN_CAP
-    below_min = filtered_etfs[filtered_etfs['ALLOCATED_AMOUNT'] < MIN_CAP]
+    filtered_etfs['SEVERITY'] = severity
+    filtered_etfs['ALLOCATED_AMOUNT'] = allocated_amount
+    with np.errstate(divide='ignore', invalid='ignore'):
+        filtered_etfs['QTY'] = np.where(ltp > 0, np.trunc(allocated_amount / ltp), 0).astype(np.int64)
 
-    if not below_min.empty:
-        print(f"{len(below_min)} ETFs below minimum cap of ₹{MIN_CAP}")
+    log_summary('proportional', prepared, filtered_etfs, time.perf_counter() - started, p)
+    return filtered_etfs
 
-        # Calculate required funds to bring all to MIN_CAP
-        shortfall = (MIN_CAP - below_min['ALLOCATED_AMOUNT']).sum()
 
-        # Check if we have enough budget within DAILY_SIP_MAX
-        current_total = filtered_etfs['ALLOCATED_AMOUNT'].sum()
-        available_budget = DAILY_SIP_MAX - current_total
+def run_strategy(etf_data, strategy='dynamic', params=None):
+    """
+    Preprocess a snapshot and allocate it with a registered strategy.
 
-        if shortfall <= available_budget:
-            # We can bring all to MIN_CAP
-            filtered_etfs.loc[filtered_etfs['ALLOCATED_AMOUNT'] < MIN_CAP, 'ALLOCATED_AMOUNT'] = MIN_CAP
-            print(f"Increased allocations to minimum cap using available budget")
-        else:
-            # Remove ETFs below MIN_CAP
-            filtered_etfs = filtered_etfs[filtered_etfs['ALLOCATED_AMOUNT'] >= MIN_CAP]
-            print(f"Removed ETFs below minimum cap due to budget constraints")
-
-    # Calculate quantities safely
-    filtered_etfs['QTY'] = filtered_etfs.apply(
-        lambda row: int(row['ALLOCATED_AMOUNT'] / row['LTP']) if row['LTP'] > 0 else 0,
-        axis=1
-    )
+    Args:
+    - etf_data (DataFrame): Raw NSE snapshot.
+    - strategy (str): Name of a registered strategy.
+    - params (dict): Parameter overrides, see get_params().
 
-    # Recalculate final amounts based on actual quantities
-    filtered_etfs['FINAL_AMOUNT'] = filtered_etfs['QTY'] * filtered_etfs['LTP']
+    Returns:
+    - DataFrame: Selected ETFs with QTY, or None if the snapshot is empty.
+    """
+    if etf_data.empty:
+        logger.info("No ETFs to allocate.")
+        return None
+    return get_strategy(strategy)(preprocess_etfs(etf_data, params), params)
 
-    # Final check on total amount
-    final_total = filtered_etfs['FINAL_AMOUNT'].sum()
 
-    # Detailed results table
-    print("\nETF Selection Results:")
-    result_table = filtered_etfs[['SYMBOL', '%CHNG', 'AVG_FALL', 'SEVERITY', 'ALLOCATED_AMOUNT', 'QTY', 'FINAL_AMOUNT']]
-    print(result_table.to_string(index=False))
+def evaluate_strategies(etf_data, names=None, params=None):
+    """
+    Run several strategies side by side on one snapshot, preprocessing it only once.
 
-    print(f"\nETFs selected: {len(filtered_etfs)}")
-    print(f"Total investment: ₹{final_total:.2f}")
-    print(f"Target range: ₹{DAILY_SIP_MIN} to ₹{DAILY_SIP_MAX}")
+    Args:
+    - etf_data (DataFrame): Raw NSE snapshot.
+    - names (list): Strategy names, defaults to every registered strategy.
+    - params (dict): Parameter overrides, see get_params().
 
-    return filtered_etfs
+    Returns:
+    - dict: Strategy name -> allocation DataFrame.
+    """
+    prepared = preprocess_etfs(etf_data, params)
+    return {name: get_strategy(name)(prepared, params) for name in (names or list(STRATEGIES))}
+
+
+def calculate_quantities_old(filtered_etfs, params=None):
+    """
+    Filter ETFs based on criteria:
+    - Match UNDERLYING_ASSET with INDEX_NAME using substring checks.
+    - Retain ETFs with sufficient trading volume.
+    - Deduplicate ETFs for the same underlying asset, keeping the one with the highest volume.
+    - Allocate SIP dynamically with caps for single and multiple ETFs.
+    """
+    return run_strategy(filtered_etfs, 'proportional', params)
+
+
+def calculate_quantities_(filtered_etfs, params=None):
+    """
+    Filter ETFs based on criteria and allocate investment amounts with constraints.
+    More conservative allocation for moderate severity situations.
+    """
+    return run_strategy(filtered_etfs, 'conservative', params)
+
+
+def calculate_quantities(filtered_etfs, params=None):
+    """
+    Filter ETFs based on criteria and allocate investment amounts with constraints.
+    Dynamic allocation based on severity without hardcoded thresholds.
+
+    params optionally overrides the module-level tuning constants (see get_params).
+    """
+    return run_strategy(filtered_etfs, 'dynamic', params)
@@ -0,0 +1,167 @@
+# incremental.py
+import time
+
+import numpy as np
+
+from filter_etfs import DEBT_KEYWORDS, clean_etf_data, get_params, get_strategy
+from reference_data import load_average_fall_table
+from symbol_cache import classify_symbols
+
+
+class IncrementalEvaluator:
+    """
+    Keep a preprocessed snapshot in memory and re-run selection as prices move.
+
+    Cleaning and classification (debt flag, matched index, average fall) happen
+    once. A delta of changed rows only rechecks the filters of those rows and
+    re-picks the highest-volume ETF of the index groups they belong to. The
+    allocation then runs over the per-index candidates only (one row per index,
+    independent of the snapshot size), since SIP scaling couples all of them.
+
+    Results match preprocess_etfs() followed by the strategy on the full,
+    updated snapshot.
+    """
+
+    def __init__(self, etf_data, strategy='dynamic', params=None, classification_cache=None):
+        """
+        Args:
+            etf_data (DataFrame): Full raw or typed NSE snapshot
+            strategy (str): Name of a registered allocation strategy
+            params (dict): Parameter overrides, see get_params()
+            classification_cache (SymbolClassificationCache): Store for per-symbol classification
+        """
+        self.strategy = strategy
+        self.params = get_params(params)
+        get_strategy(strategy)
+
+        etf_data = clean_etf_data(etf_data)
+        symbols = etf_data['SYMBOL'].astype(str).str.strip()
+        if symbols.duplicated().any():
+            raise ValueError(f"Duplicate symbols in snapshot: {sorted(set(symbols[symbols.duplicated()]))}")
+
+        classification = classify_symbols(etf_data, load_average_fall_table(), DEBT_KEYWORDS,
+                                          classification_cache)
+        is_debt = classification['IS_DEBT'].to_numpy()
+        # Debt ETFs never qualify, whatever their prices do
+        self.debt_symbols = set(symbols[is_debt])
+
+        base = etf_data[~is_debt].copy()
+        base['MATCHED_INDEX'] = classification['MATCHED_INDEX'][~is_debt]
+        base['AVG_FALL'] = classification['AVG_FALL'][~is_debt].fillna(self.params['GENERIC_AVERAGE_FALL'])
+        base['MATCHED_INDEX_SAFE'] = base['MATCHED_INDEX'].fillna('NO_MATCH')
+        self.base = base
+        self.rows = len(etf_data)
+
+        self.positions = {symbol: position for position, symbol in enumerate(symbols[~is_debt])}
+        self.ltp = base['LTP'].to_numpy().copy()
+        self.chng = base['%CHNG'].to_numpy().copy()
+        self.volume = base['VOLUME'].to_numpy().copy()
+        self.avg_fall = base['AVG_FALL'].to_numpy(dtype=float)
+
+        # Group codes follow the sorted index names, as groupby orders them
+        self.group_codes, self.group_names = _factorize_sorted(base['MATCHED_INDEX_SAFE'].to_numpy())
+        order = np.argsort(self.group_codes, kind='stable')
+        boundaries = np.flatnonzero(np.diff(self.group_codes[order])) + 1
+        self.members = np.split(order, boundaries) if len(order) else []
+
+        self.eligible = self._check(np.arange(len(base)))
+        self.winners = np.array([self._winner(group) for group in range(len(self.group_names))], dtype=np.int64)
+        self.last_update = {'changed': 0, 'groups': len(self.group_names), 'update_ms': 0.0}
+        self._selection = None
+
+    def _check(self, positions):
+        """Price/volume and average-fall filters for the given rows."""
+        return ((self.ltp[positions] > 0)
+                & (self.volume[positions] >= self.params['MIN_VOLUME'])
+                & (self.chng[positions] < self.avg_fall[positions]))
+
+    def _winner(self, group):
+        """Position of the highest-volume eligible ETF in a group, or -1 if none qualifies."""
+        members = self.members[group]
+        members = members[self.eligible[members]]
+        if not len(members):
+            return -1
+        # argmax keeps the first of equal volumes, like idxmax over the snapshot order
+        return members[np.argmax(self.volume[members])]
+
+    def update(self, delta):
+        """
+        Apply changed rows and recompute only the affected filter results and groups.
+
+        Args:
+            delta (DataFrame): Rows with SYMBOL and new LTP, %CHNG and VOLUME
+
+        Returns:
+            DataFrame: The re-evaluated selection, see evaluate()
+        """
+        started = time.perf_counter()
+        delta = clean_etf_data(delta)
+        delta['SYMBOL'] = delta['SYMBOL'].astype(str).str.strip()
+        delta = delta.drop_duplicates('SYMBOL', keep='last')
+
+        unknown = [symbol for symbol in delta['SYMBOL']
+                   if symbol not in self.positions and symbol not in self.debt_symbols]
+        if unknown:
+            raise ValueError(f"Unknown symbols in delta: {unknown}. Rebuild the evaluator from a full snapshot.")
+
+        known = [symbol in self.positions for symbol in delta['SYMBOL']]
+        delta = delta[known]
+        positions = np.fromiter((self.positions[symbol] for symbol in delta['SYMBOL']),
+                                dtype=np.int64, count=len(delta))
+        was_winner = np.isin(positions, self.winners)
+
+        self.ltp[positions] = delta['LTP'].to_numpy()
+        self.chng[positions] = delta['%CHNG'].to_numpy()
+        self.volume[positions] = delta['VOLUME'].to_numpy()
+
+        before = self.eligible[positions]
+        after = self._check(positions)
+        self.eligible[positions] = after
+
+        # Rows that neither were nor are eligible cannot change their group's winner
+        groups = np.unique(self.group_codes[positions[before | after]])
+        previous = self.winners[groups].copy()
+        for group in groups:
+            self.winners[group] = self._winner(group)
+
+        # The allocation only needs rerunning if a candidate or its prices changed
+        if was_winner.any() or (self.winners[groups] != previous).any():
+            self._selection = None
+
+        self.last_update = {
+            'changed': int(len(positions)),
+            'groups': int(len(groups)),
+            'update_ms': round((time.perf_counter() - started) * 1000, 3)
+        }
+        return self.evaluate()
+
+    def candidates(self):
+        """Return the per-index candidates, as preprocess_etfs() would for the current prices."""
+        winners = self.winners[self.winners >= 0]
+        candidates = self.base.iloc[winners].copy()
+        candidates['LTP'] = self.ltp[winners]
+        candidates['%CHNG'] = self.chng[winners]
+        candidates['VOLUME'] = self.volume[winners]
+        candidates.attrs['pipeline'] = {
+            'counts': {'rows': self.rows, 'changed': self.last_update['changed'],
+                       'groups_recomputed': self.last_update['groups'], 'candidates': int(len(winners))},
+            'timings_ms': {'update': self.last_update['update_ms']}
+        }
+        return candidates
+
+    def evaluate(self):
+        """
+        Allocate the current candidates with the configured strategy.
+
+        Returns:
+            DataFrame: Selected ETFs with QTY (cached until a delta changes the candidates)
+        """
+        if self._selection is None:
+            self._selection = get_strategy(self.strategy)(self.candidates(), self.params)
+        return self._selection.copy()
+
+
+def _factorize_sorted(values):
+    """Integer codes and sorted unique labels of an object array."""
+    names, codes = np.unique(values.astype(str), return_inverse=True)
+    return codes.astype(np.int64), names
@@ -0,0 +1,125 @@
+# index_matcher.py
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+class IndexMatcher:
+    """
+    Aho-Corasick matcher over lowercase INDEX_NAME values.
+
+    The automaton is built once from the reference index names and finds every
+    name contained in an UNDERLYING_ASSET string in a single left-to-right scan.
+    When several names match, the longest one wins; names of equal length are
+    resolved by their order in the reference file. Results are memoized per
+    distinct asset string, so repeated snapshots only pay for new assets.
+    """
+
+    def __init__(self, index_names):
+        self.index_names = [str(name) for name in index_names]
+        self._goto = [{}]
+        self._fail = [0]
+        self._best = [None]  # Best pattern id ending at each node
+        self._cache = {}
+
+        for pattern_id, name in enumerate(self.index_names):
+            self._add_pattern(name.lower(), pattern_id)
+        self._build_failure_links()
+
+    def _is_better(self, candidate, current):
+        """Longest name first, then earliest in the reference order."""
+        if candidate is None:
+            return False
+        if current is None:
+            return True
+        candidate_len = len(self.index_names[candidate])
+        current_len = len(self.index_names[current])
+        return candidate_len > current_len or (candidate_len == current_len and candidate < current)
+
+    def _add_pattern(self, pattern, pattern_id):
+        if not pattern:
+            return
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._best.append(None)
+            node = next_node
+        if self._is_better(pattern_id, self._best[node]):
+            self._best[node] = pattern_id
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                # Inherit the best match reachable through the suffix link
+                if self._is_better(self._best[self._fail[child]], self._best[child]):
+                    self._best[child] = self._best[self._fail[child]]
+
+    def _scan(self, text):
+        node = 0
+        best = None
+        for char in text.lower():
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            if self._is_better(self._best[node], best):
+                best = self._best[node]
+        return None if best is None else self.index_names[best]
+
+    def match(self, underlying_asset):
+        """
+        Match a single UNDERLYING_ASSET string.
+
+        Args:
+        - underlying_asset (str): The name of the underlying asset (e.g., "Gold ETF").
+
+        Returns:
+        - str: The matched INDEX_NAME, or None if no index name is contained in it.
+        """
+        if not isinstance(underlying_asset, str):
+            return None
+        try:
+            return self._cache[underlying_asset]
+        except KeyError:
+            result = self._cache[underlying_asset] = self._scan(underlying_asset)
+            return result
+
+    def match_series(self, assets):
+        """
+        Match a whole UNDERLYING_ASSET column, scanning each distinct value once.
+
+        Args:
+        - assets (Series): UNDERLYING_ASSET values.
+
+        Returns:
+        - Series: Matched INDEX_NAME per row (None where nothing matched).
+        """
+        codes, unique_assets = pd.factorize(assets)
+        # Missing assets get code -1, which picks the trailing None
+        matched = np.array([self.match(asset) for asset in unique_assets] + [None], dtype=object)
+        return pd.Series(matched[codes], index=assets.index, dtype=object)
+
+
+_matchers = {}
+
+
+def get_matcher(index_names):
+    """Return a shared IndexMatcher for the given index names, building it on first use."""
+    key = tuple(str(name) for name in index_names)
+    matcher = _matchers.get(key)
+    if matcher is None:
+        matcher = _matchers[key] = IndexMatcher(key)
+    return matcher
@@ -0,0 +1,347 @@
+# market_store.py
+import argparse
+import json
+import os
+import re
+import shutil
+from datetime import datetime
+
+import pandas as pd
+
+from atomic_io import atomic_write
+from backtest import find_snapshots
+from snapshot_cache import (CACHE_SUFFIX, META_FILE, publish_snapshot_cache, read_snapshot_cache, type_snapshot,
+                            write_snapshot_cache)
+
+STORE_ROOT = 'snapshots'
+INDEX_FILE = 'symbol_index.json'
+DAILY_FILE = 'daily' + CACHE_SUFFIX
+
+DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+# HHMMSSfff, or HHMMSS for snapshots stored before millisecond names
+SNAPSHOT_PATTERN = re.compile(r'^(\d{6}(?:\d{3})?)' + re.escape(CACHE_SUFFIX) + '$')
+RETIRED_PATTERN = re.compile(r'^daily\.\d+\.old$')
+
+
+def time_code(timestamp):
+    """Millisecond time of day (HHMMSSfff) naming a snapshot; sorts after the older HHMMSS names it extends."""
+    return timestamp.strftime('%H%M%S') + f"{timestamp.microsecond // 1000:03d}"
+
+
+class MarketStore:
+    """
+    Date-partitioned store of typed ETF snapshots with a symbol -> dates index.
+
+    Layout under the root directory:
+        <YYYY-MM-DD>/<HHMMSSfff>.cache  intraday snapshots, written once and never modified
+        <YYYY-MM-DD>/daily.cache      compacted snapshots of the day, with a SNAPSHOT_TIME column
+        symbol_index.json             SYMBOL -> sorted list of dates it appears on
+
+    Every file uses the columnar format of snapshot_cache, so partitions are
+    memory-mapped rather than parsed.
+    """
+
+    def __init__(self, root=STORE_ROOT):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.index_path = os.path.join(root, INDEX_FILE)
+        self.index = self._load_index()
+
+    # Index
+
+    def _load_index(self):
+        try:
+            with open(self.index_path) as file:
+                return {symbol: set(dates) for symbol, dates in json.load(file).items()}
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        with atomic_write(self.index_path) as file:
+            json.dump({symbol: sorted(dates) for symbol, dates in self.index.items()}, file)
+
+    def register(self, date, symbols):
+        """Record that symbols have data on a date."""
+        changed = False
+        for symbol in symbols:
+            dates = self.index.setdefault(str(symbol).strip(), set())
+            if date not in dates:
+                dates.add(date)
+                changed = True
+        if changed:
+            self._save_index()
+
+    def rebuild_index(self):
+        """Recreate the symbol index by scanning every partition."""
+        self.index = {}
+        for date in self.dates():
+            for symbol in self.load_date(date, columns=['SYMBOL'])['SYMBOL'].unique():
+                self.index.setdefault(str(symbol), set()).add(date)
+        self._save_index()
+
+    # Layout
+
+    def partition(self, date):
+        return os.path.join(self.root, date)
+
+    def snapshot_path(self, timestamp):
+        """Raw CSV location for a snapshot taken at a timestamp; its cache sits next to it."""
+        return os.path.join(self.partition(timestamp.strftime('%Y-%m-%d')), time_code(timestamp) + '.csv')
+
+    def dates(self, start=None, end=None):
+        """Partition dates within an inclusive YYYY-MM-DD range, sorted."""
+        dates = [name for name in os.listdir(self.root)
+                 if DATE_PATTERN.match(name) and os.path.isdir(self.partition(name))]
+        return sorted(date for date in dates if (not start or date >= start) and (not end or date <= end))
+
+    def _retired_dailies(self, date):
+        partition = self.partition(date)
+        if not os.path.isdir(partition):
+            return []
+        return [os.path.join(partition, name) for name in os.listdir(partition) if RETIRED_PATTERN.match(name)]
+
+    def daily_path(self, date):
+        """
+        Compacted file of a date, or None.
+
+        Compaction swaps the daily file with two renames. If it stopped between
+        them, only the retired copy exists; it still holds every snapshot merged
+        before, and the newer ones are still intraday files, so it is read instead.
+        """
+        daily = os.path.join(self.partition(date), DAILY_FILE)
+        if os.path.isdir(daily):
+            return daily
+        retired = self._retired_dailies(date)
+        return retired[0] if retired else None
+
+    def _recover(self, date):
+        """Undo an interrupted compaction: restore a retired daily file and drop leftovers."""
+        partition = self.partition(date)
+        daily = os.path.join(partition, DAILY_FILE)
+        for retired in self._retired_dailies(date):
+            if os.path.isdir(daily):
+                shutil.rmtree(retired)
+            else:
+                os.replace(retired, daily)
+        for name in os.listdir(partition) if os.path.isdir(partition) else []:
+            if name.startswith('daily.') and name.endswith('.tmp'):
+                shutil.rmtree(os.path.join(partition, name), ignore_errors=True)
+
+    def intraday_snapshots(self, date):
+        """
+        (time code, cache directory) of the date's snapshots that are not compacted yet.
+
+        Directories without metadata are left out; snapshots are renamed into
+        place complete, so one without metadata is the remains of an interrupted write.
+        """
+        partition = self.partition(date)
+        if not os.path.isdir(partition):
+            return []
+        snapshots = []
+        for name in os.listdir(partition):
+            match = SNAPSHOT_PATTERN.match(name)
+            cache_dir = os.path.join(partition, name)
+            if match and os.path.isfile(os.path.join(cache_dir, META_FILE)):
+                snapshots.append((match.group(1), cache_dir))
+        return sorted(snapshots)
+
+    # Ingest
+
+    def ingest(self, etf_data, timestamp):
+        """
+        Append a snapshot to its date partition and index its symbols.
+
+        Args:
+            etf_data (DataFrame): Raw or typed snapshot
+            timestamp (datetime): When the snapshot was taken
+
+        Returns:
+            str: Cache directory of the new snapshot
+        """
+        cache_dir = os.path.splitext(self.snapshot_path(timestamp))[0] + CACHE_SUFFIX
+        if os.path.exists(cache_dir) or self._compacted_time(timestamp):
+            raise ValueError(f"Snapshot {timestamp:%Y-%m-%d} {time_code(timestamp)} already stored")
+        typed = type_snapshot(etf_data)
+        publish_snapshot_cache(typed, cache_dir)
+        self.register(timestamp.strftime('%Y-%m-%d'), typed['SYMBOL'])
+        return cache_dir
+
+    def ingest_file(self, csv_path, timestamp=None):
+        """Ingest a downloaded CSV, timestamped by its modification time unless given."""
+        timestamp = timestamp or datetime.fromtimestamp(os.path.getmtime(csv_path))
+        return self.ingest(pd.read_csv(csv_path), timestamp)
+
+    def _compacted_time(self, timestamp):
+        daily = self.daily_path(timestamp.strftime('%Y-%m-%d'))
+        if not daily:
+            return False
+        times = read_snapshot_cache(daily)['SNAPSHOT_TIME']
+        return time_code(timestamp) in set(times.astype(str))
+
+    # Compaction
+
+    def compact(self, date, drop_raw=False):
+        """
+        Merge a date's intraday snapshots into its daily file.
+
+        The new daily file is written completely before the intraday caches are
+        removed, and a daily file retired by an interrupted swap is restored
+        first (see daily_path), so an interrupted compaction loses nothing.
+
+        Args:
+            date (str): Partition date (YYYY-MM-DD)
+            drop_raw (bool): Also delete the raw intraday CSVs
+
+        Returns:
+            int: Number of snapshots merged
+        """
+        self._recover(date)
+        snapshots = self.intraday_snapshots(date)
+        if not snapshots:
+            return 0
+
+        partition = self.partition(date)
+        daily = os.path.join(partition, DAILY_FILE)
+        frames = [read_snapshot_cache(daily, mmap=False)] if os.path.isdir(daily) else []
+        # Snapshots already merged by an interrupted compaction are only cleaned up
+        merged_times = set(frames[0]['SNAPSHOT_TIME'].astype(str)) if frames else set()
+        for time_code, cache_dir in snapshots:
+            if time_code in merged_times:
+                continue
+            frame = read_snapshot_cache(cache_dir, mmap=False)
+            frame.insert(0, 'SNAPSHOT_TIME', time_code)
+            frames.append(frame)
+
+        merged = pd.concat(frames, ignore_index=True)
+        # Categories differ between snapshots; concat falls back to plain text columns
+        for name in merged.columns:
+            column = merged[name]
+            if not pd.api.types.is_numeric_dtype(column) and not isinstance(column.dtype, pd.CategoricalDtype):
+                merged[name] = column.astype('category')
+
+        temp_dir = os.path.join(partition, f"daily.{os.getpid()}.tmp")
+        write_snapshot_cache(merged, temp_dir)
+        if os.path.isdir(daily):
+            retired = os.path.join(partition, f"daily.{os.getpid()}.old")
+            os.replace(daily, retired)
+            os.replace(temp_dir, daily)
+            shutil.rmtree(retired)
+        else:
+            os.replace(temp_dir, daily)
+
+        for time_code, cache_dir in snapshots:
+            shutil.rmtree(cache_dir)
+            raw_path = os.path.join(partition, time_code + '.csv')
+            if drop_raw and os.path.exists(raw_path):
+                os.remove(raw_path)
+        return len(snapshots)
+
+    # Queries
+
+    def load_date(self, date, latest_only=False, columns=None):
+        """
+        Read every snapshot of a date, compacted or not.
+
+        Args:
+            date (str): Partition date (YYYY-MM-DD)
+            latest_only (bool): Return only the last snapshot of the day
+            columns (list): Subset of columns to return (SNAPSHOT_TIME is always kept)
+
+        Returns:
+            DataFrame: Rows of the date's snapshots with SNAPSHOT_TIME (HHMMSSfff)
+        """
+        frames = []
+        merged_times = set()
+        daily = self.daily_path(date)
+        if daily:
+            frames.append(read_snapshot_cache(daily))
+            merged_times = set(frames[0]['SNAPSHOT_TIME'].astype(str))
+        for time_code, cache_dir in self.intraday_snapshots(date):
+            if time_code in merged_times:
+                continue
+            frame = read_snapshot_cache(cache_dir)
+            frame.insert(0, 'SNAPSHOT_TIME', time_code)
+            frames.append(frame)
+        if not frames:
+            return pd.DataFrame()
+
+        if columns is not None:
+            wanted = ['SNAPSHOT_TIME'] + [name for name in columns if name != 'SNAPSHOT_TIME']
+            frames = [frame[[name for name in wanted if name in frame.columns]] for frame in frames]
+        data = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        data['SNAPSHOT_TIME'] = data['SNAPSHOT_TIME'].astype(str)
+        if latest_only:
+            data = data[data['SNAPSHOT_TIME'] == data['SNAPSHOT_TIME'].max()].reset_index(drop=True)
+        return data
+
+    def symbol_history(self, symbol, start=None, end=None, latest_only=False):
+        """
+        Rows of one symbol between two dates, reading only the partitions it appears in.
+
+        Returns:
+            DataFrame: The symbol's rows with DATE and SNAPSHOT_TIME columns
+        """
+        dates = sorted(date for date in self.index.get(symbol, ())
+                       if (not start or date >= start) and (not end or date <= end))
+        frames = []
+        for date in dates:
+            data = self.load_date(date, latest_only)
+            rows = data[data['SYMBOL'].astype(str) == symbol].copy()
+            rows.insert(0, 'DATE', date)
+            frames.append(rows)
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the partitioned ETF snapshot store.")
+    parser.add_argument('--root', default=STORE_ROOT, help="Store root directory")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest = commands.add_parser('ingest', help="Ingest ETF_Data_YYYY-MM-DD.csv files from a directory")
+    ingest.add_argument('--dir', default='.', help="Directory holding the downloaded CSVs")
+    ingest.add_argument('--start', help="First date (YYYY-MM-DD)")
+    ingest.add_argument('--end', help="Last date (YYYY-MM-DD)")
+
+    compact = commands.add_parser('compact', help="Merge intraday snapshots into daily files")
+    compact.add_argument('--date', action='append', help="Date to compact (default: every date)")
+    compact.add_argument('--drop-raw', action='store_true', help="Delete raw intraday CSVs as well")
+
+    commands.add_parser('reindex', help="Rebuild the symbol index from the partitions")
+
+    query = commands.add_parser('query', help="Print stored rows")
+    query.add_argument('--symbol', help="Symbol to read across dates")
+    query.add_argument('--date', help="Date to read every symbol of")
+    query.add_argument('--start', help="First date (YYYY-MM-DD)")
+    query.add_argument('--end', help="Last date (YYYY-MM-DD)")
+    query.add_argument('--latest', action='store_true', help="Only the last snapshot of each day")
+    args = parser.parse_args()
+
+    store = MarketStore(args.root)
+    if args.command == 'ingest':
+        for date, path in find_snapshots(args.dir, args.start, args.end):
+            mtime = datetime.fromtimestamp(os.path.getmtime(path))
+            # Keep the file's date even if it was copied later; the time of day is best effort
+            timestamp = datetime.combine(datetime.strptime(date, '%Y-%m-%d').date(), mtime.time())
+            try:
+                print(f"Ingested {path} -> {store.ingest_file(path, timestamp)}")
+            except ValueError as e:
+                print(f"Skipped {path}: {e}")
+    elif args.command == 'compact':
+        for date in args.date or store.dates():
+            merged = store.compact(date, args.drop_raw)
+            if merged:
+                print(f"{date}: merged {merged} snapshots")
+    elif args.command == 'reindex':
+        store.rebuild_index()
+        print(f"Indexed {len(store.index)} symbols")
+    elif args.command == 'query':
+        if args.symbol:
+            print(store.symbol_history(args.symbol, args.start, args.end, args.latest).to_string(index=False))
+        elif args.date:
+            print(store.load_date(args.date, args.latest).to_string(index=False))
+        else:
+            parser.error("query needs --symbol or --date")
+
+
+if __name__ == "__main__":
+    main()
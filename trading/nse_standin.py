@@ -0,0 +1,122 @@
+# nse_standin.py
+import argparse
+import gzip
+import io
+import secrets
+import time
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from fetch_etf_data import ETF_CSV_PATH, ETF_PAGE_PATH
+
+# Cookies the landing pages hand out, as on nseindia.com
+COOKIE_NAMES = ['nsit', 'nseappid']
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Mimics the NSE cookie handshake: the home and ETF pages set session cookies,
+    and the CSV endpoint answers 401 unless every cookie is present and current.
+    The CSV is gzip-compressed for clients that accept it, as NSE does.
+    """
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path in ('/', ETF_PAGE_PATH):
+            self._landing_page()
+        elif path == urlsplit(ETF_CSV_PATH).path:
+            self._etf_csv()
+        else:
+            self._reply(404, 'text/plain', b'Not found')
+
+    def _landing_page(self):
+        ttl = self.server.token_ttl
+        headers = []
+        for name in COOKIE_NAMES:
+            token = secrets.token_hex(16)
+            self.server.tokens[token] = time.time() + ttl
+            headers.append(('Set-Cookie', f"{name}={token}; Path=/; Max-Age={ttl}; HttpOnly"))
+        self._reply(200, 'text/html', b'<html><body>ETF</body></html>', headers)
+
+    def _etf_csv(self):
+        cookies = SimpleCookie(self.headers.get('Cookie', ''))
+        now = time.time()
+        valid = all(name in cookies and self.server.tokens.get(cookies[name].value, 0) > now
+                    for name in COOKIE_NAMES)
+        if not valid:
+            self._reply(401, 'application/json', b'{"error": "unauthorized"}')
+            return
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            self._reply(200, 'text/csv', self.server.csv_gzip, [('Content-Encoding', 'gzip')])
+        else:
+            self._reply(200, 'text/csv', self.server.csv_bytes)
+
+    def _reply(self, status, content_type, body, headers=()):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(csv_bytes, host='127.0.0.1', port=8765, token_ttl=1800, verbose=False):
+    """
+    Build (without starting) a stand-in NSE server.
+
+    Args:
+        csv_bytes (bytes): Body served by the ETF CSV endpoint
+        host (str): Interface to bind
+        port (int): Port to bind, 0 picks a free one
+        token_ttl (int): Seconds before issued cookies stop being accepted
+        verbose (bool): Log every request
+
+    Returns:
+        ThreadingHTTPServer: Call serve_forever() to run it
+    """
+    server = ThreadingHTTPServer((host, port), StandInHandler)
+    server.csv_bytes = csv_bytes
+    server.csv_gzip = gzip.compress(csv_bytes)
+    server.token_ttl = token_ttl
+    server.tokens = {}
+    server.verbose = verbose
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the NSE ETF cookie handshake and CSV.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--csv', help="CSV file to serve (defaults to a synthetic 250-row snapshot)")
+    parser.add_argument('--token-ttl', type=int, default=1800, help="Cookie lifetime in seconds")
+    parser.add_argument('--verbose', action='store_true', help="Log every request")
+    args = parser.parse_args()
+
+    if args.csv:
+        with open(args.csv, 'rb') as file:
+            csv_bytes = file.read()
+    else:
+        from benchmarks.synthetic import generate_snapshot
+        buffer = io.StringIO()
+        generate_snapshot(250).to_csv(buffer, index=False)
+        csv_bytes = buffer.getvalue().encode()
+
+    server = make_server(csv_bytes, args.host, args.port, args.token_ttl, args.verbose)
+    print(f"Serving stand-in NSE on http://{args.host}:{server.server_port} "
+          f"(set NSE_BASE_URL to this address and NSE_COOKIE_MODE=http)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,35 @@
 # order_manager.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import pandas as pd
 from account import Account
+from broker_handlers import ORDER_TAG, rate_limiter
+from filter_etfs import PROFILE_PARAMETERS, allocate_profiles
+from session_cache import get_session_cache
+
+LOGIN_WORKERS = 16  # Copy-account logins running at once
+DEFAULT_BROKER_CONCURRENCY = 4  # Calls in flight per broker unless overridden
+BROKER_ALIASES = {'SHOONYA': 'FINVASIA'}
+
+# Columns of OrderManager.order_results, one row per order attempt
+ORDER_RESULT_COLUMNS = [
+    'USER_ID', 'BROKER', 'ROLE', 'SYMBOL', 'QTY', 'STATUS', 'ORDER_ID', 'RESPONSE', 'ERROR', 'LATENCY'
+]
+
+# Columns of OrderManager.fills, one row per order in order_results
+FILL_COLUMNS = [
+    'USER_ID', 'BROKER', 'ROLE', 'SYMBOL', 'QTY', 'ORDER_ID', 'MATCHED_BY', 'STATUS', 'FILLED_QTY', 'AVG_PRICE',
+    'MESSAGE'
+]
+
+
+def print_rate_limit_report():
+    """Print queueing delay per broker endpoint so RATE_LIMITS can be tuned."""
+    for (broker, endpoint), stats in rate_limiter.report().items():
+        print(f"  {broker} {endpoint}: {stats['calls']} calls, waited {stats['waited']:.2f}s "
+              f"(avg {stats['avg_wait']:.3f}s, max {stats['max_wait']:.3f}s)")
 
 
 def check_subscription_status(accounts_file):
@@ -60,11 +88,46 @@ def check_subscription_status(accounts_file):
     return df
 
 
+class BrokerSlots:
+    """
+    Per-broker semaphores capping how many calls run against one broker at once.
+
+    Args:
+        limits (dict): Broker name -> concurrent calls, for brokers that differ from the default
+        default (int): Concurrent calls for every other broker
+    """
+
+    def __init__(self, limits=None, default=DEFAULT_BROKER_CONCURRENCY):
+        self.limits = {self.key(broker): limit for broker, limit in (limits or {}).items()}
+        self.default = default
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(broker):
+        name = str(broker).upper()
+        return BROKER_ALIASES.get(name, name)
+
+    def __call__(self, broker):
+        """Semaphore guarding calls to a broker, created on first use."""
+        key = self.key(broker)
+        with self._lock:
+            semaphore = self._semaphores.get(key)
+            if semaphore is None:
+                semaphore = self._semaphores[key] = threading.BoundedSemaphore(self.limits.get(key, self.default))
+            return semaphore
+
+
 class OrderManager:
-    def __init__(self, accounts_file):
+    def __init__(self, accounts_file, max_workers=LOGIN_WORKERS, broker_limits=None):
         self.accounts = []
         self.master_account = None
         self.accounts_file = accounts_file
+        self.max_workers = max_workers
+        self.broker_slots = BrokerSlots(broker_limits)
+        self.login_report = {}
+        self.order_results = pd.DataFrame(columns=ORDER_RESULT_COLUMNS)
+        self.fills = pd.DataFrame(columns=FILL_COLUMNS)
         self.load_accounts(accounts_file)
 
     def load_accounts(self, accounts_file):
@@ -99,7 +162,11 @@ class OrderManager:
                     multiplier=row['COPY_MULTIPLIER'],
                     copy=row['COPY'],
                     subscription_status=row['SUBSCRIPTION_STATUS'],
-                    subscription_expiry=safe_get(row, 'SUBSCRIPTION_EXPIRY')
+                    subscription_expiry=safe_get(row, 'SUBSCRIPTION_EXPIRY'),
+                    allocation_params={
+                        name: float(row[name]) for name in PROFILE_PARAMETERS
+                        if safe_get(row, name) is not None
+                    }
                 )
 
                 if account.is_master:
@@ -111,30 +178,171 @@ class OrderManager:
 
         print("Accounts loaded successfully.")
 
+    def _timed_login(self, account):
+        """Log in one account within its broker's concurrency cap; returns (success, seconds)."""
+        with self.broker_slots(account.broker):
+            started = time.perf_counter()
+            success = account.login()
+            return success, time.perf_counter() - started
+
+    @staticmethod
+    def _save_sessions():
+        """Write the sessions opened by login_all to the session cache in one go."""
+        try:
+            get_session_cache().flush()
+        except Exception as e:
+            print(f"Could not save broker sessions: {str(e)}")
+
     def login_all(self):
-        """Log in to all broker accounts."""
+        """
+        Log in to all broker accounts.
+
+        The master logs in first; copy accounts then log in concurrently on up to
+        max_workers threads, with at most the broker's limit in flight per broker.
+        Total and per-account latencies are kept in login_report, and new
+        sessions are written to the session cache once at the end.
+
+        Returns:
+            bool: False if the master login failed
+        """
         print("Logging in to all accounts...")
+        started = time.perf_counter()
+        latencies = {}
 
         # Login to master account
         if self.master_account:
-            if not self.master_account.login():
+            success, seconds = self._timed_login(self.master_account)
+            latencies[self.master_account.user_id] = (success, seconds)
+            if not success:
                 print(f"Failed to login master account: {self.master_account.user_id}")
+                self.login_report = {'total': time.perf_counter() - started, 'accounts': latencies}
+                self._save_sessions()
                 return False
 
         # Login to copy accounts
-        for account in self.accounts:
-            if not account.login():
-                print(f"Failed to login account: {account.user_id}")
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            results = executor.map(self._timed_login, self.accounts)
+            for account, (success, seconds) in zip(self.accounts, results):
+                latencies[account.user_id] = (success, seconds)
+                if not success:
+                    print(f"Failed to login account: {account.user_id}")
+        self._save_sessions()
+
+        total = time.perf_counter() - started
+        self.login_report = {'total': total, 'accounts': latencies}
+        succeeded = sum(1 for success, _ in latencies.values() if success)
+        print(f"Logged in {succeeded}/{len(latencies)} accounts in {total:.2f}s")
+        for user_id, (success, seconds) in sorted(latencies.items(), key=lambda item: -item[1][1]):
+            print(f"  {user_id}: {'ok' if success else 'failed'} in {seconds:.2f}s")
+        print("Rate limiter:")
+        print_rate_limit_report()
 
         return True
 
-    def place_orders(self, filtered_etfs):
+    def profile_quantities(self, prepared):
+        """
+        Compute quantities for every copy account that has its own allocation profile.
+
+        All distinct profiles are allocated together in one broadcast call, so the
+        cost does not grow with the number of accounts sharing a profile.
+
+        Args:
+            prepared: Output of filter_etfs.preprocess_etfs for today's snapshot
+
+        Returns:
+            dict: user_id -> {symbol: quantity}
+        """
+        profiles = {}
+        account_profiles = {}
+        for account in self.accounts:
+            if account.allocation_params:
+                key = repr(sorted(account.allocation_params.items()))
+                profiles[key] = account.allocation_params
+                account_profiles[account.user_id] = key
+
+        if not profiles or prepared is None or prepared.empty:
+            return {}
+
+        quantities = allocate_profiles(prepared, profiles)['QTY']
+        return {user_id: quantities[key].to_dict() for user_id, key in account_profiles.items()}
+
+    @staticmethod
+    def _order_succeeded(response):
+        """Handlers return None/False on failure; Finvasia reports rejections as stat Not_Ok."""
+        if response is None or response is False:
+            return False
+        return not (isinstance(response, dict) and response.get('stat') == 'Not_Ok')
+
+    def _submit_basket(self, account, role, orders):
+        """
+        Place an account's market buys in one batch call within the broker's concurrency cap.
+
+        Args:
+            account (Account): Logged-in account
+            role (str): 'MASTER' or 'COPY'
+            orders (list): (symbol, quantity) pairs
+
+        Returns:
+            list: One order_results record per order
+        """
+        records = [{'USER_ID': account.user_id, 'BROKER': account.broker, 'ROLE': role, 'SYMBOL': symbol,
+                    'QTY': quantity, 'STATUS': 'FAILED', 'ORDER_ID': None, 'RESPONSE': None, 'ERROR': None,
+                    'LATENCY': None}
+                   for symbol, quantity in orders]
+        basket = [{
+            # Format symbol for exchange if needed
+            'symbol': symbol if "-EQ" in symbol else f"{symbol}-EQ",
+            'quantity': quantity,
+            'price': 0.0,
+            'order_type': "MARKET",
+            'transaction_type': "BUY"
+        } for symbol, quantity in orders]
+
+        with self.broker_slots(account.broker):
+            started = time.perf_counter()
+            try:
+                responses = account.place_orders_batch(basket)
+            except Exception as e:
+                responses = [None] * len(orders)
+                for record in records:
+                    record['ERROR'] = str(e)
+            latency = time.perf_counter() - started
+
+        for record, response in zip(records, responses):
+            record['RESPONSE'] = response
+            record['LATENCY'] = latency
+            if self._order_succeeded(response):
+                record['STATUS'] = 'PLACED'
+                record['ORDER_ID'] = account.broker_handler.order_id(response)
+        return records
+
+    def _place_copy_orders(self, account, orders):
+        """Submit one copy account's basket; accounts run in parallel."""
+        records = self._submit_basket(account, 'COPY', orders)
+        for record in records:
+            if record['STATUS'] == 'PLACED':
+                print(f"Copy account {account.user_id} order placed - {record['SYMBOL']}: {record['QTY']}")
+            else:
+                print(f"Error placing copy order for account {account.user_id}, symbol {record['SYMBOL']}: "
+                      f"{record['ERROR'] or record['RESPONSE']}")
+        return records
+
+    def place_orders(self, filtered_etfs, prepared=None):
         """
         Place orders for ETFs across all active accounts using the broker abstraction.
 
+        Each account's orders go to its broker as one basket (see
+        BaseBrokerHandler.place_orders_batch). The master's basket goes first;
+        copy baskets are then fanned out over max_workers threads, with each
+        broker's calls capped by broker_slots. Every attempt ends up in order_results (see
+        ORDER_RESULT_COLUMNS).
+
         Args:
             filtered_etfs: Either a dictionary mapping symbols to quantities,
                           or a DataFrame with symbols and quantities
+            prepared: Optional preprocessed snapshot (filter_etfs.preprocess_etfs). When given,
+                      copy accounts with their own allocation profile get quantities from it
+                      instead of the master's quantities times their multiplier
 
         Returns:
             list: Details of orders placed through master account
@@ -151,63 +359,156 @@ class OrderManager:
 
         # Place orders for master account
         master_orders = []
+        records = []
         if self.master_account and self.master_account.is_logged_in:
+            orders = []
             for symbol, quantity in etf_data.items():
-                try:
-                    # Convert quantity to integer to ensure proper comparison
-                    qty = int(quantity) if quantity else 0
-
-                    # Ensure minimum quantity
-                    if qty < 1:
-                        qty = 1
-                        print(f"Adjusting master order quantity to minimum 1 for {symbol}")
-
-                    # Format symbol for exchange if needed
-                    tradingsymbol = symbol if "-EQ" in symbol else f"{symbol}-EQ"
-
-                    # Use the Account class's place_order method which will correctly use the broker handler
-                    response = self.master_account.place_order(
-                        symbol=tradingsymbol,
-                        quantity=qty,
-                        price=0.0,
-                        order_type="MARKET",
-                        transaction_type="BUY"
-                    )
-
-                    master_orders.append({
-                        "symbol": symbol,
-                        "quantity": qty,
-                        "response": response
-                    })
-                    print(f"Master account order placed - {tradingsymbol}: {qty}")
-                except Exception as e:
-                    print(f"Error placing master order for {symbol}: {str(e)}")
-
-        # Place orders for copy accounts
+                # Convert quantity to integer to ensure proper comparison
+                qty = int(quantity) if quantity else 0
+
+                # Ensure minimum quantity
+                if qty < 1:
+                    qty = 1
+                    print(f"Adjusting master order quantity to minimum 1 for {symbol}")
+                orders.append((symbol, qty))
+
+            for record in self._submit_basket(self.master_account, 'MASTER', orders):
+                records.append(record)
+                if record['ERROR'] is not None:
+                    print(f"Error placing master order for {record['SYMBOL']}: {record['ERROR']}")
+                    continue
+                master_orders.append({
+                    "symbol": record['SYMBOL'],
+                    "quantity": record['QTY'],
+                    "response": record['RESPONSE']
+                })
+                print(f"Master account order placed - {record['SYMBOL']}: {record['QTY']}")
+
+        # Quantities for accounts with their own allocation profile
+        profile_quantities = self.profile_quantities(prepared)
+
+        # Copy orders per account
+        copy_orders = []
         for account in self.accounts:
             if account.is_logged_in and account.copy and account.subscription_status == 'Active':
-                for symbol, quantity in etf_data.items():
-                    try:
-                        # Convert quantity to integer
-                        qty = int(quantity) if quantity else 0
+                if account.user_id in profile_quantities:
+                    account_etfs, multiplier = profile_quantities[account.user_id], 1
+                else:
+                    account_etfs, multiplier = etf_data, account.multiplier
 
+                orders = []
+                for symbol, quantity in account_etfs.items():
+                    try:
                         # Apply multiplier for copy account
-                        copy_quantity = int(qty * account.multiplier)
-
-                        if copy_quantity > 0:
-                            # Format symbol for exchange if needed
-                            tradingsymbol = symbol if "-EQ" in symbol else f"{symbol}-EQ"
-
-                            # Use the Account class's place_order method which will correctly use the broker handler
-                            response = account.place_order(
-                                symbol=tradingsymbol,
-                                quantity=copy_quantity,
-                                price=0.0,
-                                order_type="MARKET",
-                                transaction_type="BUY"
-                            )
-                            print(f"Copy account {account.user_id} order placed - {tradingsymbol}: {copy_quantity}")
-                    except Exception as e:
+                        copy_quantity = int((int(quantity) if quantity else 0) * multiplier)
+                    except (TypeError, ValueError) as e:
                         print(f"Error placing copy order for account {account.user_id}, symbol {symbol}: {str(e)}")
+                        continue
+                    if copy_quantity > 0:
+                        orders.append((symbol, copy_quantity))
+                if orders:
+                    copy_orders.append((account, orders))
 
+        # Place orders for copy accounts
+        if copy_orders:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(copy_orders)))) as executor:
+                for account_records in executor.map(lambda item: self._place_copy_orders(*item), copy_orders):
+                    records.extend(account_records)
+            print(f"Copy orders for {len(copy_orders)} accounts dispatched in {time.perf_counter() - started:.2f}s")
+            print("Rate limiter:")
+            print_rate_limit_report()
+
+        self.order_results = pd.DataFrame(records, columns=ORDER_RESULT_COLUMNS)
         return master_orders
+
+    @staticmethod
+    def _match_fills(records, book):
+        """
+        Pair one account's submitted orders with its order book entries.
+
+        Orders are matched by order id first. Orders placed without a usable id
+        in the response (e.g. a timeout) then take an unclaimed entry carrying
+        this run's ORDER_TAG for the same symbol and quantity.
+        """
+        by_id = {str(entry['ORDER_ID']): entry for entry in book if entry.get('ORDER_ID') is not None}
+        claimed = set()
+        matches = [None] * len(records)
+        for position, record in enumerate(records):
+            entry = by_id.get(str(record['ORDER_ID'])) if record['ORDER_ID'] is not None else None
+            if entry is not None:
+                matches[position] = (entry, 'id')
+                claimed.add(id(entry))
+
+        for position, record in enumerate(records):
+            if matches[position] is not None or record['ORDER_ID'] is not None:
+                continue
+            for entry in book:
+                if (id(entry) not in claimed and entry.get('TAG') == ORDER_TAG
+                        and str(entry.get('SYMBOL', '')).replace('-EQ', '') == record['SYMBOL'].replace('-EQ', '')
+                        and str(entry.get('QTY')) == str(record['QTY'])):
+                    matches[position] = (entry, 'tag')
+                    claimed.add(id(entry))
+                    break
+        return matches
+
+    def reconcile_orders(self, order_results=None):
+        """
+        Build a fill table by pulling each account's order book once.
+
+        Every account that appears in the results is fetched concurrently (one
+        list-orders call each, within broker_slots and the rate limiter) instead
+        of one status call per order. The table is kept in fills.
+
+        Args:
+            order_results (DataFrame): Orders to reconcile, defaults to the last place_orders() run
+
+        Returns:
+            DataFrame: One row per order with FILL_COLUMNS; STATUS is the broker's order
+                       status, NOT_PLACED if submission failed, NOT_FOUND if the book lacks it
+                       and UNKNOWN if the book could not be fetched
+        """
+        results = self.order_results if order_results is None else order_results
+        accounts = {account.user_id: account for account in [self.master_account, *self.accounts] if account}
+        user_ids = [user_id for user_id in results['USER_ID'].unique()
+                    if user_id in accounts and accounts[user_id].is_logged_in]
+
+        def fetch(user_id):
+            account = accounts[user_id]
+            with self.broker_slots(account.broker):
+                return user_id, account.get_order_book()
+
+        started = time.perf_counter()
+        books = {}
+        if user_ids:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(user_ids)))) as executor:
+                books = dict(executor.map(fetch, user_ids))
+
+        rows = []
+        for user_id, records in results.groupby('USER_ID', sort=False):
+            records = records.to_dict('records')
+            for record in records:
+                # Missing ids come back from the frame as NaN
+                if pd.isna(record['ORDER_ID']):
+                    record['ORDER_ID'] = None
+            book = books.get(user_id)
+            matches = self._match_fills(records, book) if book is not None else [None] * len(records)
+            for record, match in zip(records, matches):
+                row = {name: record.get(name) for name in ['USER_ID', 'BROKER', 'ROLE', 'SYMBOL', 'QTY', 'ORDER_ID']}
+                row.update({'MATCHED_BY': None, 'STATUS': None, 'FILLED_QTY': 0, 'AVG_PRICE': None, 'MESSAGE': None})
+                if match is not None:
+                    entry, row['MATCHED_BY'] = match
+                    row['ORDER_ID'] = entry.get('ORDER_ID')
+                    row.update({name: entry.get(name) for name in ['STATUS', 'FILLED_QTY', 'AVG_PRICE', 'MESSAGE']})
+                elif record['STATUS'] != 'PLACED' and record['ORDER_ID'] is None:
+                    row['STATUS'] = 'NOT_PLACED'
+                else:
+                    row['STATUS'] = 'UNKNOWN' if book is None else 'NOT_FOUND'
+                rows.append(row)
+
+        self.fills = pd.DataFrame(rows, columns=FILL_COLUMNS)
+        print(f"Reconciled {len(self.fills)} orders across {len(books)} order books "
+              f"in {time.perf_counter() - started:.2f}s")
+        for status, count in self.fills['STATUS'].value_counts().items():
+            print(f"  {status}: {count}")
+        return self.fills
@@ -0,0 +1,188 @@
+# param_sweep.py
+import argparse
+import itertools
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import pandas as pd
+
+from backtest import find_snapshots, run_day, summarize
+from filter_etfs import PARAMETER_NAMES, calculate_quantities, get_params
+from snapshot_cache import load_snapshot
+
+# Parameters that only make sense as whole numbers
+INTEGER_PARAMETERS = {'DAILY_SIP_MIN', 'DAILY_SIP_MAX', 'MAX_CAP', 'MIN_CAP', 'MIN_VOLUME'}
+
+# Snapshots shared by every combination evaluated in a worker process
+_snapshots = []
+
+
+def load_snapshots(directory='.', start=None, end=None):
+    """Load every snapshot in the date range once, returning (date, DataFrame) tuples."""
+    return [(date, load_snapshot(path)) for date, path in find_snapshots(directory, start, end)]
+
+
+def expand_grid(grid):
+    """
+    Expand a parameter grid into every combination.
+
+    Args:
+        grid (dict): Parameter name -> list of candidate values
+
+    Returns:
+        list: One override dict per combination
+    """
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def sample_params(space, samples, seed=None):
+    """
+    Draw random parameter combinations from uniform ranges.
+
+    Args:
+        space (dict): Parameter name -> (low, high)
+        samples (int): Number of combinations to draw
+        seed (int): Optional seed for reproducible sweeps
+
+    Returns:
+        list: One override dict per sample
+    """
+    rng = random.Random(seed)
+    combinations = []
+    for _ in range(samples):
+        combination = {}
+        for name, (low, high) in space.items():
+            if name in INTEGER_PARAMETERS:
+                combination[name] = rng.randint(int(low), int(high))
+            else:
+                combination[name] = round(rng.uniform(low, high), 2)
+        combinations.append(combination)
+    return combinations
+
+
+def _init_worker(snapshots):
+    global _snapshots
+    _snapshots = snapshots
+
+
+def evaluate_params(overrides):
+    """
+    Backtest one parameter combination over the shared snapshots.
+
+    Args:
+        overrides (dict): Parameter overrides for calculate_quantities
+
+    Returns:
+        dict: The full parameter set plus summary metrics of the backtest
+    """
+    strategy = partial(calculate_quantities, params=overrides)
+    report = summarize([run_day(date, etf_data, strategy) for date, etf_data in _snapshots])
+
+    result = get_params(overrides)
+    if report.empty:
+        result.update({'DAYS_TRADED': 0, 'AVG_ETFS': 0.0, 'COST_BASIS': 0.0,
+                       'MARKET_VALUE': 0.0, 'PNL': 0.0, 'PNL_PCT': 0.0})
+        return result
+
+    final = report.iloc[-1]
+    result.update({
+        'DAYS_TRADED': int((report['ETFS'] > 0).sum()),
+        'AVG_ETFS': float(report['ETFS'].mean()),
+        'COST_BASIS': float(final['COST_BASIS']),
+        'MARKET_VALUE': float(final['MARKET_VALUE']),
+        'PNL': float(final['PNL']),
+        'PNL_PCT': float(final['PNL_PCT'])
+    })
+    return result
+
+
+def run_sweep(combinations, directory='.', start=None, end=None, workers=None, sort_by='PNL_PCT'):
+    """
+    Evaluate parameter combinations in parallel over historical snapshots.
+
+    Snapshots are parsed once in the parent and handed to each worker process
+    when it starts, so no combination re-reads the CSV files.
+
+    Args:
+        combinations (list): Override dicts, e.g. from expand_grid() or sample_params()
+        directory (str): Directory holding ETF_Data_*.csv snapshots
+        start (str): First date (YYYY-MM-DD), inclusive
+        end (str): Last date (YYYY-MM-DD), inclusive
+        workers (int): Process pool size, defaults to the CPU count
+        sort_by (str): Result column used for ranking (descending)
+
+    Returns:
+        DataFrame: One row per combination, ranked best first
+    """
+    snapshots = load_snapshots(directory, start, end)
+    print(f"Loaded {len(snapshots)} snapshots for {len(combinations)} combinations")
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(combinations) == 1:
+        _init_worker(snapshots)
+        results = [evaluate_params(combination) for combination in combinations]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(snapshots,)) as executor:
+            results = list(executor.map(evaluate_params, combinations))
+
+    ranked = pd.DataFrame(results).sort_values(sort_by, ascending=False).reset_index(drop=True)
+    ranked.insert(0, 'RANK', range(1, len(ranked) + 1))
+    return ranked
+
+
+def _parse_assignment(text):
+    name, _, value = text.partition('=')
+    name = name.strip().upper()
+    if name not in PARAMETER_NAMES:
+        raise argparse.ArgumentTypeError(f"Unknown parameter: {name}")
+    return name, value
+
+
+def _number(name, value):
+    return int(value) if name in INTEGER_PARAMETERS else float(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep allocation parameters over stored NSE snapshots.")
+    parser.add_argument('--grid', action='append', default=[], type=_parse_assignment,
+                        help="Grid values, e.g. MAX_CAP=1500,2000,2500 (repeatable)")
+    parser.add_argument('--range', action='append', default=[], type=_parse_assignment,
+                        help="Sampling range for --samples, e.g. MIN_CAP=200:600 (repeatable)")
+    parser.add_argument('--samples', type=int, default=0, help="Number of random combinations to draw")
+    parser.add_argument('--seed', type=int, default=None, help="Random seed for --samples")
+    parser.add_argument('--dir', default='.', help="Directory holding ETF_Data_*.csv files")
+    parser.add_argument('--start', help="First date (YYYY-MM-DD)")
+    parser.add_argument('--end', help="Last date (YYYY-MM-DD)")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes")
+    parser.add_argument('--sort-by', default='PNL_PCT', help="Column used to rank combinations")
+    parser.add_argument('--top', type=int, default=20, help="Number of ranked rows to print")
+    parser.add_argument('--output', help="Optional CSV path for the full results table")
+    args = parser.parse_args()
+
+    combinations = []
+    if args.grid:
+        grid = {name: [_number(name, item) for item in values.split(',')] for name, values in args.grid}
+        combinations.extend(expand_grid(grid))
+    if args.samples:
+        space = {}
+        for name, bounds in args.range:
+            low, _, high = bounds.partition(':')
+            space[name] = (_number(name, low), _number(name, high))
+        combinations.extend(sample_params(space, args.samples, args.seed))
+    if not combinations:
+        parser.error("Provide --grid values and/or --samples with --range bounds")
+
+    ranked = run_sweep(combinations, args.dir, args.start, args.end, args.workers, args.sort_by)
+    print(ranked.head(args.top).to_string(index=False))
+
+    if args.output:
+        ranked.to_csv(args.output, index=False)
+        print(f"Results saved as {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# reference_data.py
+import hashlib
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from index_matcher import get_matcher
+
+logger = logging.getLogger(__name__)
+
+AVERAGE_FALL_FILE = 'average_percentage_fall_indices.csv'
+
+
+class AverageFallTable:
+    """Parsed average-fall reference data, ready for matching and lookups."""
+
+    def __init__(self, index_names, average_falls):
+        self.index_names = [str(name) for name in index_names]
+        self.average_falls = np.asarray(average_falls, dtype=float)
+        self.avg_fall_dict = dict(zip(self.index_names, self.average_falls))
+        self.matcher = get_matcher(self.index_names)
+        # Identifies the table contents, e.g. to invalidate results derived from it
+        self.signature = hashlib.sha1(
+            repr((self.index_names, self.average_falls.tolist())).encode()
+        ).hexdigest()
+
+    def __len__(self):
+        return len(self.index_names)
+
+    def to_frame(self):
+        """Return the table as a DataFrame with INDEX_NAME and AVERAGE_FALL_(%) columns."""
+        return pd.DataFrame({'INDEX_NAME': self.index_names, 'AVERAGE_FALL_(%)': self.average_falls})
+
+
+def parse_average_fall_csv(path):
+    """
+    Parse the average-fall CSV, normalizing headers and locating its columns.
+
+    Args:
+    - path (str): Path to the reference CSV.
+
+    Returns:
+    - AverageFallTable: The parsed table.
+    """
+    avg_fall_df = pd.read_csv(path)
+    avg_fall_df.columns = avg_fall_df.columns.str.strip().str.replace(" ", "_").str.upper()
+
+    if 'INDEX_NAME' in avg_fall_df.columns:
+        index_name_col = 'INDEX_NAME'
+    else:
+        # Try to find the appropriate column
+        index_name_col = [col for col in avg_fall_df.columns if 'INDEX' in col or 'NAME' in col][0]
+        logger.info("Using '%s' as index name column", index_name_col)
+
+    if 'AVERAGE_FALL_(%)' in avg_fall_df.columns:
+        avg_fall_col = 'AVERAGE_FALL_(%)'
+    else:
+        # Try to find the appropriate column
+        avg_fall_col = [col for col in avg_fall_df.columns if 'FALL' in col or 'AVERAGE' in col][0]
+        logger.info("Using '%s' as average fall column", avg_fall_col)
+
+    average_falls = pd.to_numeric(avg_fall_df[avg_fall_col], errors='coerce')
+    return AverageFallTable(avg_fall_df[index_name_col], average_falls)
+
+
+# Absolute path -> (mtime_ns, size, sha1, AverageFallTable)
+_cache = {}
+
+
+def _file_digest(path):
+    with open(path, 'rb') as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+def load_average_fall_table(path=AVERAGE_FALL_FILE):
+    """
+    Load the average-fall reference table, parsing the file only when it changed.
+
+    The file is re-read only if its mtime or size differs from the cached copy,
+    and re-parsed only if its content hash differs as well.
+
+    Args:
+    - path (str): Path to the reference CSV.
+
+    Returns:
+    - AverageFallTable: The cached or freshly parsed table.
+    """
+    abs_path = os.path.abspath(path)
+    stat = os.stat(abs_path)
+    cached = _cache.get(abs_path)
+
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[3]
+
+    digest = _file_digest(abs_path)
+    if cached and cached[2] == digest:
+        # Touched but unchanged: keep the parsed table
+        table = cached[3]
+    else:
+        table = parse_average_fall_csv(abs_path)
+
+    _cache[abs_path] = (stat.st_mtime_ns, stat.st_size, digest, table)
+    return table
@@ -0,0 +1,146 @@
+# session_cache.py
+import hashlib
+import hmac
+import json
+import os
+import threading
+from datetime import datetime, timedelta, time as dt_time
+from zoneinfo import ZoneInfo
+
+from atomic_io import atomic_write
+
+SESSION_CACHE_FILE = os.getenv('BROKER_SESSION_CACHE', 'broker_sessions.json')  # Empty disables the cache
+SESSION_CACHE_KEY = os.getenv('BROKER_SESSION_KEY')  # Fernet key; encrypts the file when set
+SESSION_TIMEZONE = ZoneInfo('Asia/Kolkata')
+# Saved sessions are dropped at this time every day, before the brokers' overnight token
+# expiry; restored sessions are also checked with the broker
+SESSION_RESET = dt_time(3, 0)
+
+# Credential fields that are not secret, used for the digest when no key is configured
+PUBLIC_AUTH_FIELDS = ('user_id', 'api_key', 'vendor_code', 'imei')
+
+
+def session_expiry(now=None):
+    """Epoch seconds of the next daily session reset, Indian time."""
+    now = now or datetime.now(SESSION_TIMEZONE)
+    reset = now.replace(hour=SESSION_RESET.hour, minute=SESSION_RESET.minute, second=0, microsecond=0)
+    if now >= reset:
+        reset += timedelta(days=1)
+    return reset.timestamp()
+
+
+def credentials_digest(auth_params, key=None):
+    """
+    Identifies the credentials a session was opened with, so edited credentials are not served a stale session.
+
+    With a key, every field goes into an HMAC-SHA256 keyed with it. Without
+    one, only PUBLIC_AUTH_FIELDS are hashed, so no secret is derivable from
+    the file.
+    """
+    if key:
+        payload = json.dumps(auth_params, sort_keys=True, default=str).encode()
+        return hmac.new(key.encode() if isinstance(key, str) else key, payload, hashlib.sha256).hexdigest()
+    public = {field: auth_params.get(field) for field in PUBLIC_AUTH_FIELDS}
+    return hashlib.sha256(json.dumps(public, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class SessionCache:
+    """
+    Persistent (broker, user_id) -> session token store with expiry.
+
+    Only handlers whose login can be skipped export a session (Finvasia's
+    susertoken); Zerodha and Upstox already log in from a pasted token and
+    Dhan's check call costs as much as its login. Changes are kept in memory
+    until flush(), so a batch of logins rewrites the file once. The file is
+    written atomically with owner-only permissions and, when a key is given
+    and the cryptography package is installed, Fernet-encrypted. If a key is
+    given but cryptography is missing, nothing is persisted.
+    """
+
+    def __init__(self, path=SESSION_CACHE_FILE, key=SESSION_CACHE_KEY):
+        self.path = path
+        self.key = key
+        self.fernet = None
+        self.enabled = bool(path)
+        if key:
+            try:
+                from cryptography.fernet import Fernet
+                self.fernet = Fernet(key)
+            except ImportError:
+                print("BROKER_SESSION_KEY is set but cryptography is not installed; sessions will not be cached.")
+                self.enabled = False
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.entries = self._load() if self.enabled else {}
+
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as file:
+                data = file.read()
+            if self.fernet:
+                data = self.fernet.decrypt(data)
+            return json.loads(data).get('sessions', {})
+        except Exception:
+            # Missing, corrupt or encrypted with another key: start over
+            return {}
+
+    def _save(self):
+        data = json.dumps({'sessions': self.entries}).encode()
+        if self.fernet:
+            data = self.fernet.encrypt(data)
+        with atomic_write(self.path, 'wb', permissions=0o600) as file:
+            file.write(data)
+
+    @staticmethod
+    def _key(broker, user_id):
+        return f"{str(broker).upper()}:{user_id}"
+
+    def get(self, broker, user_id, auth_params):
+        """Saved session state, or None if there is none, it expired or the credentials changed."""
+        with self._lock:
+            entry = self.entries.get(self._key(broker, user_id))
+        if (not entry or entry.get('expires_at', 0) <= datetime.now().timestamp()
+                or entry.get('credentials') != credentials_digest(auth_params, self.key)):
+            return None
+        return entry['state']
+
+    def put(self, broker, user_id, auth_params, state, expires_at=None):
+        """Remember a session state until expires_at (default: the next daily reset); see flush()."""
+        if not self.enabled or not state:
+            return
+        with self._lock:
+            self.entries[self._key(broker, user_id)] = {
+                'expires_at': expires_at or session_expiry(),
+                'credentials': credentials_digest(auth_params, self.key),
+                'state': state
+            }
+            self._dirty = True
+
+    def discard(self, broker, user_id):
+        """Forget a session, e.g. after the broker rejected it; see flush()."""
+        with self._lock:
+            if self.entries.pop(self._key(broker, user_id), None) is not None and self.enabled:
+                self._dirty = True
+
+    def flush(self):
+        """Write pending changes to the file, dropping expired sessions of every account."""
+        with self._lock:
+            if not self._dirty:
+                return
+            now = datetime.now().timestamp()
+            self.entries = {key: entry for key, entry in self.entries.items() if entry.get('expires_at', 0) > now}
+            self._save()
+            self._dirty = False
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_session_cache():
+    """The process-wide SessionCache, loaded on first use."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = SessionCache()
+        return _shared
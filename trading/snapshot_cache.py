@@ -0,0 +1,189 @@
+# snapshot_cache.py
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from filter_etfs import clean_etf_data
+
+CACHE_SUFFIX = '.cache'
+META_FILE = 'meta.json'
+CACHE_VERSION = 1
+
+# Text columns stored as categories
+CATEGORY_COLUMNS = ['SYMBOL', 'UNDERLYING_ASSET']
+
+# Whole-number columns; every other numeric column is stored as float64 so two-decimal
+# prices round-trip exactly (QTY floors at integer boundaries, float32 would shift it)
+INTEGER_COLUMNS = ['VOLUME']
+
+# Placeholders NSE uses for missing numbers
+MISSING_MARKERS = {'', '-', 'NA', 'N/A', 'nan', 'NaN'}
+
+
+def cache_path(csv_path):
+    """Directory holding the columnar copy of a snapshot CSV."""
+    return os.path.splitext(csv_path)[0] + CACHE_SUFFIX
+
+
+def _as_number(column):
+    """Convert a text column to numbers, or return None if it is not numeric."""
+    if pd.api.types.is_numeric_dtype(column):
+        return column
+    text = column.astype(str).str.strip().str.replace(',', '')
+    values = pd.to_numeric(text.where(~text.isin(MISSING_MARKERS)), errors='coerce')
+    # Numeric only if every non-missing entry converted
+    if (values.isna() & ~text.isin(MISSING_MARKERS) & column.notna()).any():
+        return None
+    return values
+
+
+def _as_text(column):
+    """Stripped text as a category; missing cells stay missing instead of becoming 'nan'."""
+    return column.where(column.isna(), column.astype(str).str.strip()).astype('category')
+
+
+def type_snapshot(etf_data):
+    """
+    Clean a raw NSE snapshot and give every column an explicit dtype.
+
+    Args:
+        etf_data (DataFrame): Snapshot as read from the NSE CSV
+
+    Returns:
+        DataFrame: Normalized headers, category text columns (NaN where missing), int64 VOLUME,
+        float64 numbers
+    """
+    typed = clean_etf_data(etf_data)
+    for name in typed.columns:
+        column = typed[name]
+        if name in CATEGORY_COLUMNS:
+            typed[name] = _as_text(column)
+        elif name in INTEGER_COLUMNS:
+            typed[name] = column.round().astype(np.int64)
+        else:
+            values = _as_number(column)
+            if values is None:
+                typed[name] = _as_text(column)
+            else:
+                typed[name] = values.astype(np.float64)
+    return typed
+
+
+def write_snapshot_cache(typed, cache_dir, source_stat=None):
+    """
+    Write a typed snapshot as one .npy file per column plus a JSON metadata file.
+
+    Args:
+        typed (DataFrame): Output of type_snapshot()
+        cache_dir (str): Target directory
+        source_stat (os.stat_result): Stat of the source CSV, used for invalidation
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    columns = []
+    for position, name in enumerate(typed.columns):
+        column = typed[name]
+        file_name = f"col_{position}.npy"
+        entry = {'name': name, 'file': file_name}
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            entry['kind'] = 'category'
+            entry['categories'] = [str(category) for category in column.cat.categories]
+            values = column.cat.codes.to_numpy().astype(np.int32)
+        else:
+            entry['kind'] = 'numeric'
+            values = column.to_numpy()
+        entry['dtype'] = str(values.dtype)
+        np.save(os.path.join(cache_dir, file_name), values, allow_pickle=False)
+        columns.append(entry)
+
+    meta = {
+        'version': CACHE_VERSION,
+        'rows': len(typed),
+        'columns': columns,
+        'source_mtime_ns': source_stat.st_mtime_ns if source_stat else None,
+        'source_size': source_stat.st_size if source_stat else None
+    }
+    # Metadata last, so a half-written cache is never considered valid
+    with open(os.path.join(cache_dir, META_FILE), 'w') as file:
+        json.dump(meta, file)
+
+
+def publish_snapshot_cache(typed, cache_dir, source_stat=None):
+    """
+    Write a snapshot cache under a temporary name and rename it into place.
+
+    Readers never see a partly written directory: cache_dir either does not
+    exist yet or is complete. An existing cache is swapped out and removed.
+    """
+    temp_dir = f"{cache_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    try:
+        write_snapshot_cache(typed, temp_dir, source_stat)
+        if os.path.isdir(cache_dir):
+            retired = f"{cache_dir}.{os.getpid()}.old"
+            os.replace(cache_dir, retired)
+            os.replace(temp_dir, cache_dir)
+            shutil.rmtree(retired)
+        else:
+            os.replace(temp_dir, cache_dir)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def read_snapshot_cache(cache_dir, mmap=True):
+    """
+    Load a columnar snapshot, memory-mapping the numeric columns.
+
+    Args:
+        cache_dir (str): Directory written by write_snapshot_cache()
+        mmap (bool): Memory-map the .npy files instead of reading them
+
+    Returns:
+        DataFrame: The typed snapshot
+    """
+    with open(os.path.join(cache_dir, META_FILE)) as file:
+        meta = json.load(file)
+
+    mmap_mode = 'r' if mmap else None
+    data = {}
+    for entry in meta['columns']:
+        values = np.load(os.path.join(cache_dir, entry['file']), mmap_mode=mmap_mode, allow_pickle=False)
+        if entry['kind'] == 'category':
+            data[entry['name']] = pd.Categorical.from_codes(np.asarray(values), entry['categories'])
+        else:
+            data[entry['name']] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def _is_fresh(cache_dir, source_stat):
+    try:
+        with open(os.path.join(cache_dir, META_FILE)) as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return False
+    return (meta.get('version') == CACHE_VERSION
+            and meta.get('source_mtime_ns') == source_stat.st_mtime_ns
+            and meta.get('source_size') == source_stat.st_size)
+
+
+def load_snapshot(csv_path, refresh=False):
+    """
+    Load an NSE snapshot, converting it to the columnar cache on first use.
+
+    Args:
+        csv_path (str): Path of the downloaded ETF_Data_*.csv
+        refresh (bool): Rebuild the cache even if it looks current
+
+    Returns:
+        DataFrame: The typed snapshot (see type_snapshot)
+    """
+    source_stat = os.stat(csv_path)
+    cache_dir = cache_path(csv_path)
+    if not refresh and _is_fresh(cache_dir, source_stat):
+        return read_snapshot_cache(cache_dir)
+
+    typed = type_snapshot(pd.read_csv(csv_path))
+    publish_snapshot_cache(typed, cache_dir, source_stat)
+    return typed
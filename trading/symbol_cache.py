@@ -0,0 +1,147 @@
+# symbol_cache.py
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from atomic_io import atomic_write
+
+logger = logging.getLogger(__name__)
+
+CLASSIFICATION_CACHE_FILE = 'symbol_classification.json'
+# Part of the signature, so files in an older entry layout are discarded
+CACHE_FORMAT = 2
+
+
+def asset_hash(underlying_asset):
+    """Short stable hash of an UNDERLYING_ASSET string ('' for missing assets)."""
+    if not isinstance(underlying_asset, str):
+        return ''
+    return hashlib.sha1(underlying_asset.encode()).hexdigest()[:16]
+
+
+class SymbolClassificationCache:
+    """
+    Persistent (SYMBOL, asset hash) -> (is_debt, matched_index, avg_fall) store.
+
+    Entries are keyed by the UNDERLYING_ASSET as well as the symbol, so a
+    symbol listed twice with different assets keeps one answer per asset. The whole
+    store is discarded when the debt pattern or the average-fall reference table
+    changes, since every answer depends on them.
+    """
+
+    def __init__(self, path=CLASSIFICATION_CACHE_FILE):
+        self.path = path
+        self.signature = None
+        self.entries = {}
+        self.dirty = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as file:
+                data = json.load(file)
+            self.signature = data.get('signature')
+            self.entries = data.get('symbols', {})
+        except (OSError, ValueError):
+            self.signature = None
+            self.entries = {}
+
+    def save(self):
+        """Write the store if it changed, atomically replacing the previous file."""
+        if not self.dirty:
+            return
+        with atomic_write(self.path) as file:
+            json.dump({'signature': self.signature, 'symbols': self.entries}, file)
+        self.dirty = False
+
+    def classify(self, etf_data, avg_fall_table, debt_pattern):
+        """
+        Classify ETFs, computing answers only for new or changed symbols.
+
+        Args:
+            etf_data (DataFrame): Cleaned snapshot with SYMBOL and UNDERLYING_ASSET
+            avg_fall_table (AverageFallTable): Reference data used for matching
+            debt_pattern (str): Regex of debt keywords (matched case-insensitively)
+
+        Returns:
+            DataFrame: IS_DEBT, MATCHED_INDEX and AVG_FALL (NaN when unmatched),
+            aligned with etf_data's index
+        """
+        signature = hashlib.sha1(f"{CACHE_FORMAT}|{debt_pattern}|{avg_fall_table.signature}".encode()).hexdigest()
+        if signature != self.signature:
+            self.signature = signature
+            self.entries = {}
+            self.dirty = True
+
+        symbols = etf_data['SYMBOL'].astype(str).str.strip().to_numpy()
+        assets = etf_data['UNDERLYING_ASSET']
+
+        # Hash each distinct asset string once
+        codes, unique_assets = pd.factorize(assets)
+        unique_hashes = [asset_hash(asset) for asset in unique_assets]
+        hashes = [unique_hashes[code] if code >= 0 else '' for code in codes]
+        keys = [f"{symbol}|{digest}" for symbol, digest in zip(symbols, hashes)]
+
+        entries = self.entries
+        stale = [i for i, key in enumerate(keys) if key not in entries]
+
+        if stale:
+            stale_assets = assets.iloc[stale]
+            is_debt = stale_assets.str.contains(debt_pattern, case=False, na=False)
+            matched = avg_fall_table.matcher.match_series(stale_assets)
+            for i, debt, index_name in zip(stale, is_debt.to_numpy(), matched.to_numpy()):
+                avg_fall = avg_fall_table.avg_fall_dict.get(index_name) if index_name is not None else None
+                entries[keys[i]] = [
+                    bool(debt), index_name,
+                    None if avg_fall is None or np.isnan(avg_fall) else float(avg_fall)
+                ]
+            self.dirty = True
+
+        rows = [entries[key] for key in keys]
+        return pd.DataFrame({
+            'IS_DEBT': np.array([row[0] for row in rows], dtype=bool),
+            'MATCHED_INDEX': pd.Series([row[1] for row in rows], dtype=object).to_numpy(),
+            'AVG_FALL': np.array([np.nan if row[2] is None else row[2] for row in rows], dtype=float)
+        }, index=etf_data.index)
+
+
+# Path -> shared cache instance for this process
+_caches = {}
+
+
+def get_classification_cache(path=CLASSIFICATION_CACHE_FILE):
+    """Return the process-wide cache for a file, loading it on first use."""
+    abs_path = os.path.abspath(path)
+    cache = _caches.get(abs_path)
+    if cache is None:
+        cache = _caches[abs_path] = SymbolClassificationCache(abs_path)
+    return cache
+
+
+def classify_symbols(etf_data, avg_fall_table, debt_keywords, cache=None):
+    """
+    Classify ETFs through the persistent cache and save any new answers.
+
+    The cache is only an optimisation: if it cannot be saved (e.g. the working
+    directory is read-only), the error is logged and the answers are still returned.
+
+    Args:
+        etf_data (DataFrame): Cleaned snapshot with SYMBOL and UNDERLYING_ASSET
+        avg_fall_table (AverageFallTable): Reference data used for matching
+        debt_keywords (list): Keywords that mark debt-like underlying assets
+        cache (SymbolClassificationCache): Store to use, defaults to the shared one
+
+    Returns:
+        DataFrame: See SymbolClassificationCache.classify
+    """
+    cache = cache or get_classification_cache()
+    classification = cache.classify(etf_data, avg_fall_table, "|".join(debt_keywords))
+    try:
+        cache.save()
+    except OSError as e:
+        logger.warning("Could not save the symbol classification cache %s: %s", cache.path, e)
+    return classification
@@ -0,0 +1,137 @@
+# test_allocate_by_severity.py
+"""allocate_by_severity() against the row-wise allocation it replaced."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from filter_etfs import (
+    allocate_by_severity, conservative_allocation_curve, dynamic_allocation_curve, get_params
+)
+
+
+def dynamic_row(severity, p):
+    """Row-wise allocate_based_on_severity from the original calculate_quantities."""
+    max_severity_reference = 2.0
+    if severity >= max_severity_reference:
+        return p['MAX_CAP']
+    return p['MIN_CAP'] + (severity / max_severity_reference) * (p['MAX_CAP'] - p['MIN_CAP'])
+
+
+def conservative_row(severity, p):
+    """Row-wise allocate_sip_conservative from the original calculate_quantities_."""
+    low_severity = 0.5
+    high_severity = 1.0
+    mid_point = p['MIN_CAP'] + (p['MAX_CAP'] - p['MIN_CAP']) / 2
+    if severity >= high_severity:
+        return p['MAX_CAP']
+    if severity <= low_severity:
+        return p['MIN_CAP'] + (severity / low_severity) * (mid_point - p['MIN_CAP'])
+    return mid_point + (severity - low_severity) / (high_severity - low_severity) * (p['MAX_CAP'] - mid_point)
+
+
+def reference_allocation(etfs, p, row_curve):
+    """The original apply()-based allocation stage, kept as the reference."""
+    etfs = etfs.copy()
+    etfs['SEVERITY'] = etfs.apply(lambda row: (row['AVG_FALL'] - row['%CHNG']) / abs(row['AVG_FALL']), axis=1)
+    etfs['INITIAL_ALLOCATION'] = etfs.apply(lambda row: row_curve(row['SEVERITY'], p), axis=1)
+
+    total_allocated = etfs['INITIAL_ALLOCATION'].sum()
+    if total_allocated < p['DAILY_SIP_MIN']:
+        scale_factor = min(p['DAILY_SIP_MIN'] / total_allocated, p['MAX_CAP'] / etfs['INITIAL_ALLOCATION'].max())
+        etfs['ALLOCATED_AMOUNT'] = etfs.apply(
+            lambda row: min(p['MAX_CAP'], row['INITIAL_ALLOCATION'] * scale_factor), axis=1
+        )
+    elif total_allocated > p['DAILY_SIP_MAX']:
+        etfs['ALLOCATED_AMOUNT'] = etfs['INITIAL_ALLOCATION'] * (p['DAILY_SIP_MAX'] / total_allocated)
+    else:
+        etfs['ALLOCATED_AMOUNT'] = etfs['INITIAL_ALLOCATION']
+
+    below_min = etfs[etfs['ALLOCATED_AMOUNT'] < p['MIN_CAP']]
+    if not below_min.empty:
+        shortfall = (p['MIN_CAP'] - below_min['ALLOCATED_AMOUNT']).sum()
+        available_budget = p['DAILY_SIP_MAX'] - etfs['ALLOCATED_AMOUNT'].sum()
+        if shortfall <= available_budget:
+            etfs.loc[etfs['ALLOCATED_AMOUNT'] < p['MIN_CAP'], 'ALLOCATED_AMOUNT'] = p['MIN_CAP']
+        else:
+            etfs = etfs[etfs['ALLOCATED_AMOUNT'] >= p['MIN_CAP']]
+
+    etfs['QTY'] = etfs.apply(lambda row: int(row['ALLOCATED_AMOUNT'] / row['LTP']) if row['LTP'] > 0 else 0, axis=1)
+    etfs['FINAL_AMOUNT'] = etfs['QTY'] * etfs['LTP']
+    return etfs
+
+
+def random_etfs(rng, rows):
+    avg_fall = -rng.uniform(0.3, 3.0, rows)
+    return pd.DataFrame({
+        'AVG_FALL': avg_fall,
+        # Always below the average, as after preprocess_etfs()
+        '%CHNG': avg_fall - rng.uniform(0.0, 6.0, rows),
+        'LTP': np.round(rng.uniform(5, 2500, rows), 2)
+    })
+
+
+def compare(etfs, params, curve, row_curve):
+    p = get_params(params)
+    expected = reference_allocation(etfs, p, row_curve)
+    result = allocate_by_severity(etfs['%CHNG'], etfs['AVG_FALL'], etfs['LTP'], params, curve)
+    keep = result['KEEP']
+
+    assert list(etfs.index[keep]) == list(expected.index)
+    np.testing.assert_allclose(result['ALLOCATED_AMOUNT'][keep], expected['ALLOCATED_AMOUNT'], rtol=1e-12)
+    np.testing.assert_array_equal(result['QTY'][keep], expected['QTY'].to_numpy())
+    assert result['FINAL_AMOUNT'][keep].sum() == pytest.approx(expected['FINAL_AMOUNT'].sum(), rel=1e-12)
+    return result
+
+
+@pytest.mark.parametrize('curve, row_curve', [
+    (dynamic_allocation_curve, dynamic_row),
+    (conservative_allocation_curve, conservative_row)
+])
+def test_matches_row_wise_allocation_on_random_frames(curve, row_curve):
+    rng = np.random.default_rng(20240601)
+    scalings = set()
+    removed = False
+    for trial in range(300):
+        rows = int(rng.integers(1, 25))
+        params = {
+            'DAILY_SIP_MIN': float(rng.choice([400, 2000, 6000])),
+            'DAILY_SIP_MAX': float(rng.choice([3000, 7500, 20000])),
+            'MAX_CAP': float(rng.choice([1500, 2000, 4000])),
+            'MIN_CAP': float(rng.choice([200, 400, 900]))
+        }
+        result = compare(random_etfs(rng, rows), params, curve, row_curve)
+        scalings.add(result['SCALING'])
+        removed |= not result['KEEP'].all()
+
+    # The random parameters reach every scaling branch and the MIN_CAP removal
+    assert scalings == {None, 'up', 'down'}
+    assert removed
+
+
+@pytest.mark.parametrize('sip_max, kept', [(20000, 3), (1500, 1)])
+def test_min_cap_top_up_and_removal(sip_max, kept):
+    # The shipped curves never start below MIN_CAP; a steeper one reaches the top-up
+    def curve(severity, p):
+        return np.asarray(severity, dtype=float) * 500
+
+    etfs = pd.DataFrame({'AVG_FALL': [-1.0, -1.0, -2.0], '%CHNG': [-1.5, -3.0, -3.0], 'LTP': [10.0, 20.0, 30.0]})
+    params = {'DAILY_SIP_MIN': 0, 'DAILY_SIP_MAX': sip_max, 'MIN_CAP': 400}
+    result = compare(etfs, params, curve, lambda severity, p: severity * 500)
+    assert result['BELOW_MIN'] == 2
+    assert result['KEEP'].sum() == kept
+
+
+def test_max_cap_bounds_scale_up():
+    # One modest dip far below DAILY_SIP_MIN: scaling stops at MAX_CAP
+    etfs = pd.DataFrame({'AVG_FALL': [-1.0], '%CHNG': [-1.2], 'LTP': [100.0]})
+    result = compare(etfs, {'DAILY_SIP_MIN': 5000, 'MAX_CAP': 2000}, dynamic_allocation_curve, dynamic_row)
+    assert result['SCALING'] == 'up'
+    assert result['ALLOCATED_AMOUNT'][0] == 2000
+
+
+def test_empty_frame():
+    etfs = pd.DataFrame({'AVG_FALL': [], '%CHNG': [], 'LTP': []}, dtype=float)
+    result = allocate_by_severity(etfs['%CHNG'], etfs['AVG_FALL'], etfs['LTP'])
+    assert len(result['QTY']) == 0
+    assert result['TOTAL_ALLOCATED'] == 0
+    assert result['FINAL_AMOUNT'].sum() == 0
@@ -0,0 +1,53 @@
+# test_index_matcher.py
+"""IndexMatcher longest-match semantics."""
+import numpy as np
+import pandas as pd
+
+from index_matcher import IndexMatcher
+
+
+def brute_force_match(index_names, asset):
+    """Every contained name, longest first, then earliest in the reference order."""
+    contained = [(-len(name), position) for position, name in enumerate(index_names)
+                 if name and name.lower() in asset.lower()]
+    return index_names[min(contained)[1]] if contained else None
+
+
+def test_longest_name_wins_over_earlier_shorter_one():
+    matcher = IndexMatcher(['Nifty 50', 'Nifty 50 Value 20', 'Nifty Midcap 150', 'Nifty Midcap 150 Momentum 50'])
+    assert matcher.match('Nifty 50 Value 20 Index (TRI)') == 'Nifty 50 Value 20'
+    assert matcher.match('NIFTY MIDCAP 150 MOMENTUM 50 INDEX') == 'Nifty Midcap 150 Momentum 50'
+    assert matcher.match('Nifty 50 Total Return Index') == 'Nifty 50'
+
+
+def test_longer_match_ending_first_beats_shorter_later_one():
+    # 'Nifty Bank' ends before 'IT' starts; length decides, not position
+    matcher = IndexMatcher(['IT', 'Nifty Bank'])
+    assert matcher.match('Nifty Bank and IT') == 'Nifty Bank'
+
+
+def test_equal_length_names_follow_reference_order():
+    assert IndexMatcher(['Gold', 'Nasd']).match('Nasdaq Gold') == 'Gold'
+    assert IndexMatcher(['Nasd', 'Gold']).match('Nasdaq Gold') == 'Nasd'
+
+
+def test_missing_and_unmatched_assets():
+    matcher = IndexMatcher(['Nifty 50'])
+    assert matcher.match('Gold') is None
+    assert matcher.match(None) is None
+    assert matcher.match(float('nan')) is None
+
+    matched = matcher.match_series(pd.Series(['Nifty 50 Index', np.nan, 'Gold', 'Nifty 50 Index'], index=[4, 5, 6, 7]))
+    assert list(matched.index) == [4, 5, 6, 7]
+    assert matched.tolist() == ['Nifty 50', None, None, 'Nifty 50']
+
+
+def test_matches_brute_force_on_random_names():
+    # A two-letter alphabet makes names overlap and nest as often as possible
+    rng = np.random.default_rng(7)
+    for trial in range(200):
+        index_names = [''.join(rng.choice(['a', 'b'], int(rng.integers(1, 6)))) for _ in range(int(rng.integers(1, 8)))]
+        matcher = IndexMatcher(index_names)
+        for _ in range(20):
+            asset = ''.join(rng.choice(['a', 'b', 'A', 'B'], int(rng.integers(0, 12))))
+            assert matcher.match(asset) == brute_force_match(index_names, asset), (index_names, asset)
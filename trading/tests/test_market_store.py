@@ -0,0 +1,75 @@
+# test_market_store.py
+"""MarketStore compaction crash recovery and incomplete snapshots."""
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from market_store import DAILY_FILE, MarketStore
+
+DATE = '2026-01-05'
+
+
+def snapshot(ltp):
+    return pd.DataFrame({'SYMBOL': ['AAA', 'BBB'], 'UNDERLYING_ASSET': ['Nifty 50', 'Gold'],
+                         'LTP': [ltp, ltp * 2], '%CHNG': [-1.0, 0.5], 'VOLUME': [100, 200]})
+
+
+def leftovers(store):
+    return sorted(name for name in os.listdir(store.partition(DATE)) if name.endswith(('.tmp', '.old')))
+
+
+def test_compaction_interrupted_between_renames_loses_nothing(tmp_path, monkeypatch):
+    store = MarketStore(str(tmp_path))
+    store.ingest(snapshot(10.0), datetime(2026, 1, 5, 9, 30))
+    assert store.compact(DATE) == 1
+    store.ingest(snapshot(11.0), datetime(2026, 1, 5, 10, 0))
+
+    # Crash after the old daily file was retired, before the new one took its place
+    real_replace = os.replace
+
+    def crash_on_publish(source, target):
+        if os.path.basename(str(source)).endswith('.tmp') and os.path.basename(str(target)) == DAILY_FILE:
+            raise OSError("simulated crash")
+        real_replace(source, target)
+
+    monkeypatch.setattr(os, 'replace', crash_on_publish)
+    with pytest.raises(OSError):
+        store.compact(DATE)
+    monkeypatch.setattr(os, 'replace', real_replace)
+
+    assert not os.path.isdir(os.path.join(store.partition(DATE), DAILY_FILE))
+    data = store.load_date(DATE)
+    assert sorted(data['SNAPSHOT_TIME'].unique()) == ['093000000', '100000000']
+    assert len(data) == 4
+
+    # The next compaction restores the retired file, merges the rest and cleans up
+    assert store.compact(DATE) == 1
+    assert leftovers(store) == []
+    assert store.intraday_snapshots(DATE) == []
+    data = store.load_date(DATE)
+    assert sorted(data['SNAPSHOT_TIME'].unique()) == ['093000000', '100000000']
+    assert data.loc[data['SNAPSHOT_TIME'] == '100000000', 'LTP'].tolist() == [11.0, 22.0]
+
+
+def test_snapshot_without_metadata_is_skipped(tmp_path):
+    store = MarketStore(str(tmp_path))
+    store.ingest(snapshot(10.0), datetime(2026, 1, 5, 9, 30))
+    # A write that stopped before its metadata
+    partial = os.path.join(store.partition(DATE), '094500000.cache')
+    os.makedirs(partial)
+    open(os.path.join(partial, 'col_0.npy'), 'wb').close()
+
+    assert [time_code for time_code, _ in store.intraday_snapshots(DATE)] == ['093000000']
+    assert store.load_date(DATE)['SNAPSHOT_TIME'].unique().tolist() == ['093000000']
+    assert store.compact(DATE) == 1
+
+
+def test_ingest_refuses_a_stored_time(tmp_path):
+    store = MarketStore(str(tmp_path))
+    store.ingest(snapshot(10.0), datetime(2026, 1, 5, 9, 30))
+    store.compact(DATE)
+    with pytest.raises(ValueError):
+        store.ingest(snapshot(12.0), datetime(2026, 1, 5, 9, 30))
+    assert store.index == {'AAA': {DATE}, 'BBB': {DATE}}
@@ -0,0 +1,51 @@
+# test_match_fills.py
+"""OrderManager._match_fills: order id first, then this run's ORDER_TAG."""
+from broker_handlers import ORDER_TAG
+from order_manager import OrderManager
+
+
+def record(symbol, qty, order_id=None):
+    return {'SYMBOL': symbol, 'QTY': qty, 'ORDER_ID': order_id}
+
+
+def entry(order_id, symbol, qty, tag=ORDER_TAG, status='COMPLETE'):
+    return {'ORDER_ID': order_id, 'SYMBOL': symbol, 'TAG': tag, 'STATUS': status, 'QTY': qty}
+
+
+def test_orders_with_ids_match_by_id_only():
+    book = [entry('B2', 'NIFTYBEES-EQ', 5), entry('B1', 'GOLDBEES-EQ', 3)]
+    matches = OrderManager._match_fills([record('GOLDBEES', 3, 'B1'), record('NIFTYBEES', 5, 'B2')], book)
+    assert [(match[0]['ORDER_ID'], match[1]) for match in matches] == [('B1', 'id'), ('B2', 'id')]
+
+    # An id the book does not know is not rescued by the tag
+    assert OrderManager._match_fills([record('GOLDBEES', 3, 'LOST')], book) == [None]
+
+
+def test_orders_without_ids_take_unclaimed_tagged_entries():
+    book = [
+        entry('B1', 'GOLDBEES-EQ', 3),
+        entry('B2', 'GOLDBEES-EQ', 3),
+        entry('B3', 'NIFTYBEES-EQ', 7)
+    ]
+    records = [record('GOLDBEES', 3, 'B1'), record('GOLDBEES', 3), record('NIFTYBEES', 7), record('NIFTYBEES', 7)]
+    matches = OrderManager._match_fills(records, book)
+    # B1 is claimed by id, so the id-less GOLDBEES order gets B2; only one NIFTYBEES entry exists
+    assert [(match[0]['ORDER_ID'], match[1]) if match else None for match in matches] == [
+        ('B1', 'id'), ('B2', 'tag'), ('B3', 'tag'), None
+    ]
+
+
+def test_tag_match_requires_this_runs_tag_symbol_and_quantity():
+    book = [
+        entry('OLD', 'GOLDBEES-EQ', 3, tag='ETF-AUTO-000000'),
+        entry('MANUAL', 'GOLDBEES-EQ', 3, tag=None),
+        entry('QTY', 'GOLDBEES-EQ', 4),
+        entry('SYM', 'SILVERBEES-EQ', 3)
+    ]
+    assert OrderManager._match_fills([record('GOLDBEES', 3)], book) == [None]
+
+
+def test_order_ids_compare_as_text():
+    # Brokers return numeric ids as text in the book and as numbers in responses, or the reverse
+    matches = OrderManager._match_fills([record('GOLDBEES', 3, 24011500001)], [entry('24011500001', 'GOLDBEES', 3)])
+    assert matches[0][1] == 'id'
@@ -0,0 +1,69 @@
+# test_token_bucket.py
+"""TokenBucket and RateLimiter timing against a fake clock."""
+import pytest
+
+import broker_handlers
+from broker_handlers import RateLimiter, TokenBucket
+
+
+class FakeClock:
+    """Stands in for time.monotonic/time.sleep; sleeping advances the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(broker_handlers.time, 'monotonic', fake.monotonic)
+    monkeypatch.setattr(broker_handlers.time, 'sleep', fake.sleep)
+    return fake
+
+
+def test_burst_up_to_capacity_then_one_token_per_interval(clock):
+    bucket = TokenBucket(rate=10)
+    assert [bucket.acquire() for _ in range(10)] == [0.0] * 10
+    assert clock.sleeps == []
+
+    # Each further call waits exactly one refill interval after the previous one
+    waits = [bucket.acquire() for _ in range(3)]
+    assert waits == pytest.approx([0.1, 0.1, 0.1])
+    assert clock.now == pytest.approx(1000.3)
+    assert bucket.calls == 13
+    assert bucket.waited == pytest.approx(0.3)
+    assert bucket.max_wait == pytest.approx(0.1)
+
+
+def test_waiting_callers_are_queued_not_rejected(clock, monkeypatch):
+    # Callers arriving at the same instant (as from several threads) line up in order
+    monkeypatch.setattr(broker_handlers.time, 'sleep', clock.sleeps.append)
+    bucket = TokenBucket(rate=2, capacity=1)
+    assert [bucket.acquire() for _ in range(4)] == pytest.approx([0.0, 0.5, 1.0, 1.5])
+
+
+def test_refill_is_capped_at_capacity(clock):
+    bucket = TokenBucket(rate=5, capacity=2)
+    bucket.acquire()
+    bucket.acquire()
+    clock.now += 60
+    # A long idle period only refills the bucket to capacity
+    assert [bucket.acquire() for _ in range(3)] == pytest.approx([0.0, 0.0, 0.2])
+
+
+def test_rate_limiter_shares_buckets_per_broker_endpoint(clock):
+    limiter = RateLimiter({'FINVASIA': {'place_order': 1}, 'DHAN': {'place_order': 1}})
+    assert limiter.acquire('FINVASIA', 'place_order') == 0.0
+    assert limiter.acquire('DHAN', 'place_order') == 0.0
+    assert limiter.acquire('FINVASIA', 'place_order') == pytest.approx(1.0)
+    # Endpoints without a limit never wait
+    assert limiter.acquire('FINVASIA', 'positions') == 0.0
+    assert limiter.bucket('FINVASIA', 'positions') is None
@@ -77,7 +77,12 @@ def export_brokers_to_csv(brokers, csv_path='data/accounts.csv'):
             'COPY': str(broker.copy).upper(),
             'SUBSCRIPTION_EXPIRY': subscription_expiry,
             'SUBSCRIPTION_STATUS': broker.subscription_status,
-            'BROKER': broker.broker_name
+            'BROKER': broker.broker_name,
+            # Allocation profile; blank means the global defaults apply
+            'DAILY_SIP_MIN': broker.daily_sip_min if broker.daily_sip_min is not None else '',
+            'DAILY_SIP_MAX': broker.daily_sip_max if broker.daily_sip_max is not None else '',
+            'MAX_CAP': broker.max_cap if broker.max_cap is not None else '',
+            'MIN_CAP': broker.min_cap if broker.min_cap is not None else ''
         })
 
     # Create the DataFrame and save as CSV